@@ -0,0 +1,112 @@
+"""Admin API endpoints - runtime diagnostics for operators."""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from claude_code_api.core import profiler
+from claude_code_api.core.config import settings
+from claude_code_api.core.loop_monitor import loop_monitor
+
+_profile_lock = asyncio.Lock()
+# Bounds for the sampling interval of /admin/profile
+MIN_PROFILE_INTERVAL_MS = 1.0
+MAX_PROFILE_INTERVAL_MS = 1000.0
+
+
+def _admin_error(status_code: int, message: str, code: str) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail={
+            "error": {
+                "message": message,
+                "type": "invalid_request_error",
+                "code": code,
+            }
+        },
+    )
+
+
+def require_admin(req: Request) -> None:
+    """Allow admin keys only; without auth every caller is trusted."""
+    if not settings.require_auth:
+        return
+    record = getattr(req.state, "api_key_record", None)
+    if record is None or not record.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error": {
+                    "message": "This endpoint requires an admin API key",
+                    "type": "permission_error",
+                    "code": "admin_required",
+                }
+            },
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/admin/loop")
+async def get_loop_report(limit: int = 10) -> Dict[str, Any]:
+    """Event-loop lag and the stacks sampled most often while it stalled."""
+    return loop_monitor.report(limit=min(max(1, limit), 100))
+
+
+@router.delete("/admin/loop")
+async def reset_loop_report() -> Dict[str, Any]:
+    """Clear collected stall samples."""
+    loop_monitor.reset()
+    return {"reset": True}
+
+
+@router.get("/admin/profile")
+async def get_profile(
+    seconds: float = 10.0,
+    format: str = "collapsed",
+    interval_ms: Optional[float] = Query(
+        None, ge=MIN_PROFILE_INTERVAL_MS, le=MAX_PROFILE_INTERVAL_MS
+    ),
+) -> Response:
+    """Sample the event loop for ``seconds`` and return the stacks seen.
+
+    ``collapsed`` returns one ``route;session;frame;... count`` line per stack
+    (flamegraph.pl, speedscope and most viewers read it); ``speedscope``
+    returns a speedscope JSON file with one profile per route.
+    """
+    if format not in profiler.FORMATS:
+        raise _admin_error(
+            status.HTTP_400_BAD_REQUEST,
+            f"format must be one of: {', '.join(profiler.FORMATS)}",
+            "invalid_format",
+        )
+    if not 0 < seconds <= settings.profile_max_seconds:
+        raise _admin_error(
+            status.HTTP_400_BAD_REQUEST,
+            f"seconds must be between 0 and {settings.profile_max_seconds}",
+            "invalid_duration",
+        )
+    if _profile_lock.locked():
+        raise _admin_error(
+            status.HTTP_409_CONFLICT,
+            "A profile is already running",
+            "profile_in_progress",
+        )
+
+    interval = (interval_ms or settings.profile_interval_ms) / 1000
+    async with _profile_lock:
+        result = await profiler.profile(seconds, interval)
+
+    summary = result.summary()
+    headers = {
+        "X-Profile-Seconds": str(summary["seconds"]),
+        "X-Profile-Samples": str(summary["samples"]),
+        "X-Profile-Idle-Samples": str(summary["idle_samples"]),
+    }
+    if format == "speedscope":
+        content = await asyncio.to_thread(result.speedscope)
+        return JSONResponse(content, headers=headers)
+    return PlainTextResponse(await asyncio.to_thread(result.collapsed), headers=headers)
@@ -0,0 +1,189 @@
+"""Batch API endpoint - OpenAI compatible offline chat completions."""
+
+from typing import Any, Dict, Optional
+
+import structlog
+from fastapi import APIRouter, FastAPI, HTTPException, Request, status
+from pydantic import ValidationError
+
+from claude_code_api.api.chat import CompletionCaller, run_chat_completion
+from claude_code_api.core.batch_scheduler import (
+    BatchNotCancellableError,
+    BatchRequestError,
+    BatchRunner,
+    BatchScheduler,
+    BatchValidationError,
+)
+from claude_code_api.core.key_registry import key_registry
+from claude_code_api.core.security import request_owner
+from claude_code_api.models.openai import (
+    BatchListResponse,
+    BatchObject,
+    ChatCompletionRequest,
+    CreateBatchRequest,
+)
+from claude_code_api.utils.json_files import public_record
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+BATCH_PROJECT_PREFIX = "batches"
+
+
+def batch_project_id(owner: Optional[str]) -> str:
+    """Default project for an owner's batch requests; never shared across keys."""
+    return f"{BATCH_PROJECT_PREFIX}-{owner[:12]}" if owner else BATCH_PROJECT_PREFIX
+
+
+def _batch_caller(owner: Optional[str]) -> CompletionCaller:
+    """Caller for a batch line, held to the owner's current key policy."""
+    if owner is None:
+        return CompletionCaller(client_id="batch")
+    record = key_registry.lookup_hash(owner)
+    if record is None:
+        # The key was revoked after the batch was created.
+        raise BatchRequestError(
+            status.HTTP_401_UNAUTHORIZED,
+            {
+                "error": {
+                    "message": "The API key that created this batch is no longer valid",
+                    "type": "authentication_error",
+                    "code": "invalid_api_key",
+                }
+            },
+        )
+    return CompletionCaller(
+        client_id=f"batch-{owner[:12]}", key_hash=owner, record=record
+    )
+
+
+def create_batch_runner(app: FastAPI) -> BatchRunner:
+    """Run batch request bodies through the chat completion pipeline."""
+
+    async def _run(body: Dict[str, Any], owner: Optional[str]) -> Dict[str, Any]:
+        caller = _batch_caller(owner)
+        try:
+            request = ChatCompletionRequest(**{**body, "stream": False})
+        except ValidationError as e:
+            raise BatchRequestError(
+                status.HTTP_400_BAD_REQUEST,
+                {
+                    "error": {
+                        "message": str(e),
+                        "type": "invalid_request_error",
+                        "code": "invalid_request",
+                    }
+                },
+            ) from e
+        try:
+            return await run_chat_completion(
+                app.state, request, caller, project_id=batch_project_id(owner)
+            )
+        except HTTPException as e:
+            detail = e.detail
+            if not (isinstance(detail, dict) and "error" in detail):
+                detail = {
+                    "error": {
+                        "message": str(detail),
+                        "type": "api_error",
+                        "code": "request_failed",
+                    }
+                }
+            raise BatchRequestError(e.status_code, detail) from e
+
+    return _run
+
+
+def _batch_not_found(batch_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "error": {
+                "message": f"Batch {batch_id} not found",
+                "type": "invalid_request_error",
+                "code": "batch_not_found",
+            }
+        },
+    )
+
+
+@router.post("/batches", response_model=BatchObject)
+async def create_batch(
+    batch_request: CreateBatchRequest, req: Request
+) -> Dict[str, Any]:
+    """Create and start a batch from an uploaded JSONL file."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    try:
+        batch = await scheduler.create_batch(
+            input_file_id=batch_request.input_file_id,
+            endpoint=batch_request.endpoint,
+            completion_window=batch_request.completion_window,
+            metadata=batch_request.metadata,
+            owner=request_owner(req),
+        )
+    except BatchValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": {
+                    "message": str(e),
+                    "type": "invalid_request_error",
+                    "code": "invalid_batch_input",
+                }
+            },
+        ) from e
+    return public_record(batch)
+
+
+@router.get("/batches", response_model=BatchListResponse)
+async def list_batches(
+    req: Request, limit: int = 20, after: Optional[str] = None
+) -> Dict[str, Any]:
+    """List batches, newest first."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    limit = min(max(1, limit), 100)
+    batches = await scheduler.list_batches(request_owner(req), limit + 1, after)
+    has_more = len(batches) > limit
+    data = [public_record(batch) for batch in batches[:limit]]
+    return {
+        "object": "list",
+        "data": data,
+        "first_id": data[0]["id"] if data else None,
+        "last_id": data[-1]["id"] if data else None,
+        "has_more": has_more,
+    }
+
+
+@router.get("/batches/{batch_id}", response_model=BatchObject)
+async def get_batch(batch_id: str, req: Request) -> Dict[str, Any]:
+    """Get batch status and progress counters."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    batch = await scheduler.get_batch(batch_id, request_owner(req))
+    if batch is None:
+        raise _batch_not_found(batch_id)
+    return public_record(batch)
+
+
+@router.post("/batches/{batch_id}/cancel", response_model=BatchObject)
+async def cancel_batch(batch_id: str, req: Request) -> Dict[str, Any]:
+    """Cancel a batch; finished requests keep their results."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    try:
+        batch = await scheduler.cancel_batch(batch_id, request_owner(req))
+    except BatchNotCancellableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": {
+                    "message": (
+                        f"Batch {batch_id} runs in another worker; cancelling it "
+                        "needs shared_state_backend=sqlite"
+                    ),
+                    "type": "invalid_request_error",
+                    "code": "batch_not_cancellable",
+                }
+            },
+        ) from e
+    if batch is None:
+        raise _batch_not_found(batch_id)
+    return public_record(batch)
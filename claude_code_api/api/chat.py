@@ -1,12 +1,15 @@
 """Chat completions API endpoint - OpenAI compatible."""
 
+import asyncio
 import hashlib
 import json
-from typing import Any, Dict, Optional, Tuple
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 
 import structlog
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import ValidationError
 
 from claude_code_api.core.claude_manager import (
@@ -14,13 +17,38 @@ from claude_code_api.core.claude_manager import (
     ClaudeSessionConflictError,
     create_project_directory,
 )
+from claude_code_api.core.config import settings
+from claude_code_api.core.jobs import JobManager
+from claude_code_api.core.key_registry import APIKeyRecord
+from claude_code_api.core.process_limits import ProcessLimits
+from claude_code_api.core.profiler import label_task
+from claude_code_api.core.project_gc import fork_project_id, touch_project
+from claude_code_api.core.project_usage import project_usage
+from claude_code_api.core.quota import QuotaManager, QuotaMeter
+from claude_code_api.core.response_cache import (
+    CACHE_BYPASS,
+    CACHE_ONLY,
+    CachedProcess,
+    ResponseCache,
+    make_cache_key,
+    project_fingerprint,
+)
+from claude_code_api.core.security import request_owner
 from claude_code_api.core.session_manager import SessionManager
+from claude_code_api.core.single_flight import SingleFlight
+from claude_code_api.core.tracing import span
+from claude_code_api.core.workspace import (
+    clone_for_run,
+    clone_project,
+    release_workspace,
+)
 from claude_code_api.models.claude import get_default_model, validate_claude_model
 from claude_code_api.models.openai import (
     ChatCompletionRequest,
     ChatCompletionResponse,
     ErrorResponse,
 )
+from claude_code_api.utils.json_files import public_record
 from claude_code_api.utils.parser import (
     ClaudeOutputParser,
     OpenAIConverter,
@@ -28,6 +56,7 @@ from claude_code_api.utils.parser import (
     normalize_claude_message,
 )
 from claude_code_api.utils.streaming import (
+    create_choices_sse_response,
     create_non_streaming_response,
     create_sse_response,
 )
@@ -47,9 +76,14 @@ CHAT_COMPLETION_RESPONSES = {
             },
         },
     },
+    202: {"description": "Job accepted (async=true); poll /v1/jobs/{id}."},
     400: {"model": ErrorResponse},
+    403: {"model": ErrorResponse},
+    404: {"model": ErrorResponse},
     422: {"model": ErrorResponse},
+    429: {"model": ErrorResponse},
     503: {"model": ErrorResponse},
+    507: {"model": ErrorResponse},
     500: {"model": ErrorResponse},
 }
 
@@ -116,12 +150,106 @@ def _extract_prompts(request: ChatCompletionRequest) -> Tuple[str, str]:
     return user_prompt, system_prompt
 
 
+@dataclass(frozen=True)
+class CompletionCaller:
+    """Who a completion runs for, and the API key policy it is held to."""
+
+    client_id: str
+    key_hash: Optional[str] = None
+    record: Optional[APIKeyRecord] = None
+
+    @classmethod
+    def from_request(cls, req: Request) -> "CompletionCaller":
+        return cls(
+            client_id=getattr(req.state, "client_id", "anonymous"),
+            key_hash=request_owner(req),
+            record=getattr(req.state, "api_key_record", None),
+        )
+
+
+def _check_model_allowed(caller: CompletionCaller, model: str) -> None:
+    """Reject models outside the API key's allow-list."""
+    if caller.record is not None and not caller.record.allows_model(model):
+        raise _http_error(
+            status.HTTP_403_FORBIDDEN,
+            f"API key is not allowed to use model '{model}'",
+            "permission_error",
+            "model_not_allowed",
+        )
+
+
+def _api_key_name(caller: CompletionCaller) -> Optional[str]:
+    """Label for per-key session stats; never the raw key."""
+    if caller.record is not None and caller.record.name:
+        return caller.record.name
+    return caller.key_hash[:12] if caller.key_hash else None
+
+
+def _start_quota_meter(
+    quota_manager: QuotaManager, caller: CompletionCaller
+) -> Optional[QuotaMeter]:
+    """Reject requests from keys over budget and meter the rest."""
+    if not caller.key_hash:
+        return None
+    limits = caller.record.quota_limits() if caller.record is not None else None
+    exceeded = quota_manager.check(caller.key_hash, limits)
+    if exceeded:
+        raise _http_error(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            f"API key quota exceeded ({exceeded})",
+            "insufficient_quota",
+            "quota_exceeded",
+        )
+    quota_manager.record_request(caller.key_hash)
+    return quota_manager.meter(caller.key_hash, limits)
+
+
+def _process_limits(caller: CompletionCaller) -> Optional[ProcessLimits]:
+    """Process limits from the API key's policy; None uses settings."""
+    return caller.record.process_limits() if caller.record is not None else None
+
+
+async def _request_key(
+    model: str,
+    system_prompt: Optional[str],
+    user_prompt: str,
+    project_id: str,
+    project_path: str,
+) -> str:
+    """Key identifying requests that would produce the same run."""
+    fingerprint = None
+    if settings.response_cache_project_fingerprint:
+        fingerprint = await asyncio.to_thread(project_fingerprint, project_path)
+    return make_cache_key(model, system_prompt, user_prompt, project_id, fingerprint)
+
+
+async def _lookup_response_cache(
+    response_cache: Optional[ResponseCache],
+    request: ChatCompletionRequest,
+    request_key: Optional[str],
+) -> Optional[list]:
+    """Return cached Claude events for the request, if any."""
+    cached_events = None
+    if response_cache is not None and request_key and request.cache != CACHE_BYPASS:
+        cached_events = await response_cache.get(request_key)
+
+    if cached_events is None and request.cache == CACHE_ONLY:
+        raise _http_error(
+            status.HTTP_404_NOT_FOUND,
+            "No cached response for this request",
+            "invalid_request_error",
+            "cache_miss",
+        )
+    return cached_events
+
+
 async def _resolve_session(
     session_manager: SessionManager,
     request: ChatCompletionRequest,
     project_id: str,
     claude_model: Optional[str],
     system_prompt: Optional[str],
+    api_key_name: Optional[str] = None,
 ) -> str:
     if request.session_id:
         session_id = request.session_id
@@ -133,10 +261,346 @@ async def _resolve_session(
                 "invalid_request_error",
                 "session_not_found",
             )
-        return session_id
-    return await session_manager.create_session(
-        project_id=project_id, model=claude_model, system_prompt=system_prompt
+    else:
+        session_id = await session_manager.create_session(
+            project_id=project_id,
+            model=claude_model,
+            system_prompt=system_prompt,
+            api_key_name=api_key_name,
+        )
+    label_task(session_id=session_id)
+    return session_id
+
+
+async def _start_claude_process(
+    claude_manager,
+    session_manager: SessionManager,
+    session_id: str,
+    project_path: str,
+    prompt: str,
+    claude_model: Optional[str],
+    system_prompt: Optional[str],
+    register_cli_session: bool = True,
+    usage_session_id: Optional[str] = None,
+    limits: Optional[ProcessLimits] = None,
+):
+    """Start a Claude process, mapping manager errors to HTTP errors.
+
+    The run's resource usage is added to ``usage_session_id`` (default
+    ``session_id``) when it ends.
+    """
+
+    def _register_cli_session(cli_session_id: str):
+        session_manager.register_cli_session(session_id, cli_session_id)
+
+    def _record_usage(usage):
+        session_manager.record_process_usage(usage_session_id or session_id, usage)
+
+    touch_project(project_path)
+    over_quota = await project_usage.check(project_path)
+    if over_quota is not None:
+        raise _http_error(
+            status.HTTP_507_INSUFFICIENT_STORAGE,
+            f"Project uses {over_quota.size_bytes} bytes, over its quota of "
+            f"{project_usage.max_bytes} bytes",
+            "insufficient_quota",
+            "project_quota_exceeded",
+        )
+
+    try:
+        claude_process = await claude_manager.create_session(
+            session_id=session_id,
+            project_path=project_path,
+            prompt=prompt,
+            model=claude_model,
+            system_prompt=system_prompt,
+            on_cli_session_id=(_register_cli_session if register_cli_session else None),
+            on_usage=_record_usage,
+            limits=limits,
+        )
+    except ClaudeSessionConflictError as e:
+        logger.warning(
+            "Session already has an active Claude process",
+            session_id=session_id,
+            error=str(e),
+        )
+        raise _http_error(
+            status.HTTP_409_CONFLICT,
+            "The session is currently busy with another process.",
+            "invalid_request_error",
+            "session_busy",
+        ) from e
+    except ClaudeModelNotSupportedError as e:
+        logger.warning(
+            "Claude rejected requested model",
+            session_id=session_id,
+            model=claude_model,
+            error=str(e),
+        )
+        raise _http_error(
+            status.HTTP_400_BAD_REQUEST,
+            "The requested model is not supported.",
+            "invalid_request_error",
+            "model_not_supported",
+        ) from e
+    except Exception as e:
+        logger.error(
+            "Failed to create Claude session", session_id=session_id, error=str(e)
+        )
+        raise _http_error(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            f"Failed to start Claude Code: {str(e)}",
+            "service_unavailable",
+            "claude_unavailable",
+        )
+
+    project_usage.watch(claude_process, project_path)
+    return claude_process
+
+
+async def _start_or_join_claude_process(
+    claude_manager,
+    session_manager: SessionManager,
+    session_id: str,
+    project_path: str,
+    prompt: str,
+    claude_model: Optional[str],
+    system_prompt: Optional[str],
+    request_key: Optional[str],
+    response_cache: Optional[ResponseCache],
+    single_flight: Optional[SingleFlight],
+    limits: Optional[ProcessLimits] = None,
+):
+    """Start a Claude process, or attach to an identical one already running."""
+    flight = None
+    if single_flight is not None and request_key:
+        flight, is_leader = single_flight.join(request_key)
+        if not is_leader:
+            if await flight.wait_started():
+                logger.info("Joined in-flight completion", session_id=session_id)
+                return flight.view(session_id)
+            # The leader failed to start; run independently.
+            flight = None
+
+    try:
+        claude_process = await _start_claude_process(
+            claude_manager=claude_manager,
+            session_manager=session_manager,
+            session_id=session_id,
+            project_path=project_path,
+            prompt=prompt,
+            claude_model=claude_model,
+            system_prompt=system_prompt,
+            limits=limits,
+        )
+    except BaseException:
+        if flight is not None:
+            flight.fail()
+        raise
+
+    if response_cache is not None and request_key:
+        claude_process = response_cache.record(request_key, claude_process)
+    if flight is not None:
+        flight.start(claude_process)
+        return flight.view(session_id, is_leader=True)
+    return claude_process
+
+
+def _pays_for_run(claude_process) -> bool:
+    """False for followers of a shared run; only its leader is charged."""
+    return getattr(claude_process, "is_leader", True)
+
+
+async def _fork_project(project_id: str, project_path: str) -> Tuple[str, str]:
+    """Clone the project so the request works on its own copy."""
+    fork_id = fork_project_id(project_id)
+    fork_path = create_project_directory(fork_id)
+    try:
+        await clone_project(project_path, fork_path)
+    except OSError as e:
+        await release_workspace(fork_path)
+        raise _http_error(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            f"Failed to clone project: {e}",
+            "service_unavailable",
+            "workspace_unavailable",
+        ) from e
+    return fork_id, fork_path
+
+
+def _choice_count(request: ChatCompletionRequest, run_async: bool) -> int:
+    """Validate ``n`` against the configured limit."""
+    choice_count = request.n or 1
+    if choice_count > settings.max_choices:
+        raise _http_error(
+            status.HTTP_400_BAD_REQUEST,
+            f"n must be at most {settings.max_choices}",
+            "invalid_request_error",
+            "too_many_choices",
+        )
+    if choice_count > 1 and run_async:
+        raise _http_error(
+            status.HTTP_400_BAD_REQUEST,
+            "n > 1 is not supported with async=true",
+            "invalid_request_error",
+            "unsupported_parameter",
+        )
+    return choice_count
+
+
+def _choice_session_id(session_id: str, index: int) -> str:
+    return session_id if index == 0 else f"{session_id}-n{index}"
+
+
+async def _release_choices(claude_processes: list, workspaces: List[str]) -> None:
+    """Stop leftover choice processes and drop their workspace copies."""
+    await asyncio.gather(
+        *(process.stop() for process in claude_processes if process.is_running),
+        return_exceptions=True,
+    )
+    await asyncio.gather(
+        *(release_workspace(path) for path in workspaces), return_exceptions=True
+    )
+
+
+async def _start_choice_processes(
+    claude_manager,
+    session_manager: SessionManager,
+    session_id: str,
+    project_path: str,
+    choice_count: int,
+    prompt: str,
+    claude_model: Optional[str],
+    system_prompt: Optional[str],
+    limits: Optional[ProcessLimits] = None,
+) -> Tuple[list, List[str]]:
+    """Start one Claude process per choice, concurrently.
+
+    Choice 0 runs as the API session in the project itself; the others run as
+    ``<session_id>-n<i>``. When the CLI works inside the project directory,
+    each extra choice gets its own copy so tool edits do not collide.
+    """
+    workspaces: List[str] = []
+    project_paths = [project_path] * choice_count
+    if settings.claude_cwd_in_project:
+        names = [
+            _choice_session_id(session_id, index) for index in range(1, choice_count)
+        ]
+        clones = await asyncio.gather(
+            *(clone_for_run(project_path, name) for name in names),
+            return_exceptions=True,
+        )
+        workspaces = [path for path in clones if isinstance(path, str)]
+        failed = [error for error in clones if isinstance(error, BaseException)]
+        if failed:
+            await _release_choices([], workspaces)
+            raise _http_error(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                f"Failed to prepare workspace: {failed[0]}",
+                "service_unavailable",
+                "workspace_unavailable",
+            )
+        project_paths[1:] = workspaces
+
+    results = await asyncio.gather(
+        *(
+            _start_claude_process(
+                claude_manager=claude_manager,
+                session_manager=session_manager,
+                session_id=_choice_session_id(session_id, index),
+                project_path=project_paths[index],
+                prompt=prompt,
+                claude_model=claude_model,
+                system_prompt=system_prompt,
+                register_cli_session=index == 0,
+                usage_session_id=session_id,
+                limits=limits,
+            )
+            for index in range(choice_count)
+        ),
+        return_exceptions=True,
     )
+    claude_processes = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        await _release_choices(claude_processes, workspaces)
+        raise errors[0]
+    return claude_processes, workspaces
+
+
+async def _collect_choices_response(
+    claude_processes: list,
+    session_manager: SessionManager,
+    session_id: str,
+    model: str,
+    project_id: str,
+    quota_meter: Optional[QuotaMeter] = None,
+) -> Dict[str, Any]:
+    """Drain every choice concurrently and merge them into one response."""
+    gathered = await asyncio.gather(
+        *(
+            _gather_claude_messages(claude_process, quota_meter)
+            for claude_process in claude_processes
+        )
+    )
+
+    usage_summary = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    total_cost = 0.0
+    choices = []
+    response: Dict[str, Any] = {}
+    for index, (messages, parser, finish_reason) in enumerate(gathered):
+        _log_message_summary(messages)
+        choice_usage = OpenAIConverter.calculate_usage(parser)
+        for field in usage_summary:
+            usage_summary[field] += choice_usage.get(field, 0)
+        total_cost += parser.total_cost
+        choice_response = _build_non_streaming_response(
+            messages, session_id, model, choice_usage, project_id, finish_reason
+        )
+        choices.append({**choice_response["choices"][0], "index": index})
+        response = response or choice_response
+
+    await _update_session_usage(session_manager, session_id, usage_summary, total_cost)
+    response["choices"] = choices
+    response["usage"] = usage_summary
+    _log_response_payload(response)
+    return response
+
+
+def _stream_headers(session_id: str, project_id: str) -> Dict[str, str]:
+    return {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+        "X-Session-ID": session_id,
+        "X-Project-ID": project_id,
+    }
+
+
+async def _stream_choices(
+    session_manager: SessionManager,
+    session_id: str,
+    model: str,
+    claude_processes: list,
+    workspaces: List[str],
+    quota_meter: Optional[QuotaMeter] = None,
+):
+    async def _record_usage(usage_summary: Dict[str, Any], total_cost: float):
+        await _update_session_usage(
+            session_manager, session_id, usage_summary, total_cost
+        )
+
+    try:
+        async for chunk in create_choices_sse_response(
+            session_id,
+            model,
+            claude_processes,
+            quota_meter=quota_meter,
+            on_usage=_record_usage,
+        ):
+            yield chunk
+    finally:
+        await _release_choices(claude_processes, workspaces)
 
 
 async def _collect_non_streaming_response(
@@ -145,25 +609,35 @@ async def _collect_non_streaming_response(
     session_id: str,
     model: str,
     project_id: str,
+    quota_meter: Optional[QuotaMeter] = None,
 ) -> Dict[str, Any]:
-    messages, parser = await _gather_claude_messages(claude_process)
+    with span("claude.collect"):
+        messages, parser, finish_reason = await _gather_claude_messages(
+            claude_process, quota_meter
+        )
     _log_message_summary(messages)
 
     usage_summary = OpenAIConverter.calculate_usage(parser)
-    await _update_session_usage(
-        session_manager, session_id, usage_summary, parser.total_cost
-    )
+    if _pays_for_run(claude_process):
+        await _update_session_usage(
+            session_manager, session_id, usage_summary, parser.total_cost
+        )
 
     response = _build_non_streaming_response(
-        messages, session_id, model, usage_summary, project_id
+        messages, session_id, model, usage_summary, project_id, finish_reason
     )
     _log_response_payload(response)
     return response
 
 
-async def _gather_claude_messages(claude_process) -> Tuple[list, ClaudeOutputParser]:
+async def _gather_claude_messages(
+    claude_process, quota_meter: Optional[QuotaMeter] = None
+) -> Tuple[list, ClaudeOutputParser, Optional[str]]:
     messages = []
-    parser = ClaudeOutputParser()
+    parser = ClaudeOutputParser(
+        usage_callback=quota_meter.charge if quota_meter else None
+    )
+    finish_reason = None
     async for claude_message in claude_process.get_output():
         _log_claude_message(claude_message)
         messages.append(claude_message)
@@ -173,7 +647,16 @@ async def _gather_claude_messages(claude_process) -> Tuple[list, ClaudeOutputPar
         parser.parse_message(normalized)
         if parser.is_final_message(normalized):
             break
-    return messages, parser
+        if quota_meter and quota_meter.exceeded:
+            logger.warning(
+                "Quota exceeded, stopping Claude process",
+                session_id=claude_process.session_id,
+                quota=quota_meter.exceeded,
+            )
+            await claude_process.stop()
+            finish_reason = "length"
+            break
+    return messages, parser, finish_reason
 
 
 def _log_claude_message(claude_message: Any) -> None:
@@ -213,11 +696,12 @@ async def _update_session_usage(
     usage_summary: Dict[str, Any],
     total_cost: float,
 ) -> None:
-    await session_manager.update_session(
-        session_id=session_id,
-        tokens_used=usage_summary.get("total_tokens", 0),
-        cost=total_cost,
-    )
+    with span("session.update_usage"):
+        await session_manager.update_session(
+            session_id=session_id,
+            tokens_used=usage_summary.get("total_tokens", 0),
+            cost=total_cost,
+        )
 
 
 def _build_non_streaming_response(
@@ -226,9 +710,14 @@ def _build_non_streaming_response(
     model: str,
     usage_summary: Dict[str, Any],
     project_id: str,
+    finish_reason: Optional[str] = None,
 ) -> Dict[str, Any]:
     response = create_non_streaming_response(
-        messages=messages, session_id=session_id, model=model, usage=usage_summary
+        messages=messages,
+        session_id=session_id,
+        model=model,
+        usage=usage_summary,
+        finish_reason=finish_reason,
     )
     response["project_id"] = project_id
     return response
@@ -255,12 +744,218 @@ def _log_response_payload(response: Dict[str, Any]) -> None:
     )
 
 
+async def _run_completion(
+    app_state: Any,
+    request: ChatCompletionRequest,
+    caller: CompletionCaller,
+    default_project_id: str,
+    run_async: bool = False,
+) -> Any:
+    """Run one chat completion for ``caller``.
+
+    Shared by the endpoint and background runners, so both enforce the API
+    key's model allow-list, quota and process limits. Returns the response
+    body, or a streaming or ``202`` response for ``stream`` and ``async``.
+    """
+    session_manager: SessionManager = app_state.session_manager
+    claude_manager = app_state.claude_manager
+
+    requested_model = (request.model or "").strip() or None
+    # Normalize only when user explicitly requested a model.
+    claude_model = validate_claude_model(requested_model) if requested_model else None
+    response_model = claude_model or get_default_model()
+    _check_model_allowed(caller, response_model)
+
+    user_prompt, system_prompt = _extract_prompts(request)
+    choice_count = _choice_count(request, run_async)
+    quota_meter = _start_quota_meter(app_state.quota_manager, caller)
+
+    # Handle project context
+    project_id = request.project_id or default_project_id
+    with span("project.create_directory"):
+        project_path = create_project_directory(project_id)
+        if request.fork_project:
+            project_id, project_path = await _fork_project(project_id, project_path)
+
+    # Several samples are meant to differ, and a session's reply depends on
+    # its history, so neither is ever cached or shared.
+    response_cache = single_flight = None
+    if choice_count == 1 and not request.session_id:
+        response_cache = getattr(app_state, "response_cache", None)
+        single_flight = getattr(app_state, "single_flight", None)
+    request_key = None
+    if response_cache is not None or single_flight is not None:
+        request_key = await _request_key(
+            response_model, system_prompt, user_prompt, project_id, project_path
+        )
+    cached_events = await _lookup_response_cache(response_cache, request, request_key)
+
+    # Handle session management
+    with span("session.resolve"):
+        session_id = await _resolve_session(
+            session_manager=session_manager,
+            request=request,
+            project_id=project_id,
+            claude_model=claude_model,
+            system_prompt=system_prompt,
+            api_key_name=_api_key_name(caller),
+        )
+
+    # Start Claude Code process, or replay a cached run
+    if choice_count > 1:
+        claude_processes, workspaces = await _start_choice_processes(
+            claude_manager=claude_manager,
+            session_manager=session_manager,
+            session_id=session_id,
+            project_path=project_path,
+            choice_count=choice_count,
+            prompt=user_prompt,
+            claude_model=claude_model,
+            system_prompt=system_prompt,
+            limits=_process_limits(caller),
+        )
+        claude_process = claude_processes[0]
+    elif cached_events is not None:
+        logger.info("Serving cached response", session_id=session_id)
+        claude_process = CachedProcess(session_id, cached_events)
+        quota_meter = None
+    else:
+        claude_process = await _start_or_join_claude_process(
+            claude_manager=claude_manager,
+            session_manager=session_manager,
+            session_id=session_id,
+            project_path=project_path,
+            prompt=user_prompt,
+            claude_model=claude_model,
+            system_prompt=system_prompt,
+            request_key=request_key,
+            response_cache=response_cache,
+            single_flight=single_flight,
+            limits=_process_limits(caller),
+        )
+        if not _pays_for_run(claude_process):
+            quota_meter = None
+
+    # Use Claude's actual session ID
+    api_session_id = session_id
+
+    # Update session with user message
+    await session_manager.update_session(
+        session_id=api_session_id,
+        message_content=user_prompt,
+        role="user",
+        tokens_used=estimate_tokens(user_prompt),
+    )
+
+    if run_async:
+        job_manager: JobManager = app_state.job_manager
+
+        async def _run_job(job_process):
+            return await _collect_non_streaming_response(
+                claude_process=job_process,
+                session_manager=session_manager,
+                session_id=api_session_id,
+                model=response_model,
+                project_id=project_id,
+                quota_meter=quota_meter,
+            )
+
+        job = await job_manager.submit(
+            claude_process,
+            _run_job,
+            session_id=api_session_id,
+            project_id=project_id,
+            model=response_model,
+            owner=caller.key_hash,
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=public_record(job),
+            headers={"Location": f"/v1/jobs/{job['id']}"},
+        )
+
+    if choice_count > 1:
+        if request.stream:
+            return StreamingResponse(
+                _stream_choices(
+                    session_manager,
+                    api_session_id,
+                    response_model,
+                    claude_processes,
+                    workspaces,
+                    quota_meter=quota_meter,
+                ),
+                media_type="text/event-stream",
+                headers=_stream_headers(api_session_id, project_id),
+            )
+        try:
+            return await _collect_choices_response(
+                claude_processes=claude_processes,
+                session_manager=session_manager,
+                session_id=api_session_id,
+                model=response_model,
+                project_id=project_id,
+                quota_meter=quota_meter,
+            )
+        finally:
+            await _release_choices(claude_processes, workspaces)
+
+    # Handle streaming vs non-streaming
+    if request.stream:
+        return StreamingResponse(
+            create_sse_response(
+                api_session_id,
+                response_model,
+                claude_process,
+                quota_meter=quota_meter,
+            ),
+            media_type="text/event-stream",
+            headers=_stream_headers(api_session_id, project_id),
+        )
+
+    try:
+        return await _collect_non_streaming_response(
+            claude_process=claude_process,
+            session_manager=session_manager,
+            session_id=api_session_id,
+            model=response_model,
+            project_id=project_id,
+            quota_meter=quota_meter,
+        )
+    except BaseException:
+        await claude_process.stop()
+        raise
+
+
+async def run_chat_completion(
+    app_state: Any,
+    request: ChatCompletionRequest,
+    caller: CompletionCaller,
+    project_id: str,
+) -> Dict[str, Any]:
+    """Run a non-streaming completion outside an HTTP request.
+
+    Used by background runners such as the batch scheduler; errors are raised
+    as the same HTTPExceptions the endpoint would return.
+    """
+    request = request.model_copy(update={"stream": False})
+    return await _run_completion(app_state, request, caller, project_id)
+
+
 @router.post(
     "/chat/completions",
     response_model=ChatCompletionResponse,
     responses=CHAT_COMPLETION_RESPONSES,
 )
-async def create_chat_completion(request: ChatCompletionRequest, req: Request) -> Any:
+async def create_chat_completion(
+    request: ChatCompletionRequest,
+    req: Request,
+    run_async: bool = Query(
+        False,
+        alias="async",
+        description="Run detached and return a job id to poll at /v1/jobs/{id}",
+    ),
+) -> Any:
     """Create a chat completion, compatible with OpenAI API."""
 
     # Log raw request for debugging
@@ -277,12 +972,8 @@ async def create_chat_completion(request: ChatCompletionRequest, req: Request) -
             "internal_error",
         )
 
-    # Get managers from app state
-    session_manager: SessionManager = req.app.state.session_manager
-    claude_manager = req.app.state.claude_manager
-
-    # Extract client info for logging
-    client_id = getattr(req.state, "client_id", "anonymous")
+    caller = CompletionCaller.from_request(req)
+    client_id = caller.client_id
 
     logger.info(
         "Chat completion request validated",
@@ -295,111 +986,13 @@ async def create_chat_completion(request: ChatCompletionRequest, req: Request) -
     )
 
     try:
-        requested_model = (request.model or "").strip() or None
-        # Normalize only when user explicitly requested a model.
-        claude_model = (
-            validate_claude_model(requested_model) if requested_model else None
+        return await _run_completion(
+            req.app.state,
+            request,
+            caller,
+            default_project_id=f"default-{client_id}",
+            run_async=run_async,
         )
-        response_model = claude_model or get_default_model()
-
-        user_prompt, system_prompt = _extract_prompts(request)
-
-        # Handle project context
-        project_id = request.project_id or f"default-{client_id}"
-        project_path = create_project_directory(project_id)
-
-        # Handle session management
-        session_id = await _resolve_session(
-            session_manager=session_manager,
-            request=request,
-            project_id=project_id,
-            claude_model=claude_model,
-            system_prompt=system_prompt,
-        )
-
-        # Start Claude Code process
-        try:
-
-            def _register_cli_session(cli_session_id: str):
-                session_manager.register_cli_session(session_id, cli_session_id)
-
-            claude_process = await claude_manager.create_session(
-                session_id=session_id,
-                project_path=project_path,
-                prompt=user_prompt,
-                model=claude_model,
-                system_prompt=system_prompt,
-                on_cli_session_id=_register_cli_session,
-            )
-        except ClaudeSessionConflictError as e:
-            logger.warning(
-                "Session already has an active Claude process",
-                session_id=session_id,
-                error=str(e),
-            )
-            raise _http_error(
-                status.HTTP_409_CONFLICT,
-                "The session is currently busy with another process.",
-                "invalid_request_error",
-                "session_busy",
-            ) from e
-        except ClaudeModelNotSupportedError as e:
-            logger.warning(
-                "Claude rejected requested model",
-                session_id=session_id,
-                model=claude_model,
-                error=str(e),
-            )
-            raise _http_error(
-                status.HTTP_400_BAD_REQUEST,
-                "The requested model is not supported.",
-                "invalid_request_error",
-                "model_not_supported",
-            ) from e
-        except Exception as e:
-            logger.error(
-                "Failed to create Claude session", session_id=session_id, error=str(e)
-            )
-            raise _http_error(
-                status.HTTP_503_SERVICE_UNAVAILABLE,
-                f"Failed to start Claude Code: {str(e)}",
-                "service_unavailable",
-                "claude_unavailable",
-            )
-
-        # Use Claude's actual session ID
-        api_session_id = session_id
-
-        # Update session with user message
-        await session_manager.update_session(
-            session_id=api_session_id,
-            message_content=user_prompt,
-            role="user",
-            tokens_used=estimate_tokens(user_prompt),
-        )
-
-        # Handle streaming vs non-streaming
-        if request.stream:
-            return StreamingResponse(
-                create_sse_response(api_session_id, response_model, claude_process),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no",
-                    "X-Session-ID": api_session_id,
-                    "X-Project-ID": project_id,
-                },
-            )
-
-        return await _collect_non_streaming_response(
-            claude_process=claude_process,
-            session_manager=session_manager,
-            session_id=api_session_id,
-            model=response_model,
-            project_id=project_id,
-        )
-
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -443,20 +1036,27 @@ async def get_completion_status(session_id: str, req: Request) -> Dict[str, Any]
             },
         )
 
-    # Get Claude process status
+    # Get Claude process status; the process may belong to another worker
     claude_process = claude_manager.get_session(session_id)
     is_running = claude_process is not None and claude_process.is_running
+    process_usage = claude_process.usage.to_dict() if is_running else None
+    worker_pid = await claude_manager.get_session_owner(session_id)
+    if not is_running and worker_pid is not None and worker_pid != os.getpid():
+        is_running = True
 
     return {
         "session_id": session_id,
         "project_id": session_info.project_id,
         "model": session_info.model,
         "is_running": is_running,
+        "worker_pid": worker_pid if is_running else None,
         "created_at": session_info.created_at.isoformat(),
         "updated_at": session_info.updated_at.isoformat(),
         "total_tokens": session_info.total_tokens,
         "total_cost": session_info.total_cost,
         "message_count": session_info.message_count,
+        "resource_usage": session_info.resource_usage.to_dict(),
+        "process_usage": process_usage,
     }
 
 
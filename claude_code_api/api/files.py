@@ -0,0 +1,84 @@
+"""Files API endpoint - OpenAI compatible storage for batch input and output."""
+
+from typing import Any, Dict
+
+import structlog
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, status
+from fastapi.responses import FileResponse
+
+from claude_code_api.core.batch_scheduler import BatchScheduler
+from claude_code_api.core.config import settings
+from claude_code_api.core.security import request_owner
+from claude_code_api.models.openai import FileObject
+from claude_code_api.utils.json_files import public_record
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+def _file_not_found(file_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "error": {
+                "message": f"File {file_id} not found",
+                "type": "invalid_request_error",
+                "code": "file_not_found",
+            }
+        },
+    )
+
+
+@router.post("/files", response_model=FileObject)
+async def upload_file(
+    req: Request,
+    file: UploadFile = File(...),
+    purpose: str = Form("batch"),
+) -> Dict[str, Any]:
+    """Upload a JSONL file for use with the Batch API."""
+    max_bytes = settings.batch_max_file_mb * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={
+                "error": {
+                    "message": f"File exceeds {settings.batch_max_file_mb} MB",
+                    "type": "invalid_request_error",
+                    "code": "file_too_large",
+                }
+            },
+        )
+
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    record = await scheduler.create_file(
+        filename=file.filename or "upload.jsonl",
+        purpose=purpose,
+        source=file.file,
+        owner=request_owner(req),
+    )
+    logger.info("File uploaded", file_id=record["id"], bytes=record["bytes"])
+    return public_record(record)
+
+
+@router.get("/files/{file_id}", response_model=FileObject)
+async def get_file(file_id: str, req: Request) -> Dict[str, Any]:
+    """Get file metadata."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    record = await scheduler.get_file(file_id, request_owner(req))
+    if record is None:
+        raise _file_not_found(file_id)
+    return public_record(record)
+
+
+@router.get("/files/{file_id}/content")
+async def get_file_content(file_id: str, req: Request) -> FileResponse:
+    """Download file content; batch output can be read while it is written."""
+    scheduler: BatchScheduler = req.app.state.batch_scheduler
+    record = await scheduler.get_file(file_id, request_owner(req))
+    if record is None:
+        raise _file_not_found(file_id)
+    return FileResponse(
+        scheduler.file_content_path(file_id),
+        media_type="application/jsonl",
+        filename=record["filename"],
+    )
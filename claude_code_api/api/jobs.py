@@ -0,0 +1,85 @@
+"""Jobs API endpoint - polling for detached chat completions."""
+
+from typing import Any, Dict
+
+import structlog
+from fastapi import APIRouter, HTTPException, Request, status
+
+from claude_code_api.core.jobs import JobManager, JobNotCancellableError
+from claude_code_api.core.security import request_owner
+from claude_code_api.models.openai import ChatCompletionJob
+from claude_code_api.utils.json_files import public_record
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+def _job_not_found(job_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "error": {
+                "message": f"Job {job_id} not found",
+                "type": "invalid_request_error",
+                "code": "job_not_found",
+            }
+        },
+    )
+
+
+async def _get_visible_job(req: Request, job_id: str) -> Dict[str, Any]:
+    job_manager: JobManager = req.app.state.job_manager
+    job = await job_manager.get_job(job_id, request_owner(req))
+    if job is None:
+        raise _job_not_found(job_id)
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=ChatCompletionJob)
+async def get_job(job_id: str, req: Request) -> Dict[str, Any]:
+    """Get job status, partial output while running and the final result."""
+    return public_record(await _get_visible_job(req, job_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def get_job_events(
+    job_id: str, req: Request, after: int = 0, limit: int = 100
+) -> Dict[str, Any]:
+    """Page through the raw Claude events stored for a job."""
+    job = await _get_visible_job(req, job_id)
+    job_manager: JobManager = req.app.state.job_manager
+    limit = min(max(1, limit), 1000)
+    after = max(0, after)
+    events = await job_manager.get_events(job_id, after, limit)
+    next_after = after + len(events)
+    return {
+        "object": "list",
+        "data": events,
+        "next_after": next_after,
+        "has_more": next_after < job["event_count"],
+    }
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=ChatCompletionJob)
+async def cancel_job(job_id: str, req: Request) -> Dict[str, Any]:
+    """Stop a running job."""
+    await _get_visible_job(req, job_id)
+    job_manager: JobManager = req.app.state.job_manager
+    try:
+        job = await job_manager.cancel_job(job_id, request_owner(req))
+    except JobNotCancellableError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": {
+                    "message": (
+                        f"Job {job_id} runs in another worker; cancelling it "
+                        "needs shared_state_backend=sqlite"
+                    ),
+                    "type": "invalid_request_error",
+                    "code": "job_not_cancellable",
+                }
+            },
+        )
+    logger.info("Job cancel requested", job_id=job_id)
+    return public_record(job)
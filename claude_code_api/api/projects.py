@@ -1,21 +1,35 @@
 """Projects API endpoint - Extension to OpenAI API."""
 
 import math
+import os
 import uuid
+from typing import Literal, Optional
 
 import structlog
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 
+from claude_code_api.core.archive import (
+    ARCHIVE_FORMATS,
+    ArchiveError,
+    ArchiveQuotaError,
+    import_archive,
+    stream_archive,
+)
 from claude_code_api.core.claude_manager import (
     cleanup_project_directory,
     create_project_directory,
 )
 from claude_code_api.core.config import settings
 from claude_code_api.core.database import db_manager
+from claude_code_api.core.file_index import file_index
+from claude_code_api.core.project_usage import ProjectUsage, project_usage
 from claude_code_api.core.security import ensure_directory_within_base
+from claude_code_api.core.workspace import clone_project as clone_project_tree
+from claude_code_api.models.claude import ClaudeWorkspaceListing
 from claude_code_api.models.openai import (
+    CloneProjectRequest,
     CreateProjectRequest,
     PaginatedResponse,
     PaginationInfo,
@@ -27,6 +41,39 @@ logger = structlog.get_logger()
 router = APIRouter()
 
 
+def _project_info(project, usage: Optional[ProjectUsage] = None) -> ProjectInfo:
+    quota_bytes = project_usage.max_bytes
+    return ProjectInfo(
+        id=project.id,
+        name=project.name,
+        description=project.description,
+        path=project.path,
+        created_at=project.created_at,
+        updated_at=project.updated_at,
+        is_active=project.is_active,
+        size_bytes=usage.size_bytes if usage else None,
+        file_count=usage.file_count if usage else None,
+        quota_bytes=quota_bytes if quota_bytes > 0 else None,
+    )
+
+
+async def _get_project_or_404(project_id: str):
+    """Project whose directory exists, or a project_not_found error."""
+    project = await db_manager.get_project(project_id)
+    if not project or not os.path.isdir(project.path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "message": f"Project {project_id} not found",
+                    "type": "not_found",
+                    "code": "project_not_found",
+                }
+            },
+        )
+    return project
+
+
 @router.get("/projects", response_model=PaginatedResponse)
 async def list_projects(
     page: int = 1, per_page: int = 20, req: Request = None
@@ -38,17 +85,9 @@ async def list_projects(
     total_pages = math.ceil(total_items / per_page) if total_items else 0
     projects = await db_manager.list_projects(page, per_page)
 
+    # Listing reports the last known usage; it never walks project trees.
     project_infos = [
-        ProjectInfo(
-            id=project.id,
-            name=project.name,
-            description=project.description,
-            path=project.path,
-            created_at=project.created_at,
-            updated_at=project.updated_at,
-            is_active=project.is_active,
-        )
-        for project in projects
+        _project_info(project, project_usage.peek(project.path)) for project in projects
     ]
 
     pagination = PaginationInfo(
@@ -135,14 +174,160 @@ async def get_project(project_id: str, req: Request) -> ProjectInfo:
             },
         )
 
-    return ProjectInfo(
-        id=project.id,
-        name=project.name,
-        description=project.description,
-        path=project.path,
-        created_at=project.created_at,
-        updated_at=project.updated_at,
-        is_active=project.is_active,
+    usage = None
+    if os.path.isdir(project.path):
+        usage = await project_usage.get_usage(project.path)
+    return _project_info(project, usage)
+
+
+@router.post("/projects/{project_id}/clone", response_model=ProjectInfo)
+async def clone_project(
+    project_id: str,
+    req: Request,
+    response: Response,
+    clone_request: Optional[CloneProjectRequest] = None,
+) -> ProjectInfo:
+    """Create a new project as a copy-on-write clone of an existing one."""
+
+    source = await _get_project_or_404(project_id)
+
+    clone_request = clone_request or CloneProjectRequest()
+    clone_id = str(uuid.uuid4())
+    clone_path = create_project_directory(clone_id)
+    try:
+        method = await clone_project_tree(source.path, clone_path)
+    except OSError as exc:
+        cleanup_project_directory(clone_path)
+        logger.exception("Failed to clone project", project_id=project_id)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": {
+                    "message": "Failed to clone project.",
+                    "type": "internal_error",
+                    "code": "project_clone_failed",
+                }
+            },
+        ) from exc
+
+    project_data = {
+        "id": clone_id,
+        "name": clone_request.name or f"{source.name} (clone)",
+        "description": (
+            clone_request.description
+            if clone_request.description is not None
+            else source.description
+        ),
+        "path": clone_path,
+        "created_at": utc_now(),
+        "updated_at": utc_now(),
+        "is_active": True,
+    }
+    try:
+        await db_manager.create_project(project_data)
+    except SQLAlchemyError as exc:
+        cleanup_project_directory(clone_path)
+        logger.exception("Failed to create project")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": {
+                    "message": "Failed to create project.",
+                    "type": "internal_error",
+                    "code": "project_creation_failed",
+                }
+            },
+        ) from exc
+
+    logger.info(
+        "Project cloned", project_id=project_id, clone_id=clone_id, method=method
+    )
+    response.headers["X-Clone-Method"] = method
+    return ProjectInfo(**project_data)
+
+
+@router.get("/projects/{project_id}/files", response_model=ClaudeWorkspaceListing)
+async def list_project_files(
+    project_id: str,
+    req: Request,
+    glob: Optional[str] = Query(
+        None, description="Only paths matching this pattern, e.g. 'src/*.py'"
+    ),
+    since: Optional[int] = Query(
+        None, ge=0, description="Only files changed after this cursor"
+    ),
+    after: Optional[str] = Query(None, description="Continue after this path"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> ClaudeWorkspaceListing:
+    """List project files from the incremental file index."""
+
+    project = await _get_project_or_404(project_id)
+    listing = await file_index.list_files(
+        project.path, pattern=glob, since=since, after=after, limit=limit
+    )
+    return ClaudeWorkspaceListing(**listing)
+
+
+@router.get(
+    "/projects/{project_id}/archive",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/gzip": {}, "application/zip": {}}}},
+)
+async def export_project_archive(
+    project_id: str,
+    req: Request,
+    archive_format: Literal["tar", "tar.gz", "zip"] = Query("tar.gz", alias="format"),
+) -> StreamingResponse:
+    """Stream the project directory as a tar, tar.gz or zip archive."""
+
+    project = await _get_project_or_404(project_id)
+    _, media_type = ARCHIVE_FORMATS[archive_format]
+    filename = f"{project_id}.{archive_format}"
+    return StreamingResponse(
+        stream_archive(project.path, archive_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.put("/projects/{project_id}/archive")
+async def import_project_archive(project_id: str, req: Request) -> JSONResponse:
+    """Extract an uploaded tar (optionally gzip/bz2/xz) stream into the project."""
+
+    project = await _get_project_or_404(project_id)
+    remaining = None
+    if project_usage.max_bytes > 0:
+        usage = await project_usage.get_usage(project.path)
+        remaining = max(0, project_usage.max_bytes - usage.size_bytes)
+
+    try:
+        stats = await import_archive(project.path, req.stream(), remaining)
+    except ArchiveQuotaError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail={
+                "error": {
+                    "message": str(exc),
+                    "type": "insufficient_quota",
+                    "code": "project_quota_exceeded",
+                }
+            },
+        ) from exc
+    except ArchiveError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": {
+                    "message": str(exc),
+                    "type": "invalid_request_error",
+                    "code": "invalid_archive",
+                }
+            },
+        ) from exc
+
+    logger.info("Project archive imported", project_id=project_id, **stats)
+    return JSONResponse(
+        content={"project_id": project_id, "status": "imported", **stats}
     )
 
 
@@ -166,6 +351,8 @@ async def delete_project(project_id: str, req: Request) -> JSONResponse:
     deleted = await db_manager.delete_project(project_id)
     if deleted:
         cleanup_project_directory(project.path)
+        project_usage.forget(project.path)
+        file_index.forget(project.path)
 
     logger.info("Project deleted", project_id=project_id)
 
@@ -0,0 +1,271 @@
+"""Streaming tar/zip export and tar import of project directories.
+
+Archives are produced and consumed by ``tarfile``/``zipfile`` in a worker
+thread. Data crosses to the event loop in fixed-size chunks through a small
+bounded ``asyncio.Queue``, so memory use stays constant and nothing is staged
+in a temp file. The queue also applies backpressure: a slow client slows the
+archiver down instead of letting chunks pile up.
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Dict, Optional
+
+import structlog
+from fastapi import HTTPException
+
+from .security import resolve_path_within_base
+
+logger = structlog.get_logger()
+
+CHUNK_SIZE = 64 * 1024
+QUEUE_DEPTH = 16
+
+ARCHIVE_FORMATS = {
+    "tar": ("w|", "application/x-tar"),
+    "tar.gz": ("w|gz", "application/gzip"),
+    "zip": (None, "application/zip"),
+}
+
+
+class ArchiveError(Exception):
+    """The uploaded archive is malformed or unsafe."""
+
+
+class ArchiveQuotaError(ArchiveError):
+    """The uploaded archive would push the project over its size quota."""
+
+
+class _ConsumerGone(Exception):
+    pass
+
+
+class _QueueWriter(io.RawIOBase):
+    """Write-only, unseekable file handing chunks to the event loop."""
+
+    def __init__(self, pipe: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._pipe = pipe
+        self._loop = loop
+        self._buffer = bytearray()
+        self._position = 0
+        self.cancelled = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        if len(self._buffer) >= CHUNK_SIZE:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _emit(self, item: Any) -> None:
+        if self.cancelled:
+            raise _ConsumerGone()
+        future = asyncio.run_coroutine_threadsafe(self._pipe.put(item), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return
+            except FutureTimeoutError:
+                if self.cancelled:
+                    future.cancel()
+                    raise _ConsumerGone()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if self._buffer and error is None:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+        self._emit(error)
+
+
+class _QueueReader(io.RawIOBase):
+    """Read-only file fed with chunks from the event loop."""
+
+    def __init__(self, pipe: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._pipe = pipe
+        self._loop = loop
+        self._pending = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._eof:
+            item = asyncio.run_coroutine_threadsafe(
+                self._pipe.get(), self._loop
+            ).result()
+            if isinstance(item, BaseException):
+                raise ArchiveError("Upload interrupted") from item
+            if not item:
+                self._eof = True
+            self._pending = item
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+def _iter_files(project_path: str):
+    for root, dirs, files in os.walk(project_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, project_path)
+
+
+def _write_archive(project_path: str, archive_format: str, sink: _QueueWriter) -> None:
+    if archive_format == "zip":
+        with zipfile.ZipFile(
+            sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as archive:
+            for path, arcname in _iter_files(project_path):
+                # Zip has no portable symlinks; they are skipped.
+                if not os.path.islink(path):
+                    archive.write(path, arcname)
+        return
+
+    mode, _ = ARCHIVE_FORMATS[archive_format]
+    with tarfile.open(fileobj=sink, mode=mode) as archive:
+        for name in sorted(os.listdir(project_path)):
+            archive.add(os.path.join(project_path, name), arcname=name)
+
+
+async def stream_archive(
+    project_path: str, archive_format: str = "tar.gz"
+) -> AsyncIterator[bytes]:
+    """Yield an archive of ``project_path`` as it is being written."""
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format: {archive_format}")
+    loop = asyncio.get_running_loop()
+    pipe: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_DEPTH)
+    sink = _QueueWriter(pipe, loop)
+
+    def _produce() -> None:
+        try:
+            _write_archive(project_path, archive_format, sink)
+        except _ConsumerGone:
+            return
+        except BaseException as e:
+            try:
+                sink.finish(e)
+            except _ConsumerGone:
+                pass
+            return
+        try:
+            sink.finish()
+        except _ConsumerGone:
+            pass
+
+    producer = asyncio.ensure_future(asyncio.to_thread(_produce))
+    try:
+        while True:
+            item = await pipe.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                logger.error(
+                    "Archive export failed", path=project_path, error=str(item)
+                )
+                raise item
+            yield item
+    finally:
+        sink.cancelled = True
+        while not pipe.empty():
+            pipe.get_nowait()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+def _resolve_member(name: str, project_path: str) -> str:
+    try:
+        return resolve_path_within_base(name, project_path)
+    except HTTPException as e:
+        raise ArchiveError(f"Unsafe path in archive: {name}") from e
+
+
+def _extract_archive(
+    project_path: str, source: _QueueReader, max_bytes: Optional[int]
+) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"files": 0, "directories": 0, "bytes": 0, "skipped": []}
+    try:
+        with tarfile.open(fileobj=source, mode="r|*") as archive:
+            for member in archive:
+                target = _resolve_member(member.name, project_path)
+                if member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                    stats["directories"] += 1
+                    continue
+                if not member.isfile():
+                    # Links and special files could point outside the project.
+                    stats["skipped"].append(member.name)
+                    continue
+                stats["bytes"] += member.size
+                if max_bytes is not None and stats["bytes"] > max_bytes:
+                    raise ArchiveQuotaError(
+                        f"Archive exceeds the remaining project quota of {max_bytes} bytes"
+                    )
+                directory = os.path.dirname(target)
+                os.makedirs(directory, exist_ok=True)
+                _resolve_member(member.name, project_path)
+                # Replace rather than overwrite, so a failed upload never
+                # leaves a truncated file behind.
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".import-")
+                try:
+                    with os.fdopen(fd, "wb") as out:
+                        shutil.copyfileobj(archive.extractfile(member), out, CHUNK_SIZE)
+                    os.chmod(tmp_path, member.mode & 0o777 or 0o644)
+                    os.replace(tmp_path, target)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                stats["files"] += 1
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Invalid tar archive: {e}") from e
+    except (IsADirectoryError, NotADirectoryError) as e:
+        raise ArchiveError(f"Archive conflicts with existing paths: {e}") from e
+    return stats
+
+
+async def import_archive(
+    project_path: str,
+    chunks: AsyncIterator[bytes],
+    max_bytes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Extract a (optionally compressed) tar stream into ``project_path``."""
+    loop = asyncio.get_running_loop()
+    pipe: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_DEPTH)
+
+    async def _feed() -> None:
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await pipe.put(chunk)
+            await pipe.put(b"")
+        except Exception as e:
+            await pipe.put(e)
+
+    feeder = asyncio.create_task(_feed())
+    try:
+        return await asyncio.to_thread(
+            _extract_archive, project_path, _QueueReader(pipe, loop), max_bytes
+        )
+    finally:
+        feeder.cancel()
+        await asyncio.gather(feeder, return_exceptions=True)
+        # Wake the extractor if the request was cancelled while it waited.
+        with contextlib.suppress(asyncio.QueueFull):
+            pipe.put_nowait(ConnectionError("Upload cancelled"))
@@ -1,66 +1,106 @@
 """Authentication middleware and utilities."""
 
+import asyncio
 import time
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
 
 import structlog
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from .config import settings
+from .key_registry import APIKeyRecord, key_registry
+from .metrics import rate_limit_rejections_total
+from .shared_state import (
+    RATE_WINDOW_SECONDS,
+    MemoryStateBackend,
+    StateBackend,
+    create_state_backend,
+    offload,
+)
+from .tracing import span
 
 logger = structlog.get_logger()
 
-# Simple in-memory rate limiting
-rate_limit_store = {}
+PUBLIC_PATHS = frozenset({"/", "/health", "/docs", "/redoc", "/openapi.json"})
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter."""
-
-    def __init__(self, requests_per_minute: int = 60, burst: int = 10):
+    """Sliding-window rate limiter with burst control.
+
+    Counters are kept in a ``StateBackend``; a shared backend makes the limit
+    apply across all workers instead of per process.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        burst: int = 10,
+        backend: Optional[StateBackend] = None,
+    ):
         self.requests_per_minute = requests_per_minute
         self.burst = burst
-        self.store = {}
+        self.backend = backend or MemoryStateBackend()
+        self._prune_task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
 
-    def is_allowed(self, key: str) -> bool:
+    async def is_allowed(self, key: str) -> bool:
         """Check if request is allowed for the given key."""
-        now = time.time()
-
-        if key not in self.store:
-            self.store[key] = {"requests": [], "burst_used": 0}
-
-        user_data = self.store[key]
-
-        # Remove old requests (older than 1 minute)
-        user_data["requests"] = [
-            req_time for req_time in user_data["requests"] if now - req_time < 60
-        ]
-
-        # Check burst limit
-        if user_data["burst_used"] >= self.burst:
-            # Reset burst if enough time has passed
-            if len(user_data["requests"]) == 0:
-                user_data["burst_used"] = 0
-            else:
-                return False
-
-        # Check rate limit
-        if len(user_data["requests"]) >= self.requests_per_minute:
-            return False
-
-        # Allow request
-        user_data["requests"].append(now)
-        user_data["burst_used"] += 1
-
-        return True
-
+        return await offload(
+            self.backend.check_rate,
+            key,
+            time.time(),
+            self.requests_per_minute,
+            self.burst,
+        )
 
-# Global rate limiter instance
-rate_limiter = RateLimiter(
-    requests_per_minute=settings.rate_limit_requests_per_minute,
-    burst=settings.rate_limit_burst,
-)
+    def start(self) -> None:
+        """Start pruning counters of keys that stopped sending."""
+        if self._prune_task is None or self._prune_task.done():
+            self._shutdown_event.clear()
+            self._prune_task = asyncio.create_task(self._periodic_prune())
+
+    async def _periodic_prune(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(), timeout=RATE_WINDOW_SECONDS
+                )
+                break
+            except asyncio.TimeoutError:
+                try:
+                    await offload(self.backend.prune, time.time())
+                except Exception as e:
+                    logger.error("Error pruning rate limit state", error=str(e))
+            except asyncio.CancelledError:
+                raise
+
+    async def stop(self) -> None:
+        """Stop periodic pruning."""
+        if self._prune_task and not self._prune_task.done():
+            self._shutdown_event.set()
+            await self._prune_task
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it on first use.
+
+    It is not built at import time: servers import the app before forking
+    workers, and each worker needs its own state backend connection and pid.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            requests_per_minute=settings.rate_limit_requests_per_minute,
+            burst=settings.rate_limit_burst,
+            backend=create_state_backend(),
+        )
+    return _rate_limiter
 
 
 def extract_api_key(request: Request) -> Optional[str]:
@@ -83,93 +123,183 @@ def extract_api_key(request: Request) -> Optional[str]:
     return None
 
 
+def lookup_api_key(api_key: str) -> Optional[APIKeyRecord]:
+    """Return the registry record for a valid API key, or None."""
+    if not key_registry.has_keys():
+        logger.warning("No API keys configured but authentication is required")
+        return None
+
+    return key_registry.lookup(api_key)
+
+
+def extract_api_key_from_scope(scope: Scope) -> Optional[str]:
+    """Extract API key from a raw ASGI scope, mirroring ``extract_api_key``."""
+    authorization = None
+    header_key = None
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization" and authorization is None:
+            authorization = value
+        elif name == b"x-api-key" and header_key is None:
+            header_key = value
+
+    if authorization and authorization.startswith(b"Bearer "):
+        return authorization[7:].decode("latin-1")
+    if header_key:
+        return header_key.decode("latin-1")
+
+    query_string = scope.get("query_string", b"")
+    if b"api_key" in query_string:
+        api_key = None
+        for name, value in parse_qsl(query_string.decode("latin-1")):
+            if name == "api_key":
+                api_key = value
+        if api_key:
+            return api_key
+
+    return None
+
+
 def validate_api_key(api_key: str) -> bool:
     """Validate API key against configured keys."""
     if not settings.require_auth:
         return True
 
-    if not settings.api_keys:
-        logger.warning("No API keys configured but authentication is required")
-        return False
+    return lookup_api_key(api_key) is not None
 
-    return api_key in settings.api_keys
 
+def _error_response(
+    status_code: int, message: str, error_type: str, code: str
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": code}},
+    )
 
-async def auth_middleware(request: Request, call_next):
-    """Authentication middleware."""
-    # Skip auth for public endpoints
-    public_paths = ["/", "/health", "/docs", "/redoc", "/openapi.json"]
-    if request.url.path in public_paths:
-        return await call_next(request)
 
+async def authenticate(
+    path: str, api_key: Optional[str], client_host: Optional[str]
+) -> Tuple[Optional[JSONResponse], Dict[str, Any]]:
+    """Authenticate and rate limit a request.
+
+    Returns a rejection response, or None together with the values to store
+    on the request state.
+    """
     # Skip all auth and rate limiting when authentication is disabled (test mode)
     if not settings.require_auth:
         # Still set client_id for logging
-        request.state.api_key = None
-        request.state.client_id = "testclient"
-        return await call_next(request)
-
-    # Extract API key
-    api_key = extract_api_key(request)
+        return None, {
+            "api_key": None,
+            "api_key_record": None,
+            "client_id": "testclient",
+        }
 
     # Validate API key if required
     if not api_key:
-        logger.warning(
-            "Missing API key",
-            path=request.url.path,
-            client_ip=request.client.host if request.client else "unknown",
-        )
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={
-                "error": {
-                    "message": (
-                        "Missing API key. Provide it via Authorization header "
-                        "(Bearer token) or x-api-key header."
-                    ),
-                    "type": "authentication_error",
-                    "code": "missing_api_key",
-                }
-            },
+        logger.warning("Missing API key", path=path, client_ip=client_host or "unknown")
+        return (
+            _error_response(
+                status.HTTP_401_UNAUTHORIZED,
+                "Missing API key. Provide it via Authorization header "
+                "(Bearer token) or x-api-key header.",
+                "authentication_error",
+                "missing_api_key",
+            ),
+            {},
         )
 
-    if not validate_api_key(api_key):
+    api_key_record = lookup_api_key(api_key)
+    if api_key_record is None:
         logger.warning(
             "Invalid API key",
-            path=request.url.path,
-            client_ip=request.client.host if request.client else "unknown",
-            api_key_prefix=api_key[:8] if api_key else "none",
+            path=path,
+            client_ip=client_host or "unknown",
+            api_key_prefix=api_key[:8],
         )
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={
-                "error": {
-                    "message": "Invalid API key",
-                    "type": "authentication_error",
-                    "code": "invalid_api_key",
-                }
-            },
+        return (
+            _error_response(
+                status.HTTP_401_UNAUTHORIZED,
+                "Invalid API key",
+                "authentication_error",
+                "invalid_api_key",
+            ),
+            {},
         )
 
-    # Rate limiting
-    client_id = api_key or request.client.host if request.client else "anonymous"
-    if not rate_limiter.is_allowed(client_id):
-        logger.warning(
-            "Rate limit exceeded", client_id=client_id, path=request.url.path
-        )
-        return JSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={
-                "error": {
-                    "message": "Rate limit exceeded",
-                    "type": "rate_limit_error",
-                    "code": "rate_limit_exceeded",
-                }
-            },
+    # Rate limiting; the shared backend stores the key, so never the raw one
+    client_id = api_key or client_host or "anonymous"
+    rate_key = api_key_record.key_hash
+    if not await get_rate_limiter().is_allowed(rate_key):
+        logger.warning("Rate limit exceeded", api_key_hash=rate_key[:12], path=path)
+        rate_limit_rejections_total.inc()
+        return (
+            _error_response(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Rate limit exceeded",
+                "rate_limit_error",
+                "rate_limit_exceeded",
+            ),
+            {},
         )
 
+    return None, {
+        "api_key": api_key,
+        "api_key_record": api_key_record,
+        "client_id": client_id,
+    }
+
+
+async def auth_middleware(request: Request, call_next):
+    """Authentication middleware for ``app.middleware("http")``.
+
+    The application uses ``AuthMiddleware``; this wrapper is kept for callers
+    that still register the ``call_next`` style function.
+    """
+    # Skip auth for public endpoints
+    if request.url.path in PUBLIC_PATHS:
+        return await call_next(request)
+
+    rejection, state = await authenticate(
+        request.url.path,
+        extract_api_key(request),
+        request.client.host if request.client else None,
+    )
+    if rejection is not None:
+        return rejection
+
     # Add API key to request state for downstream use
-    request.state.api_key = api_key
-    request.state.client_id = client_id
+    for name, value in state.items():
+        setattr(request.state, name, value)
 
     return await call_next(request)
+
+
+class AuthMiddleware:
+    """Pure ASGI authentication middleware.
+
+    Public paths and rejected requests are handled straight from the ASGI
+    scope without building a ``Request``, and accepted requests are passed to
+    the app untouched, so streaming responses carry no per-chunk overhead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        with span("auth"):
+            rejection, state = await authenticate(
+                scope["path"],
+                extract_api_key_from_scope(scope),
+                client[0] if client else None,
+            )
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+
+        # Request.state reads from scope["state"]
+        scope.setdefault("state", {}).update(state)
+        await self.app(scope, receive, send)
@@ -0,0 +1,605 @@
+"""Local scheduler behind the OpenAI-compatible Batch API.
+
+Uploaded JSONL files and batch records live under ``batch_storage_dir``.
+Each running batch feeds its requests to a pool of workers bounded by
+``batch_parallelism``. Results are appended to the batch's output and error
+files as they finish. Those files double as the checkpoint: after a restart,
+requests whose ``custom_id`` already appears in them are skipped.
+
+The worker running a batch holds a lease on it in the shared state backend,
+so with several workers each unfinished batch is resumed by only one of them.
+Cancels sent to another worker are flagged on the lease.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Set
+
+import structlog
+
+from claude_code_api.utils.json_files import read_json, write_json
+
+from .config import settings
+from .shared_state import StateBackend, create_state_backend, offload
+
+logger = structlog.get_logger()
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired"}
+BATCH_LEASE_PREFIX = "batch:"
+RETRYABLE_STATUS_CODES = {409, 429, 500, 502, 503, 504}
+
+
+class BatchRequestError(Exception):
+    """A batch request failed with an HTTP-style status and error body."""
+
+    def __init__(self, status_code: int, body: Dict[str, Any]):
+        super().__init__(f"Batch request failed with status {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+class BatchValidationError(ValueError):
+    """The input file cannot be run as a batch."""
+
+
+class BatchNotCancellableError(Exception):
+    """The batch runs in a worker that cannot be reached to cancel it."""
+
+
+def _lease(batch_id: str) -> str:
+    return f"{BATCH_LEASE_PREFIX}{batch_id}"
+
+
+# Called with a request body and the key hash of the batch owner.
+BatchRunner = Callable[[Dict[str, Any], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def _append_line(path: str, line: str) -> None:
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+def _truncate_partial_line(path: str) -> None:
+    """Drop a torn trailing line left by a crash mid-append."""
+    try:
+        with open(path, "rb+") as handle:
+            handle.seek(0, os.SEEK_END)
+            size = handle.tell()
+            if size == 0:
+                return
+            handle.seek(size - 1)
+            if handle.read(1) == b"\n":
+                return
+            position = size - 1
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                handle.seek(position)
+                block = handle.read(step)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    handle.truncate(position + newline + 1)
+                    return
+            handle.truncate(0)
+    except FileNotFoundError:
+        return
+
+
+def parse_batch_input(path: str) -> List[Dict[str, Any]]:
+    """Read and validate a batch input JSONL file."""
+    requests: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+    with open(path, "r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise BatchValidationError(
+                    f"Line {line_number} is not valid JSON: {e}"
+                ) from e
+            custom_id = item.get("custom_id") if isinstance(item, dict) else None
+            if not custom_id or not isinstance(custom_id, str):
+                raise BatchValidationError(f"Line {line_number} is missing custom_id")
+            if custom_id in seen:
+                raise BatchValidationError(
+                    f"Line {line_number} repeats custom_id '{custom_id}'"
+                )
+            if (
+                item.get("method", "POST") != "POST"
+                or item.get("url") != BATCH_ENDPOINT
+            ):
+                raise BatchValidationError(
+                    f"Line {line_number} must be a POST to {BATCH_ENDPOINT}"
+                )
+            if not isinstance(item.get("body"), dict):
+                raise BatchValidationError(f"Line {line_number} is missing body")
+            seen.add(custom_id)
+            requests.append(item)
+    if not requests:
+        raise BatchValidationError("Input file contains no requests")
+    return requests
+
+
+def _finished_custom_ids(path: str) -> Set[str]:
+    finished: Set[str] = set()
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    finished.add(json.loads(line)["custom_id"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return finished
+
+
+class BatchScheduler:
+    """Stores batch files and runs batches in the background."""
+
+    def __init__(
+        self,
+        runner: BatchRunner,
+        storage_dir: Optional[str] = None,
+        parallelism: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff_seconds: Optional[float] = None,
+        state_backend: Optional[StateBackend] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.runner = runner
+        storage_dir = storage_dir or settings.batch_storage_dir
+        self.files_dir = os.path.join(storage_dir, "files")
+        self.batches_dir = os.path.join(storage_dir, "batches")
+        self.parallelism = max(
+            1, settings.batch_parallelism if parallelism is None else parallelism
+        )
+        self.max_retries = (
+            settings.batch_max_retries if max_retries is None else max_retries
+        )
+        self.retry_backoff_seconds = (
+            settings.batch_retry_backoff_seconds
+            if retry_backoff_seconds is None
+            else retry_backoff_seconds
+        )
+        self._slots = asyncio.Semaphore(self.parallelism)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelling: Set[str] = set()
+        self._write_lock = asyncio.Lock()
+        self.state_backend = state_backend or create_state_backend()
+        self.poll_interval = (
+            settings.shared_state_poll_seconds
+            if poll_interval is None
+            else poll_interval
+        )
+        self._poll_task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+        os.makedirs(self.files_dir, exist_ok=True)
+        os.makedirs(self.batches_dir, exist_ok=True)
+
+    # Files
+
+    def _file_meta_path(self, file_id: str) -> str:
+        return os.path.join(self.files_dir, f"{file_id}.json")
+
+    def file_content_path(self, file_id: str) -> str:
+        return os.path.join(self.files_dir, f"{file_id}.jsonl")
+
+    def _new_file_record(
+        self, filename: str, purpose: str, owner: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": 0,
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "_owner": owner,
+        }
+
+    def _store_file(self, record: Dict[str, Any], source: Optional[BinaryIO]) -> None:
+        path = self.file_content_path(record["id"])
+        with open(path, "wb") as handle:
+            if source is not None:
+                shutil.copyfileobj(source, handle, 1024 * 1024)
+        record["bytes"] = os.path.getsize(path)
+        write_json(self._file_meta_path(record["id"]), record)
+
+    async def create_file(
+        self,
+        filename: str,
+        purpose: str,
+        source: Optional[BinaryIO],
+        owner: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Store an uploaded file and return its record."""
+        record = self._new_file_record(filename, purpose, owner)
+        await asyncio.to_thread(self._store_file, record, source)
+        return record
+
+    def _load_file(self, file_id: str) -> Optional[Dict[str, Any]]:
+        if not file_id.startswith("file-") or os.sep in file_id:
+            return None
+        record = read_json(self._file_meta_path(file_id))
+        if record is not None:
+            try:
+                record["bytes"] = os.path.getsize(self.file_content_path(file_id))
+            except OSError:
+                pass
+        return record
+
+    async def get_file(
+        self, file_id: str, owner: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the file record, or None when missing or owned by another key."""
+        record = await asyncio.to_thread(self._load_file, file_id)
+        if record is None or record.get("_owner") != owner:
+            return None
+        return record
+
+    # Batches
+
+    def _batch_path(self, batch_id: str) -> str:
+        return os.path.join(self.batches_dir, f"{batch_id}.json")
+
+    async def _save_batch(self, batch: Dict[str, Any]) -> None:
+        await asyncio.to_thread(write_json, self._batch_path(batch["id"]), batch)
+
+    def _load_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        if not batch_id.startswith("batch_") or os.sep in batch_id:
+            return None
+        return read_json(self._batch_path(batch_id))
+
+    async def get_batch(
+        self, batch_id: str, owner: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the batch record, or None when missing or owned by another key."""
+        batch = await asyncio.to_thread(self._load_batch, batch_id)
+        if batch is None or batch.get("_owner") != owner:
+            return None
+        return batch
+
+    def _load_all_batches(self) -> List[Dict[str, Any]]:
+        batches = []
+        for name in os.listdir(self.batches_dir):
+            if name.endswith(".json"):
+                batch = read_json(os.path.join(self.batches_dir, name))
+                if batch:
+                    batches.append(batch)
+        batches.sort(key=lambda b: (b["created_at"], b["id"]), reverse=True)
+        return batches
+
+    async def list_batches(
+        self, owner: Optional[str] = None, limit: int = 20, after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """List batches newest first, paging with the ``after`` cursor."""
+        batches = [
+            b
+            for b in await asyncio.to_thread(self._load_all_batches)
+            if b.get("_owner") == owner
+        ]
+        if after:
+            ids = [b["id"] for b in batches]
+            batches = batches[ids.index(after) + 1 :] if after in ids else []
+        return batches[:limit]
+
+    async def create_batch(
+        self,
+        input_file_id: str,
+        endpoint: str,
+        completion_window: str,
+        metadata: Optional[Dict[str, str]] = None,
+        owner: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Validate the input file, record the batch and start running it."""
+        if endpoint != BATCH_ENDPOINT:
+            raise BatchValidationError(f"Only {BATCH_ENDPOINT} is supported")
+        input_file = await self.get_file(input_file_id, owner)
+        if input_file is None:
+            raise BatchValidationError(f"File {input_file_id} not found")
+        requests = await asyncio.to_thread(
+            parse_batch_input, self.file_content_path(input_file_id)
+        )
+
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        output_file = await self.create_file(
+            f"{batch_id}_output.jsonl", "batch_output", None, owner
+        )
+        error_file = await self.create_file(
+            f"{batch_id}_error.jsonl", "batch_output", None, owner
+        )
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "errors": None,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "output_file_id": output_file["id"],
+            "error_file_id": error_file["id"],
+            "created_at": int(time.time()),
+            "in_progress_at": None,
+            "completed_at": None,
+            "failed_at": None,
+            "cancelling_at": None,
+            "cancelled_at": None,
+            "request_counts": {"total": len(requests), "completed": 0, "failed": 0},
+            "metadata": metadata,
+            "_owner": owner,
+            "_worker_pid": self.state_backend.pid,
+        }
+        await offload(self.state_backend.claim_lease, _lease(batch_id))
+        await self._save_batch(batch)
+        self._schedule(batch_id)
+        logger.info("Batch created", batch_id=batch_id, total=len(requests))
+        return batch
+
+    async def cancel_batch(
+        self, batch_id: str, owner: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Cancel a batch; requests already finished keep their results.
+
+        A batch run by another worker is flagged through its lease and stays
+        ``cancelling`` until that worker stops it.
+        """
+        batch = await self.get_batch(batch_id, owner)
+        if batch is None or batch["status"] in BATCH_TERMINAL_STATUSES:
+            return batch
+
+        batch["status"] = "cancelling"
+        batch["cancelling_at"] = int(time.time())
+        lease = _lease(batch_id)
+        # Not running here: either another live worker holds the lease, or
+        # this worker takes it and records the cancel itself.
+        if batch_id not in self._tasks and (
+            await offload(
+                self.state_backend.held_elsewhere, lease, batch.get("_worker_pid")
+            )
+            or not await offload(self.state_backend.claim_lease, lease)
+        ):
+            if not await offload(self.state_backend.request_cancel, lease):
+                raise BatchNotCancellableError(batch_id)
+            await self._save_batch(batch)
+            logger.info("Batch cancel sent to its worker", batch_id=batch_id)
+            return batch
+        await self._save_batch(batch)
+        return await self._finish_cancel(batch_id)
+
+    async def _finish_cancel(self, batch_id: str) -> Dict[str, Any]:
+        """Stop the local run of a leased batch and record it as cancelled."""
+        self._cancelling.add(batch_id)
+        try:
+            task = self._tasks.get(batch_id)
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+            batch = await asyncio.to_thread(self._load_batch, batch_id)
+            # A run that finished before the cancel arrived keeps its outcome.
+            if batch["status"] not in BATCH_TERMINAL_STATUSES:
+                batch["status"] = "cancelled"
+                batch["cancelling_at"] = batch["cancelling_at"] or int(time.time())
+                batch["cancelled_at"] = int(time.time())
+                await self._save_batch(batch)
+        finally:
+            self._cancelling.discard(batch_id)
+            await offload(self.state_backend.release_lease, _lease(batch_id))
+        logger.info("Batch cancelled", batch_id=batch_id)
+        return batch
+
+    def _schedule(self, batch_id: str) -> None:
+        task = asyncio.create_task(self._run_leased(batch_id))
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch_id, None))
+
+    async def _run_leased(self, batch_id: str) -> None:
+        try:
+            await self._run_batch(batch_id)
+        finally:
+            # A cancel releases the lease once it has recorded the outcome.
+            if batch_id not in self._cancelling:
+                await offload(self.state_backend.release_lease, _lease(batch_id))
+
+    async def start(self) -> None:
+        """Resume unfinished batches whose worker is gone; watch for cancels."""
+        for batch in await asyncio.to_thread(self._load_all_batches):
+            batch_id = batch["id"]
+            if batch["status"] in BATCH_TERMINAL_STATUSES or batch_id in self._tasks:
+                continue
+            lease = _lease(batch_id)
+            if await offload(
+                self.state_backend.held_elsewhere, lease, batch.get("_worker_pid")
+            ) or not await offload(self.state_backend.claim_lease, lease):
+                continue
+            if batch["status"] == "cancelling":
+                batch["status"] = "cancelled"
+                batch["cancelled_at"] = int(time.time())
+                await self._save_batch(batch)
+                await offload(self.state_backend.release_lease, lease)
+                continue
+            logger.info("Resuming batch", batch_id=batch_id)
+            self._schedule(batch_id)
+        if self._poll_task is None or self._poll_task.done():
+            self._shutdown_event.clear()
+            self._poll_task = asyncio.create_task(self._watch_cancels())
+
+    async def _watch_cancels(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(), timeout=self.poll_interval
+                )
+                break
+            except asyncio.TimeoutError:
+                await self._apply_cancels()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error checking batch cancels", error=str(e))
+
+    async def _apply_cancels(self) -> None:
+        """Cancel local batches that another worker asked to stop."""
+        for name in await offload(self.state_backend.pending_cancels):
+            if not name.startswith(BATCH_LEASE_PREFIX):
+                continue
+            batch_id = name[len(BATCH_LEASE_PREFIX) :]
+            if batch_id in self._tasks:
+                await self._finish_cancel(batch_id)
+            else:
+                await offload(self.state_backend.release_lease, name)
+
+    async def stop(self) -> None:
+        """Stop running batches; they resume from their checkpoint on start."""
+        if self._poll_task and not self._poll_task.done():
+            self._shutdown_event.set()
+            await self._poll_task
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _prepare_run(self, batch: Dict[str, Any]):
+        requests = parse_batch_input(self.file_content_path(batch["input_file_id"]))
+        output_path = self.file_content_path(batch["output_file_id"])
+        error_path = self.file_content_path(batch["error_file_id"])
+        _truncate_partial_line(output_path)
+        _truncate_partial_line(error_path)
+        completed = _finished_custom_ids(output_path)
+        failed = _finished_custom_ids(error_path)
+        return requests, completed, failed
+
+    async def _run_batch(self, batch_id: str) -> None:
+        batch = await asyncio.to_thread(self._load_batch, batch_id)
+        if batch is None:
+            return
+        batch["_worker_pid"] = self.state_backend.pid
+        try:
+            requests, completed, failed = await asyncio.to_thread(
+                self._prepare_run, batch
+            )
+        except (OSError, BatchValidationError) as e:
+            batch["status"] = "failed"
+            batch["failed_at"] = int(time.time())
+            batch["errors"] = {
+                "object": "list",
+                "data": [{"code": "invalid_input", "message": str(e)}],
+            }
+            await self._save_batch(batch)
+            return
+
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = batch["in_progress_at"] or int(time.time())
+        batch["request_counts"] = {
+            "total": len(requests),
+            "completed": len(completed),
+            "failed": len(failed),
+        }
+        await self._save_batch(batch)
+
+        pending = [
+            item
+            for item in requests
+            if item["custom_id"] not in completed and item["custom_id"] not in failed
+        ]
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        async def _worker():
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._run_request(batch, item)
+
+        workers = [
+            asyncio.create_task(_worker())
+            for _ in range(min(self.parallelism, len(pending)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        counts = batch["request_counts"]
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+        if counts["failed"] == 0:
+            batch["error_file_id"] = None
+        if counts["completed"] == 0:
+            batch["output_file_id"] = None
+        await self._save_batch(batch)
+        logger.info("Batch completed", batch_id=batch_id, **counts)
+
+    async def _execute(self, body: Dict[str, Any], owner: Optional[str]):
+        attempt = 0
+        while True:
+            try:
+                async with self._slots:
+                    return 200, await self.runner(body, owner)
+            except asyncio.CancelledError:
+                raise
+            except BatchRequestError as e:
+                status_code, error_body = e.status_code, e.body
+            except Exception as e:
+                logger.error("Batch request crashed", error=str(e))
+                status_code = 500
+                error_body = {
+                    "error": {
+                        "message": str(e),
+                        "type": "internal_error",
+                        "code": "internal_error",
+                    }
+                }
+            if status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                return status_code, error_body
+            await asyncio.sleep(self.retry_backoff_seconds * (2**attempt))
+            attempt += 1
+
+    async def _run_request(self, batch: Dict[str, Any], item: Dict[str, Any]) -> None:
+        status_code, body = await self._execute(item["body"], batch.get("_owner"))
+        line: Dict[str, Any] = {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": item["custom_id"],
+            "response": {
+                "status_code": status_code,
+                "request_id": body.get("id") if status_code == 200 else None,
+                "body": body,
+            },
+            "error": None,
+        }
+        if status_code == 200:
+            file_id = batch["output_file_id"]
+            counter = "completed"
+        else:
+            file_id = batch["error_file_id"]
+            counter = "failed"
+            error = body.get("error") if isinstance(body, dict) else None
+            if isinstance(error, dict):
+                line["error"] = {
+                    "code": error.get("code"),
+                    "message": error.get("message"),
+                }
+
+        async with self._write_lock:
+            await asyncio.to_thread(
+                _append_line, self.file_content_path(file_id), json.dumps(line)
+            )
+            batch["request_counts"][counter] += 1
+            await self._save_batch(batch)
@@ -4,18 +4,31 @@ import asyncio
 import json
 import os
 import subprocess
+import time
 from collections import deque
-from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Set
 
 import structlog
 
 from claude_code_api.models.claude import get_available_models, get_default_model
 
 from .config import settings
+from .metrics import (
+    claude_first_event_seconds,
+    claude_output_queue_depth,
+    claude_run_events,
+    claude_spawn_seconds,
+)
+from .process_limits import ProcessLimits, cgroups, limit_wrapper
+from .process_stats import ProcessUsage, observe_run, read_proc_usage
 from .security import ensure_directory_within_base
+from .shared_state import StateBackend, create_state_backend, offload
+from .tracing import NOOP_SPAN, span, start_span
 
 logger = structlog.get_logger()
 
+CGROUP_EXIT_GRACE_SECONDS = 10.0
+
 
 class ClaudeProcess:
     """Manages a single Claude Code process."""
@@ -26,6 +39,8 @@ class ClaudeProcess:
         project_path: str,
         on_cli_session_id: Optional[Callable[[str], None]] = None,
         on_end: Optional[Callable[["ClaudeProcess"], None]] = None,
+        on_usage: Optional[Callable[[ProcessUsage], None]] = None,
+        limits: Optional[ProcessLimits] = None,
     ):
         self.session_id = session_id
         self.cli_session_id: Optional[str] = None
@@ -38,8 +53,17 @@ class ClaudeProcess:
         self._error_task: Optional[asyncio.Task] = None
         self._on_cli_session_id = on_cli_session_id
         self._on_end = on_end
+        self._on_usage = on_usage
+        self.usage = ProcessUsage()
+        self.limits = limits or ProcessLimits.from_settings()
+        self.cgroup_path: Optional[str] = None
+        self._cgroup_task: Optional[asyncio.Task] = None
         self.last_error: Optional[str] = None
         self._stderr_tail: deque[str] = deque(maxlen=20)
+        self._spawned_at: Optional[float] = None
+        self._run_span = NOOP_SPAN
+        self._first_event_span = NOOP_SPAN
+        self._tool_spans: Dict[str, Any] = {}
 
     async def start(
         self,
@@ -78,6 +102,7 @@ class ClaudeProcess:
             )
 
             # Start process from src directory (where Claude works without API key)
+            # unless tool edits should land in the project directory.
             src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
             safe_cmd: List[str] = []
             redact_next = False
@@ -91,17 +116,39 @@ class ClaudeProcess:
                     redact_next = True
                     continue
                 safe_cmd.append(part)
-            logger.info(f"Starting Claude from directory: {src_dir}")
+            cwd = self.project_path if settings.claude_cwd_in_project else src_dir
+            logger.info(f"Starting Claude from directory: {cwd}")
             logger.info(f"Command: {' '.join(safe_cmd)}")
 
             # Start process asynchronously
-            self.process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=src_dir,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                stdin=asyncio.subprocess.PIPE,
+            self._run_span = start_span(
+                "claude.run",
+                session_id=self.session_id,
+                model=model or get_default_model(),
+            )
+            self._first_event_span = start_span(
+                "claude.first_event", parent=self._run_span
             )
+            self._spawned_at = time.perf_counter()
+            with span("claude.spawn", parent=self._run_span):
+                if cgroups.root:
+                    self.cgroup_path = await asyncio.to_thread(
+                        cgroups.create, self.limits
+                    )
+                if self.cgroup_path is None:
+                    cmd = limit_wrapper(self.limits) + cmd
+                self.process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    cwd=cwd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    stdin=asyncio.subprocess.PIPE,
+                )
+                if self.cgroup_path is not None:
+                    # Inline rather than in a thread: cgroupfs writes never
+                    # block, and the CLI must not start tools outside.
+                    cgroups.attach(self.cgroup_path, self.process.pid)
+            self._run_span.set_attribute("process.pid", self.process.pid)
 
             self.is_running = True
 
@@ -109,15 +156,19 @@ class ClaudeProcess:
             self._output_task = asyncio.create_task(self._read_output())
             self._error_task = asyncio.create_task(self._read_error())
 
-            started = await self._verify_startup()
+            with span("claude.startup_check", parent=self._run_span):
+                started = await self._verify_startup()
             if not started:
+                self._run_span.set_error(self.last_error or "startup failed")
                 await self.stop()
                 return False
 
+            claude_spawn_seconds.observe(time.perf_counter() - self._spawned_at)
             return True
 
         except Exception as e:
             self.last_error = str(e)
+            self._run_span.set_error(str(e))
             await self.stop()
             logger.error(
                 "Failed to start Claude process",
@@ -126,6 +177,22 @@ class ClaudeProcess:
             )
             return False
 
+    @property
+    def pid(self) -> Optional[int]:
+        """Pid of the child while it has not been reaped."""
+        if self.process is None or self.process.returncode is not None:
+            return None
+        return self.process.pid
+
+    def _sample_usage(self) -> None:
+        # A last read before the child is reaped. procfs reads never touch
+        # the disk, and a thread hop would lose the race with the watcher.
+        pid = self.pid
+        if pid is not None:
+            sample = read_proc_usage(pid)
+            if sample is not None:
+                self.usage.update(sample)
+
     def _decode_output_line(self, line: bytes) -> Optional[Dict[str, Any]]:
         line_text = line.decode().strip()
         if not line_text:
@@ -142,6 +209,7 @@ class ClaudeProcess:
     async def _read_output(self):
         """Read stdout from process line by line."""
         claude_session_id = None
+        events = 0
 
         try:
             while self.is_running and self.process:
@@ -152,6 +220,13 @@ class ClaudeProcess:
                 data = self._decode_output_line(line)
                 if not data:
                     continue
+                if events == 0 and self._spawned_at is not None:
+                    claude_first_event_seconds.observe(
+                        time.perf_counter() - self._spawned_at
+                    )
+                    self._first_event_span.end()
+                events += 1
+                self._trace_tool_event(data)
 
                 # Extract Claude's session ID from the first message
                 if not claude_session_id and data.get("session_id"):
@@ -163,10 +238,21 @@ class ClaudeProcess:
                     if self._on_cli_session_id:
                         self._on_cli_session_id(claude_session_id)
 
+                claude_output_queue_depth.observe(self.output_queue.qsize())
                 await self.output_queue.put(data)
         except Exception as e:
             logger.error("Error reading output", error=str(e))
         finally:
+            claude_run_events.observe(events)
+            self._sample_usage()
+            # Set before the span ends; an ended span may be on the exporter.
+            self._run_span.set_attribute("process.cpu_seconds", self.usage.cpu_seconds)
+            self._end_spans(events)
+            observe_run(self.usage)
+            if self._on_usage:
+                self._on_usage(self.usage)
+            if self.cgroup_path is not None:
+                self._cgroup_task = asyncio.create_task(self._release_cgroup())
             await self.output_queue.put(None)
             self.is_running = False
 
@@ -176,6 +262,68 @@ class ClaudeProcess:
             if self._on_end:
                 self._on_end(self)
 
+    async def _release_cgroup(self, wait: bool = True) -> None:
+        """Remove the run's cgroup, killing tools the CLI left behind.
+
+        The CLI may still be saving session state after closing stdout, so
+        it gets ``CGROUP_EXIT_GRACE_SECONDS`` to exit first.
+        """
+        path, self.cgroup_path = self.cgroup_path, None
+        if path is None:
+            return
+        process = self.process
+        if wait and process is not None:
+            try:
+                await asyncio.wait_for(
+                    process.wait(), timeout=CGROUP_EXIT_GRACE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.to_thread(cgroups.remove, path)
+
+    def _trace_tool_event(self, data: Dict[str, Any]) -> None:
+        """Time each tool_use from the assistant until its tool_result."""
+        event_type = data.get("type")
+        # The CLI reports tool results in "user" events; older fixtures use
+        # a "tool_result" event type.
+        if self._run_span is NOOP_SPAN or event_type not in (
+            "assistant",
+            "user",
+            "tool_result",
+        ):
+            return
+        content = (data.get("message") or {}).get("content")
+        if not isinstance(content, list):
+            return
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            if event_type == "assistant" and block.get("type") == "tool_use":
+                name = block.get("name") or "unknown"
+                self._tool_spans[block.get("id")] = start_span(
+                    f"tool.{name}",
+                    parent=self._run_span,
+                    **{"tool.name": name, "tool.use_id": block.get("id")},
+                )
+            elif event_type != "assistant" and block.get("type") == "tool_result":
+                tool_span = self._tool_spans.pop(block.get("tool_use_id"), None)
+                if tool_span is not None:
+                    if block.get("is_error"):
+                        tool_span.set_error("tool_result is_error")
+                    tool_span.end()
+
+    def _end_spans(self, events: Optional[int] = None) -> None:
+        for tool_span in self._tool_spans.values():
+            tool_span.set_error("no tool_result")
+            tool_span.end()
+        self._tool_spans.clear()
+        if events == 0:
+            self._first_event_span.set_error("no output")
+        self._first_event_span.end()
+        if events is not None:
+            self._run_span.set_attribute("claude.events", events)
+        self._run_span.end()
+
     async def _read_error(self):
         """Read stderr from process."""
         try:
@@ -226,13 +374,21 @@ class ClaudeProcess:
             return f"Claude exited with code {return_code}: {' | '.join(self._stderr_tail)}"
         return f"Claude exited with code {return_code}"
 
-    async def get_output(self) -> AsyncGenerator[Dict[str, Any], None]:
-        """Get output from Claude process."""
+    async def get_output(
+        self, timeout: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Get output from Claude process.
+
+        ``timeout`` is the longest silence tolerated between events; it
+        defaults to ``streaming_timeout_seconds`` and 0 waits indefinitely.
+        """
+        if timeout is None:
+            timeout = settings.streaming_timeout_seconds
         while True:
             try:
                 # Wait for output with timeout
                 output = await asyncio.wait_for(
-                    self.output_queue.get(), timeout=settings.streaming_timeout_seconds
+                    self.output_queue.get(), timeout=timeout or None
                 )
 
                 if output is None:  # End signal
@@ -263,6 +419,7 @@ class ClaudeProcess:
     async def stop(self):
         """Stop Claude process."""
         self.is_running = False
+        self._sample_usage()
 
         for task in (self._output_task, self._error_task):
             if task and not task.done():
@@ -284,6 +441,8 @@ class ClaudeProcess:
                 self._output_task = None
                 self._error_task = None
 
+        await self._release_cgroup(wait=False)
+        self._end_spans()
         logger.info("Claude process stopped", session_id=self.session_id)
 
 
@@ -343,14 +502,22 @@ def _resolve_opus_45_fallback(model_id: Optional[str]) -> Optional[str]:
     return opus_45_models[-1]
 
 
+PROCESS_SLOT_POOL = "claude_processes"
+
+
 class ClaudeManager:
     """Manages multiple Claude Code processes."""
 
-    def __init__(self):
+    def __init__(self, state_backend: Optional[StateBackend] = None):
         self.processes: Dict[str, ClaudeProcess] = {}
         self.cli_session_index: Dict[str, str] = {}
         self.max_concurrent = settings.max_concurrent_sessions
+        self.state_backend = state_backend or create_state_backend()
         self._session_lock = asyncio.Lock()
+        # Sessions with a reserved slot whose process is still starting up.
+        self._starting: Set[str] = set()
+        # Slot releases still running in a thread, by session id.
+        self._releases: Dict[str, asyncio.Task] = {}
 
     async def get_version(self) -> str:
         """Get Claude Code version."""
@@ -379,20 +546,71 @@ class ClaudeManager:
                 f"Failed to get Claude version: {str(exc)}"
             ) from exc
 
-    def _ensure_session_capacity(self, session_id: str) -> None:
+    async def _ensure_session_capacity(self, session_id: str) -> None:
         existing_process = self.processes.get(session_id)
-        if existing_process and existing_process.is_running:
+        if session_id in self._starting or (
+            existing_process and existing_process.is_running
+        ):
             raise ClaudeSessionConflictError(
                 f"Session {session_id} already has an active Claude process"
             )
         if existing_process and not existing_process.is_running:
             self._cleanup_process(existing_process)
 
-        if len(self.processes) >= self.max_concurrent:
+        if len(self.processes) + len(self._starting) >= self.max_concurrent:
+            raise ClaudeConcurrencyError(
+                f"Maximum concurrent sessions ({self.max_concurrent}) reached"
+            )
+
+        # The previous run's release must land before this run claims,
+        # or it would delete the new claim.
+        pending = self._releases.get(session_id)
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+
+        backend = self.state_backend
+        if not await offload(backend.claim_session, session_id):
+            raise ClaudeSessionConflictError(
+                f"Session {session_id} is running in another worker"
+            )
+        if not await offload(
+            backend.acquire_slot, PROCESS_SLOT_POOL, session_id, self.max_concurrent
+        ):
+            await offload(backend.release_session, session_id)
             raise ClaudeConcurrencyError(
                 f"Maximum concurrent sessions ({self.max_concurrent}) reached"
             )
 
+    def _release_capacity_now(self, session_id: str) -> None:
+        self.state_backend.release_slot(PROCESS_SLOT_POOL, session_id)
+        self.state_backend.release_session(session_id)
+
+    def _release_session_capacity(self, session_id: str) -> None:
+        """Release the session's slot; in a thread for blocking backends.
+
+        Called from synchronous callbacks, so a blocking release runs as a
+        task that the next claim of the same session waits for.
+        """
+        if not self.state_backend.blocking:
+            self._release_capacity_now(session_id)
+            return
+        task = asyncio.create_task(
+            asyncio.to_thread(self._release_capacity_now, session_id)
+        )
+        self._releases[session_id] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if self._releases.get(session_id) is finished:
+                del self._releases[session_id]
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.error(
+                    "Failed to release session slot",
+                    session_id=session_id,
+                    error=str(finished.exception()),
+                )
+
+        task.add_done_callback(_done)
+
     def _build_model_candidates(self, model: Optional[str]) -> List[Optional[str]]:
         candidates: List[Optional[str]] = [model]
         fallback_model = _resolve_opus_45_fallback(model)
@@ -405,6 +623,8 @@ class ClaudeManager:
         session_id: str,
         project_path: str,
         on_cli_session_id: Optional[Callable[[str], None]],
+        on_usage: Optional[Callable[[ProcessUsage], None]] = None,
+        limits: Optional[ProcessLimits] = None,
     ) -> ClaudeProcess:
         def _handle_cli_session_id(cli_session_id: str):
             self._register_cli_session(session_id, cli_session_id)
@@ -416,6 +636,8 @@ class ClaudeManager:
             project_path=project_path,
             on_cli_session_id=_handle_cli_session_id,
             on_end=self._cleanup_process,
+            on_usage=on_usage,
+            limits=limits,
         )
 
     def _raise_model_not_supported(
@@ -440,6 +662,8 @@ class ClaudeManager:
         selected_model: Optional[str],
         system_prompt: Optional[str],
         on_cli_session_id: Optional[Callable[[str], None]],
+        on_usage: Optional[Callable[[ProcessUsage], None]] = None,
+        limits: Optional[ProcessLimits] = None,
     ) -> ClaudeProcess:
         model_candidates = self._build_model_candidates(selected_model)
         last_error = "Failed to start Claude process"
@@ -449,6 +673,8 @@ class ClaudeManager:
                 session_id=session_id,
                 project_path=project_path,
                 on_cli_session_id=on_cli_session_id,
+                on_usage=on_usage,
+                limits=limits,
             )
             success = await process.start(
                 prompt=prompt,
@@ -458,6 +684,10 @@ class ClaudeManager:
 
             if success:
                 self.processes[session_id] = process
+                if not process.is_running:
+                    # Output ended during the startup check, so on_end ran
+                    # before registration; release the slot now.
+                    self._cleanup_process(process)
                 if idx > 0:
                     logger.warning(
                         "Model fallback activated after rejection",
@@ -502,20 +732,39 @@ class ClaudeManager:
         model: Optional[str] = None,
         system_prompt: Optional[str] = None,
         on_cli_session_id: Optional[Callable[[str], None]] = None,
+        on_usage: Optional[Callable[[ProcessUsage], None]] = None,
+        limits: Optional[ProcessLimits] = None,
     ) -> ClaudeProcess:
-        """Create new Claude session."""
-        async with self._session_lock:
-            self._ensure_session_capacity(session_id)
-            await asyncio.to_thread(os.makedirs, project_path, exist_ok=True)
+        """Create new Claude session.
 
-            return await self._start_with_fallback_models(
-                session_id=session_id,
-                project_path=project_path,
-                prompt=prompt,
-                selected_model=model,
-                system_prompt=system_prompt,
-                on_cli_session_id=on_cli_session_id,
-            )
+        ``on_usage`` receives the run's resource usage when its output ends;
+        ``limits`` defaults to the process limits from settings.
+        """
+        # Reserve the slot under the lock, but start outside it so concurrent
+        # requests (and n > 1 choices) do not queue behind startup checks.
+        async with self._session_lock:
+            await self._ensure_session_capacity(session_id)
+            self._starting.add(session_id)
+        try:
+            with span("claude.create_session", session_id=session_id):
+                await asyncio.to_thread(os.makedirs, project_path, exist_ok=True)
+
+                return await self._start_with_fallback_models(
+                    session_id=session_id,
+                    project_path=project_path,
+                    prompt=prompt,
+                    selected_model=model,
+                    system_prompt=system_prompt,
+                    on_cli_session_id=on_cli_session_id,
+                    on_usage=on_usage,
+                    limits=limits,
+                )
+        except BaseException:
+            if session_id not in self.processes:
+                self._release_session_capacity(session_id)
+            raise
+        finally:
+            self._starting.discard(session_id)
 
     async def _stop_session_locked(self, session_id: str) -> None:
         resolved_id = self._resolve_session_id(session_id)
@@ -549,6 +798,8 @@ class ClaudeManager:
         async with self._session_lock:
             for session_id in tuple(self.processes):
                 await self._stop_session_locked(session_id)
+            await asyncio.gather(*self._releases.values(), return_exceptions=True)
+            await offload(self.state_backend.release_worker)
 
         logger.info("All Claude sessions cleaned up")
 
@@ -556,6 +807,15 @@ class ClaudeManager:
         """Get list of active session IDs."""
         return list(self.processes.keys())
 
+    async def get_session_owner(self, session_id: str) -> Optional[int]:
+        """PID of the worker running ``session_id``, possibly another worker."""
+        resolved_id = self._resolve_session_id(session_id) or session_id
+        return await offload(self.state_backend.get_session_owner, resolved_id)
+
+    async def get_host_process_count(self) -> int:
+        """Number of Claude processes running across all workers."""
+        return await offload(self.state_backend.count_slots, PROCESS_SLOT_POOL)
+
     async def continue_conversation(self, session_id: str, prompt: str) -> bool:
         """Continue existing conversation."""
         resolved_id = self._resolve_session_id(session_id)
@@ -580,8 +840,9 @@ class ClaudeManager:
 
     def _cleanup_process(self, process: ClaudeProcess):
         api_session_id = process.session_id
-        if api_session_id in self.processes:
+        if self.processes.get(api_session_id) is process:
             del self.processes[api_session_id]
+            self._release_session_capacity(api_session_id)
         if process.cli_session_id:
             self.cli_session_index.pop(process.cli_session_id, None)
 
@@ -64,6 +64,36 @@ def default_session_map_path() -> str:
     return os.path.join(os.getcwd(), "claude_sessions", "session_map.json")
 
 
+def default_shared_state_path() -> str:
+    """Default path for state shared between worker processes."""
+    return os.path.join(os.getcwd(), "claude_sessions", "shared_state.db")
+
+
+def default_response_cache_dir() -> str:
+    """Default directory for the on-disk response cache tier."""
+    return os.path.join(os.getcwd(), "claude_sessions", "response_cache")
+
+
+def default_batch_storage_dir() -> str:
+    """Default directory for batch input, output and checkpoint files."""
+    return os.path.join(os.getcwd(), "claude_sessions", "batches")
+
+
+def default_job_storage_dir() -> str:
+    """Default directory for async job records and event logs."""
+    return os.path.join(os.getcwd(), "claude_sessions", "jobs")
+
+
+def default_workspace_root() -> str:
+    """Default directory for per-run copies of project workspaces."""
+    return os.path.join(os.getcwd(), "claude_sessions", "workspaces")
+
+
+def default_trace_file_path() -> str:
+    """Return default OTLP/JSON trace file path."""
+    return os.path.join(os.getcwd(), "dist", "traces", "claude-code-api.jsonl")
+
+
 def default_log_file_path() -> str:
     """Default path for application logs."""
     return os.path.join(os.getcwd(), "dist", "logs", "claude-code-api.log")
@@ -143,18 +173,46 @@ class Settings(BaseSettings):
             return [x.strip() for x in v.split(",") if x.strip()]
         return v or []
 
+    api_key_policies_path: str = ""
+    api_keys_reload_interval_seconds: int = 60
+
     # Claude Configuration
     claude_binary_path: str = find_claude_binary()
     claude_api_key: str = ""
     default_model: str = "claude-sonnet-4-5-20250929"
     max_concurrent_sessions: int = 10
     session_timeout_minutes: int = 30
+    # How often idle sessions are checked for expiry
+    session_expiry_check_seconds: float = 5.0
+    # Sessions kept in memory; older ones are reloaded from the database
+    max_active_sessions: int = 10000
+    # Cache lookups of unknown or ended session ids
+    session_negative_cache_size: int = 10000
+    session_negative_cache_ttl_seconds: float = 30.0
+    # Run the CLI inside the project directory instead of the package directory
+    claude_cwd_in_project: bool = False
+    # Upper bound for parallel samples per request (OpenAI ``n``)
+    max_choices: int = 8
 
     # Project Configuration
     project_root: str = default_project_root()
+    # Per-project disk quota (0 disables); enforced before and during runs
     max_project_size_mb: int = 1000
-    cleanup_interval_minutes: int = 60
+    project_usage_poll_seconds: float = 5.0
+    project_usage_full_rescan_seconds: int = 300
+    # Evict idle default-* projects, least recently used first, once disk
+    # usage under project_root passes the high watermark. Off by default: a
+    # worker only sees its own processes and sessions as busy.
+    project_gc_enabled: bool = False
+    project_gc_interval_seconds: int = 300
+    project_gc_high_watermark_percent: float = 90.0
+    project_gc_low_watermark_percent: float = 80.0
+    project_gc_min_idle_minutes: int = 60
+    project_gc_batch_size: int = 20
     session_map_path: str = default_session_map_path()
+    workspace_root: str = default_workspace_root()
+    # Project clones: "auto" (reflink, else copy) or "copy"
+    workspace_clone_mode: str = "auto"
 
     # Database Configuration
     database_url: str = "sqlite:///./claude_api.db"
@@ -190,6 +248,65 @@ class Settings(BaseSettings):
     rate_limit_requests_per_minute: int = 100
     rate_limit_burst: int = 10
 
+    # Per-API-key quotas (0 disables a limit)
+    quota_tokens_per_minute: int = 0
+    quota_cost_per_day_usd: float = 0.0
+    quota_flush_interval_seconds: int = 30
+
+    # Shared state between workers ("memory" per process, "sqlite" host-wide)
+    shared_state_backend: str = "memory"
+    shared_state_path: str = default_shared_state_path()
+    # How often a worker checks for cancels sent to its jobs and batches
+    shared_state_poll_seconds: float = 1.0
+
+    # Response cache for identical completions (opt-in)
+    response_cache_enabled: bool = False
+    response_cache_ttl_seconds: int = 3600
+    response_cache_max_entries: int = 256
+    response_cache_dir: str = default_response_cache_dir()
+    response_cache_disk_max_mb: int = 256
+    response_cache_project_fingerprint: bool = False
+
+    # Share one Claude run between identical concurrent requests (opt-in)
+    single_flight_enabled: bool = False
+
+    # Batch API
+    batch_storage_dir: str = default_batch_storage_dir()
+    batch_parallelism: int = 2
+    batch_max_retries: int = 2
+    batch_retry_backoff_seconds: float = 2.0
+    batch_max_file_mb: int = 100
+
+    # Async jobs (?async=true); idle timeout 0 waits indefinitely
+    job_storage_dir: str = default_job_storage_dir()
+    job_idle_timeout_seconds: int = 3600
+
+    # Sample CPU, memory and I/O of running Claude processes from /proc
+    # (0 disables periodic samples; each run is still read when it ends)
+    process_sample_interval_seconds: float = 2.0
+    # Per-run resource limits for Claude processes (0 leaves a limit unset);
+    # API key policies may override them. With process_cgroup_root set to a
+    # delegated cgroup v2 directory each run gets its own child cgroup,
+    # otherwise the limits fall back to setrlimit and nice.
+    process_cgroup_root: str = ""
+    process_cpu_weight: int = 0
+    process_memory_max_mb: int = 0
+    process_pids_max: int = 0
+
+    # Event-loop lag monitor; stalls past the threshold get stack samples
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_seconds: float = 0.05
+    loop_lag_threshold_seconds: float = 0.1
+    # Request tracing: Server-Timing headers, and OTLP/JSON export of whole
+    # traces when tracing_exporter is "stdout" or "file"
+    tracing_enabled: bool = True
+    tracing_server_timing: bool = True
+    tracing_exporter: str = ""
+    tracing_file_path: str = default_trace_file_path()
+    # On-demand sampling profiler (GET /admin/profile)
+    profile_max_seconds: int = 60
+    profile_interval_ms: float = 10.0
+
     # Streaming Configuration
     streaming_chunk_size: int = 1024
     streaming_timeout_seconds: int = 300
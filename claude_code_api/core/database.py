@@ -1,5 +1,6 @@
 """Database models and connection management."""
 
+import functools
 from typing import AsyncGenerator, List, Optional
 
 import structlog
@@ -24,6 +25,8 @@ from claude_code_api.models.claude import get_default_model
 from claude_code_api.utils.time import utc_now
 
 from .config import settings
+from .metrics import db_write_seconds
+from .tracing import span
 
 logger = structlog.get_logger()
 
@@ -148,6 +151,20 @@ async def close_database():
     logger.info("Database connections closed")
 
 
+def _timed_write(func):
+    """Time and trace a database write under its method name."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with (
+            span(f"db.{func.__name__}"),
+            db_write_seconds.time(operation=func.__name__),
+        ):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
 # Database utilities
 class DatabaseManager:
     """Database operations manager."""
@@ -183,6 +200,7 @@ class DatabaseManager:
             return int(result.scalar_one() or 0)
 
     @staticmethod
+    @_timed_write
     async def create_project(project_data: dict) -> Project:
         """Create new project."""
         async with AsyncSessionLocal() as session:
@@ -193,6 +211,7 @@ class DatabaseManager:
             return project
 
     @staticmethod
+    @_timed_write
     async def delete_project(project_id: str) -> bool:
         """Delete project by ID."""
         async with AsyncSessionLocal() as session:
@@ -211,6 +230,7 @@ class DatabaseManager:
             return result
 
     @staticmethod
+    @_timed_write
     async def create_session(session_data: dict) -> Session:
         """Create new session."""
         async with AsyncSessionLocal() as session:
@@ -221,6 +241,7 @@ class DatabaseManager:
             return session_obj
 
     @staticmethod
+    @_timed_write
     async def add_message(message_data: dict) -> Message:
         """Add message to session."""
         async with AsyncSessionLocal() as session:
@@ -231,6 +252,7 @@ class DatabaseManager:
             return message
 
     @staticmethod
+    @_timed_write
     async def update_session_metrics(session_id: str, tokens_used: int, cost: float):
         """Update session usage metrics."""
         async with AsyncSessionLocal() as session:
@@ -248,6 +270,35 @@ class DatabaseManager:
             await session.commit()
 
     @staticmethod
+    @_timed_write
+    async def record_api_key_usage(
+        key_hash: str,
+        requests: int = 0,
+        tokens: int = 0,
+        cost: float = 0.0,
+        last_used_at=None,
+    ):
+        """Add usage deltas to an API key, creating its row on first use.
+
+        Rows created here only track usage for keys configured outside the
+        database, so they are inactive and never accepted as credentials.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(APIKey).where(APIKey.key_hash == key_hash)
+            )
+            api_key = result.scalar_one_or_none()
+            if api_key is None:
+                api_key = APIKey(key_hash=key_hash, is_active=False)
+                session.add(api_key)
+            api_key.total_requests = (api_key.total_requests or 0) + requests
+            api_key.total_tokens = (api_key.total_tokens or 0) + tokens
+            api_key.total_cost = (api_key.total_cost or 0.0) + cost
+            api_key.last_used_at = last_used_at or utc_now()
+            await session.commit()
+
+    @staticmethod
+    @_timed_write
     async def deactivate_session(session_id: str):
         """Mark session as inactive."""
         async with AsyncSessionLocal() as session:
@@ -257,6 +308,21 @@ class DatabaseManager:
                 session_obj.updated_at = utc_now()
                 await session.commit()
 
+    @staticmethod
+    @_timed_write
+    async def deactivate_sessions(session_ids: List[str]):
+        """Mark several sessions inactive in one statement."""
+        if not session_ids:
+            return
+        async with AsyncSessionLocal() as session:
+            stmt = (
+                update(Session)
+                .where(Session.id.in_(session_ids))
+                .values(is_active=False, updated_at=utc_now())
+            )
+            await session.execute(stmt)
+            await session.commit()
+
 
 # Create global database manager instance
 db_manager = DatabaseManager()
@@ -0,0 +1,126 @@
+"""Paged, filterable listings of project files.
+
+Listings read the per-directory cache that ``project_usage`` keeps for each
+project, so a poll costs one incremental refresh (a ``stat`` per directory)
+instead of a walk. The sorted path list is rebuilt only when that refresh saw
+a change. Cursors are the cache's change counter: ``since=<cursor>`` returns
+only files changed after it, plus the paths removed since.
+"""
+
+import bisect
+import fnmatch
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .project_usage import ProjectUsage, ProjectUsageTracker, project_usage
+
+CLAUDE_MD = "CLAUDE.md"
+
+
+def _file_info(usage: ProjectUsage, rel_path: str) -> Dict[str, Any]:
+    directory, name = os.path.split(rel_path)
+    size, mtime_ns, _ = usage.dirs[directory].files[name]
+    extension = os.path.splitext(name)[1].lstrip(".")
+    return {
+        "path": rel_path,
+        "name": name,
+        "size": size,
+        "modified_at": datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc),
+        "is_directory": False,
+        "extension": extension or None,
+    }
+
+
+def _file_size(usage: ProjectUsage, rel_path: str) -> int:
+    directory, name = os.path.split(rel_path)
+    return usage.dirs[directory].files[name][0]
+
+
+class FileIndex:
+    """Builds listings and change feeds from the project usage cache."""
+
+    def __init__(self, tracker: Optional[ProjectUsageTracker] = None):
+        self.tracker = tracker or project_usage
+        # project root -> (usage seq, sorted relative paths)
+        self._sorted: Dict[str, Tuple[int, List[str]]] = {}
+
+    def _paths(self, usage: ProjectUsage) -> List[str]:
+        cached = self._sorted.get(usage.root)
+        if cached is not None and cached[0] == usage.seq:
+            return cached[1]
+        paths = sorted(usage.file_seq)
+        self._sorted[usage.root] = (usage.seq, paths)
+        return paths
+
+    def _listing(
+        self,
+        usage: ProjectUsage,
+        pattern: Optional[str],
+        since: Optional[int],
+        after: Optional[str],
+        limit: int,
+    ) -> Dict[str, Any]:
+        paths = self._paths(usage)
+        if pattern:
+            paths = [path for path in paths if fnmatch.fnmatchcase(path, pattern)]
+
+        # Cursors from before pruned removals, or from a previous gateway run.
+        reset = since is not None and not (usage.oldest_cursor <= since <= usage.seq)
+        matches = paths
+        removed: List[str] = []
+        if since is not None and not reset:
+            matches = [path for path in paths if usage.file_seq[path] > since]
+            removed = sorted(
+                path
+                for path, seq in usage.removed.items()
+                if seq > since and (not pattern or fnmatch.fnmatchcase(path, pattern))
+            )
+
+        start = bisect.bisect_right(matches, after) if after else 0
+        page = matches[start : start + limit]
+        has_more = start + limit < len(matches)
+        return {
+            "path": usage.root,
+            "files": [_file_info(usage, path) for path in page],
+            "total_files": len(paths),
+            "total_size": (
+                sum(_file_size(usage, path) for path in paths)
+                if pattern
+                else usage.size_bytes
+            ),
+            "claude_md_files": [
+                path for path in paths if os.path.basename(path) == CLAUDE_MD
+            ],
+            "cursor": usage.seq,
+            "has_more": has_more,
+            "next_after": page[-1] if has_more and page else None,
+            "removed": removed,
+            "reset": reset,
+        }
+
+    async def list_files(
+        self,
+        project_path: str,
+        pattern: Optional[str] = None,
+        since: Optional[int] = None,
+        after: Optional[str] = None,
+        limit: int = 100,
+    ) -> Dict[str, Any]:
+        """List files under ``project_path``, sorted by relative path.
+
+        ``after`` continues a page from the last path seen. With ``since``,
+        only files changed after that cursor are listed; ``reset`` is True
+        when the cursor is too old and the caller should relist from scratch.
+        """
+        return await self.tracker.query(
+            project_path,
+            lambda usage: self._listing(usage, pattern, since, after, limit),
+        )
+
+    def forget(self, project_path: str) -> None:
+        """Drop the cached listing of a deleted project."""
+        self._sorted.pop(os.path.abspath(project_path), None)
+
+
+file_index = FileIndex()
@@ -0,0 +1,383 @@
+"""Detached chat completion jobs.
+
+``POST /v1/chat/completions?async=true`` hands the Claude process to a job
+and returns at once. The job task drains the process with
+``job_idle_timeout_seconds`` instead of the streaming timeout. It appends
+every event to ``<job_id>.events.jsonl`` as it arrives and keeps the assistant
+text seen so far for polling. The final response is stored in the job record.
+
+The worker running a job holds a lease on it in the shared state backend.
+Other workers read the job from its files, send cancels through the lease,
+and fail the job only once its worker is gone.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import structlog
+
+from claude_code_api.utils.json_files import read_json, write_json
+from claude_code_api.utils.parser import ClaudeOutputParser, normalize_claude_message
+
+from .config import settings
+from .shared_state import StateBackend, create_state_backend, offload
+
+logger = structlog.get_logger()
+
+JOB_TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+JOB_LEASE_PREFIX = "job:"
+
+
+class JobNotCancellableError(Exception):
+    """The job runs in a worker that cannot be reached to cancel it."""
+
+
+def _lease(job_id: str) -> str:
+    return f"{JOB_LEASE_PREFIX}{job_id}"
+
+
+def _assistant_text(parser: ClaudeOutputParser, event: Dict[str, Any]) -> str:
+    message = normalize_claude_message(event)
+    if message and parser.is_assistant_message(message):
+        return parser.extract_text_content(message).strip()
+    return ""
+
+
+def _append_lines(path: str, lines: List[str]) -> None:
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write("".join(line + "\n" for line in lines))
+
+
+def _read_events(path: str, after: int, limit: int) -> List[Dict[str, Any]]:
+    events: List[Dict[str, Any]] = []
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for index, line in enumerate(handle):
+                if index < after:
+                    continue
+                if len(events) >= limit:
+                    break
+                events.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def _replay_events(path: str) -> Tuple[int, str]:
+    """Event count and assistant text so far, for a job run by another worker."""
+    parser = ClaudeOutputParser()
+    count = 0
+    texts: List[str] = []
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                count += 1
+                text = _assistant_text(parser, json.loads(line))
+                if text:
+                    texts.append(text)
+    except FileNotFoundError:
+        pass
+    return count, "\n".join(texts)
+
+
+class Job:
+    """In-memory state of a running job."""
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.parser = ClaudeOutputParser()
+        self.partial_output: List[str] = []
+        self.pending_lines: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+        self.process = None
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        self.record["event_count"] += 1
+        self.pending_lines.append(json.dumps(event))
+        text = _assistant_text(self.parser, event)
+        if text:
+            self.partial_output.append(text)
+
+
+class JobProcess:
+    """Process view that records events on the job while they are consumed."""
+
+    def __init__(self, manager: "JobManager", job: Job, process):
+        self._manager = manager
+        self._job = job
+        self._process = process
+
+    def __getattr__(self, name: str):
+        return getattr(self._process, name)
+
+    async def get_output(
+        self, timeout: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        idle_timeout = settings.job_idle_timeout_seconds if timeout is None else timeout
+        async for event in self._process.get_output(timeout=idle_timeout):
+            self._job.observe(event)
+            await self._manager._flush_events(self._job)
+            yield event
+
+
+class JobManager:
+    """Runs completions detached from the HTTP request that started them."""
+
+    def __init__(
+        self,
+        storage_dir: Optional[str] = None,
+        state_backend: Optional[StateBackend] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.storage_dir = storage_dir or settings.job_storage_dir
+        self.jobs: Dict[str, Job] = {}
+        self.state_backend = state_backend or create_state_backend()
+        self.poll_interval = (
+            settings.shared_state_poll_seconds
+            if poll_interval is None
+            else poll_interval
+        )
+        self._poll_task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{job_id}.json")
+
+    def _events_path(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{job_id}.events.jsonl")
+
+    async def _save(self, record: Dict[str, Any]) -> None:
+        await asyncio.to_thread(write_json, self._record_path(record["id"]), record)
+
+    async def _flush_events(self, job: Job) -> None:
+        lines, job.pending_lines = job.pending_lines, []
+        if lines:
+            await asyncio.to_thread(
+                _append_lines, self._events_path(job.record["id"]), lines
+            )
+
+    async def submit(
+        self,
+        process,
+        run: Callable[[Any], Awaitable[Dict[str, Any]]],
+        session_id: str,
+        project_id: str,
+        model: str,
+        owner: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Start a job that drives ``run(job_process)`` to completion."""
+        record = {
+            "id": f"job_{uuid.uuid4().hex}",
+            "object": "chat.completion.job",
+            "status": "running",
+            "session_id": session_id,
+            "project_id": project_id,
+            "model": model,
+            "created_at": int(time.time()),
+            "completed_at": None,
+            "event_count": 0,
+            "result": None,
+            "error": None,
+            "_owner": owner,
+            "_worker_pid": self.state_backend.pid,
+        }
+        await offload(self.state_backend.claim_lease, _lease(record["id"]))
+        await self._save(record)
+        job = Job(record)
+        job.process = process
+        self.jobs[record["id"]] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        logger.info("Job started", job_id=record["id"], session_id=session_id)
+        return record
+
+    async def _run(
+        self, job: Job, run: Callable[[Any], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        record = job.record
+        try:
+            record["result"] = await run(JobProcess(self, job, job.process))
+            record["status"] = "completed"
+        except asyncio.CancelledError:
+            record["status"] = "cancelled"
+            await job.process.stop()
+            raise
+        except Exception as e:
+            logger.error("Job failed", job_id=record["id"], error=str(e))
+            detail = getattr(e, "detail", None)
+            record["error"] = (
+                detail["error"]
+                if isinstance(detail, dict) and "error" in detail
+                else {"message": str(e), "type": "internal_error", "code": "job_failed"}
+            )
+            record["status"] = "failed"
+        finally:
+            await self._finish(job)
+
+    async def _finish(self, job: Job) -> None:
+        job.record["completed_at"] = int(time.time())
+        await self._flush_events(job)
+        await self._save(job.record)
+        self.jobs.pop(job.record["id"], None)
+        await offload(self.state_backend.release_lease, _lease(job.record["id"]))
+
+    async def _cancel(self, job: Job) -> None:
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+        if job.record["status"] not in JOB_TERMINAL_STATUSES:
+            # Cancelled before _run started, so it never recorded the outcome.
+            job.record["status"] = "cancelled"
+            await job.process.stop()
+            await self._finish(job)
+
+    async def get_job(
+        self, job_id: str, owner: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the job with any partial output, or None when not visible."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            record = dict(job.record)
+            record["partial_output"] = "\n".join(job.partial_output)
+        else:
+            if not job_id.startswith("job_") or os.sep in job_id:
+                return None
+            record = await self._load_job(job_id)
+            if record is None:
+                return None
+        if record.get("_owner") != owner:
+            return None
+        return record
+
+    async def _load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Read a job this worker is not running from its files."""
+        record = await asyncio.to_thread(read_json, self._record_path(job_id))
+        if record is None:
+            return None
+        partial_output = None
+        if record["status"] not in JOB_TERMINAL_STATUSES:
+            if await self._worker_alive(record):
+                record["event_count"], partial_output = await asyncio.to_thread(
+                    _replay_events, self._events_path(job_id)
+                )
+            else:
+                await self._interrupt(record)
+        record["partial_output"] = partial_output
+        return record
+
+    async def get_events(
+        self, job_id: str, after: int = 0, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Read stored events starting at index ``after``."""
+        return await asyncio.to_thread(
+            _read_events, self._events_path(job_id), after, limit
+        )
+
+    async def cancel_job(
+        self, job_id: str, owner: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Stop a running job.
+
+        A job run by another worker is flagged through its lease and comes
+        back as ``cancelling`` until that worker stops it.
+        """
+        record = await self.get_job(job_id, owner)
+        if record is None or record["status"] in JOB_TERMINAL_STATUSES:
+            return record
+        job = self.jobs.get(job_id)
+        if job is not None:
+            if job.task is not None:
+                await self._cancel(job)
+            return await self.get_job(job_id, owner)
+        if await offload(self.state_backend.request_cancel, _lease(job_id)):
+            return {**record, "status": "cancelling"}
+        # The worker finished or exited in the meantime, or it is only
+        # reachable through a shared backend.
+        record = await self.get_job(job_id, owner)
+        if record is not None and record["status"] not in JOB_TERMINAL_STATUSES:
+            raise JobNotCancellableError(job_id)
+        return record
+
+    async def _worker_alive(self, record: Dict[str, Any]) -> bool:
+        """Whether another live worker is still running the job."""
+        return await offload(
+            self.state_backend.held_elsewhere,
+            _lease(record["id"]),
+            record.get("_worker_pid"),
+        )
+
+    async def _interrupt(self, record: Dict[str, Any]) -> None:
+        record["status"] = "failed"
+        record["completed_at"] = int(time.time())
+        record["error"] = {
+            "message": "The worker running the job exited before it finished",
+            "type": "service_unavailable",
+            "code": "job_interrupted",
+        }
+        await self._save(record)
+        logger.warning("Job interrupted", job_id=record["id"])
+
+    def _unfinished_records(self) -> List[Dict[str, Any]]:
+        records = []
+        for name in os.listdir(self.storage_dir):
+            if not name.endswith(".json"):
+                continue
+            record = read_json(os.path.join(self.storage_dir, name))
+            if record and record.get("status") not in JOB_TERMINAL_STATUSES:
+                records.append(record)
+        return records
+
+    async def start(self) -> None:
+        """Fail jobs whose worker is gone and start watching for cancels."""
+        for record in await asyncio.to_thread(self._unfinished_records):
+            if record["id"] not in self.jobs and not await self._worker_alive(record):
+                await self._interrupt(record)
+        if self._poll_task is None or self._poll_task.done():
+            self._shutdown_event.clear()
+            self._poll_task = asyncio.create_task(self._watch_cancels())
+
+    async def _watch_cancels(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(), timeout=self.poll_interval
+                )
+                break
+            except asyncio.TimeoutError:
+                await self._apply_cancels()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error checking job cancels", error=str(e))
+
+    async def _apply_cancels(self) -> None:
+        """Cancel local jobs that another worker asked to stop."""
+        for name in await offload(self.state_backend.pending_cancels):
+            if not name.startswith(JOB_LEASE_PREFIX):
+                continue
+            job = self.jobs.get(name[len(JOB_LEASE_PREFIX) :])
+            if job is not None and job.task is not None:
+                logger.info("Job cancelled by another worker", job_id=job.record["id"])
+                await self._cancel(job)
+            else:
+                await offload(self.state_backend.release_lease, name)
+
+    async def stop(self) -> None:
+        """Stop watching for cancels and cancel running jobs."""
+        if self._poll_task and not self._poll_task.done():
+            self._shutdown_event.set()
+            await self._poll_task
+        jobs = [job for job in self.jobs.values() if job.task]
+        await asyncio.gather(*(self._cancel(job) for job in jobs))
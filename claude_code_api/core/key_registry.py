@@ -0,0 +1,253 @@
+"""Precomputed API key registry.
+
+Keys from ``settings.api_keys``, the optional ``api_key_policies_path`` JSON
+file and active rows of the ``api_keys`` table are hashed once and stored in
+a dict keyed by SHA-256 digest. Validation is a single digest computation and
+dict lookup, and the matching record carries the per-key policy (quotas,
+allowed models, process limits) so later stages need no further lookups.
+
+Only digests are compared, never the presented key, so lookup timing reveals
+nothing usable about valid keys: finding one by timing would mean steering a
+SHA-256 output, which is a preimage problem.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import select
+
+from .config import settings
+from .database import APIKey, AsyncSessionLocal
+from .process_limits import ProcessLimits
+from .quota import QuotaLimits
+from .security import hash_api_key
+
+logger = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class APIKeyRecord:
+    """A known API key and the policy attached to it."""
+
+    key_hash: str
+    name: Optional[str] = None
+    source: str = "settings"
+    allowed_models: Optional[FrozenSet[str]] = None
+    tokens_per_minute: Optional[int] = None
+    cost_per_day_usd: Optional[float] = None
+    is_admin: bool = False
+    cpu_weight: Optional[int] = None
+    memory_max_mb: Optional[int] = None
+    pids_max: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict, compare=False)
+
+    def allows_model(self, model: Optional[str]) -> bool:
+        """Return True when the key may use ``model``."""
+        if not self.allowed_models or model is None:
+            return True
+        return model in self.allowed_models
+
+    def quota_limits(self) -> QuotaLimits:
+        """Quota limits for this key, falling back to global settings."""
+        defaults = QuotaLimits.from_settings()
+        return QuotaLimits(
+            tokens_per_minute=(
+                defaults.tokens_per_minute
+                if self.tokens_per_minute is None
+                else self.tokens_per_minute
+            ),
+            cost_per_day_usd=(
+                defaults.cost_per_day_usd
+                if self.cost_per_day_usd is None
+                else self.cost_per_day_usd
+            ),
+        )
+
+    def process_limits(self) -> ProcessLimits:
+        """Claude process limits for this key, falling back to global settings."""
+        defaults = ProcessLimits.from_settings()
+        return ProcessLimits(
+            cpu_weight=(
+                defaults.cpu_weight if self.cpu_weight is None else self.cpu_weight
+            ),
+            memory_max_bytes=(
+                defaults.memory_max_bytes
+                if self.memory_max_mb is None
+                else self.memory_max_mb * 1024 * 1024
+            ),
+            pids_max=defaults.pids_max if self.pids_max is None else self.pids_max,
+        )
+
+
+def _record_from_policy(entry: Dict[str, Any]) -> Optional[APIKeyRecord]:
+    key_hash = entry.get("key_hash")
+    if not key_hash and entry.get("key"):
+        key_hash = hash_api_key(str(entry["key"]))
+    if not key_hash:
+        return None
+    allowed_models = entry.get("allowed_models")
+    known = {
+        "key",
+        "key_hash",
+        "name",
+        "allowed_models",
+        "tokens_per_minute",
+        "cost_per_day_usd",
+        "is_admin",
+        "cpu_weight",
+        "memory_max_mb",
+        "pids_max",
+    }
+    return APIKeyRecord(
+        key_hash=str(key_hash).lower(),
+        name=entry.get("name"),
+        source="policy",
+        allowed_models=frozenset(allowed_models) if allowed_models else None,
+        tokens_per_minute=entry.get("tokens_per_minute"),
+        cost_per_day_usd=entry.get("cost_per_day_usd"),
+        is_admin=bool(entry.get("is_admin", False)),
+        cpu_weight=entry.get("cpu_weight"),
+        memory_max_mb=entry.get("memory_max_mb"),
+        pids_max=entry.get("pids_max"),
+        metadata={k: v for k, v in entry.items() if k not in known},
+    )
+
+
+def load_policy_file(path: str) -> List[APIKeyRecord]:
+    """Read key policies from a JSON list (or ``{"keys": [...]}``) file."""
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    entries = data.get("keys", []) if isinstance(data, dict) else data
+    records = []
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, dict):
+            record = _record_from_policy(entry)
+            if record:
+                records.append(record)
+    return records
+
+
+async def load_db_keys() -> List[APIKeyRecord]:
+    """Load active keys managed in the ``api_keys`` table."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(APIKey).where(APIKey.is_active))
+        return [
+            APIKeyRecord(key_hash=row.key_hash.lower(), name=row.name, source="db")
+            for row in result.scalars().all()
+        ]
+
+
+class KeyRegistry:
+    """Hash-indexed view of every valid API key."""
+
+    def __init__(self):
+        self._static: Dict[str, APIKeyRecord] = {}
+        self._records: Dict[str, APIKeyRecord] = {}
+        self._settings_keys: Optional[List[str]] = None
+        self._settings_len = -1
+        # (path, mtime) of the policy file behind the loaded policy records
+        self._policy_stamp: Optional[Tuple[str, float]] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+
+    def _settings_changed(self) -> bool:
+        keys = settings.api_keys
+        return keys is not self._settings_keys or len(keys) != self._settings_len
+
+    def _rebuild(self) -> None:
+        keys = settings.api_keys
+        records = dict(self._static)
+        for key in keys:
+            key_hash = hash_api_key(key)
+            # Policy entries carry metadata; keep them over bare settings keys.
+            records.setdefault(key_hash, APIKeyRecord(key_hash=key_hash))
+        self._records = records
+        self._settings_keys = keys
+        self._settings_len = len(keys)
+
+    def has_keys(self) -> bool:
+        """Return True when at least one key is configured."""
+        if self._settings_changed():
+            self._rebuild()
+        return bool(self._records)
+
+    def lookup(self, api_key: str) -> Optional[APIKeyRecord]:
+        """Return the record for ``api_key`` or None when it is unknown."""
+        if self._settings_changed():
+            self._rebuild()
+        return self._records.get(hash_api_key(api_key))
+
+    def lookup_hash(self, key_hash: str) -> Optional[APIKeyRecord]:
+        """Return the record for a stored key hash, or None when unknown."""
+        if self._settings_changed():
+            self._rebuild()
+        return self._records.get(key_hash)
+
+    async def reload(self) -> None:
+        """Reload policy file and database keys, then swap them in."""
+        static: Dict[str, APIKeyRecord] = {}
+        try:
+            for record in await load_db_keys():
+                static[record.key_hash] = record
+        except Exception as e:
+            logger.warning("Failed to load API keys from database", error=str(e))
+            static.update({k: v for k, v in self._static.items() if v.source == "db"})
+
+        path = settings.api_key_policies_path
+        previous_policies = {
+            k: v for k, v in self._static.items() if v.source == "policy"
+        }
+        stamp = None
+        if path:
+            try:
+                stamp = (path, os.path.getmtime(path))
+                if stamp == self._policy_stamp:
+                    static.update(previous_policies)
+                else:
+                    for record in await asyncio.to_thread(load_policy_file, path):
+                        static[record.key_hash] = record
+            except FileNotFoundError:
+                stamp = None
+            except Exception as e:
+                logger.warning("Failed to load API key policies", error=str(e))
+                static.update(previous_policies)
+                # Parse again next time even if the file is left as it is.
+                stamp = None
+        self._policy_stamp = stamp
+
+        self._static = static
+        self._rebuild()
+        logger.info("API key registry loaded", keys=len(self._records))
+
+    def start(self) -> None:
+        """Start periodic hot reload."""
+        if self._reload_task is None or self._reload_task.done():
+            self._shutdown_event.clear()
+            self._reload_task = asyncio.create_task(self._periodic_reload())
+
+    async def _periodic_reload(self) -> None:
+        interval = max(1, settings.api_keys_reload_interval_seconds)
+        while True:
+            try:
+                await asyncio.wait_for(self._shutdown_event.wait(), timeout=interval)
+                break
+            except asyncio.TimeoutError:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error reloading API keys", error=str(e))
+
+    async def stop(self) -> None:
+        """Stop periodic hot reload."""
+        if self._reload_task and not self._reload_task.done():
+            self._shutdown_event.set()
+            await self._reload_task
+
+
+# Global key registry instance
+key_registry = KeyRegistry()
@@ -0,0 +1,264 @@
+"""Event-loop lag monitor with stack sampling of slow callbacks.
+
+A heartbeat task wakes every ``loop_monitor_interval_seconds`` and records
+how late it ran. A watchdog thread checks the heartbeat; while the loop has
+been stuck longer than ``loop_lag_threshold_seconds`` it samples the loop
+thread's stack with ``sys._current_frames``. Samples are grouped by stack,
+so the report lists the code that blocked the loop most often, not just that
+it happened.
+
+The stall-sample counter is labelled by module only, which keeps the number
+of series bounded; ``report()`` has the per-line stacks.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from .config import settings
+from .metrics import registry
+
+logger = structlog.get_logger()
+
+STACK_DEPTH = 24
+MAX_OFFENDERS = 200
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+event_loop_lag_seconds = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the loop monitor heartbeat ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_stalls_total = registry.counter(
+    "event_loop_stalls_total",
+    "Heartbeats delayed past the loop lag threshold.",
+)
+event_loop_stall_samples_total = registry.counter(
+    "event_loop_stall_samples_total",
+    "Stack samples taken while the event loop was stalled, by culprit module.",
+    labelnames=("module",),
+)
+
+FrameKey = Tuple[Tuple[str, int, str], ...]
+
+
+def stack_key(frame, depth: int = STACK_DEPTH) -> FrameKey:
+    """Innermost ``depth`` frames of ``frame`` as (file, line, function)."""
+    summary = traceback.StackSummary.extract(
+        traceback.walk_stack(frame), limit=depth, lookup_lines=False
+    )
+    return tuple(
+        (entry.filename, entry.lineno, entry.name) for entry in reversed(summary)
+    )
+
+
+def _culprit_frame(stack: FrameKey) -> Optional[Tuple[str, int, str]]:
+    for frame in reversed(stack):
+        if frame[0].startswith(PACKAGE_DIR):
+            return frame
+    return stack[-1] if stack else None
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(PACKAGE_DIR):
+        return os.path.relpath(filename, PACKAGE_DIR)
+    return os.path.basename(filename)
+
+
+def culprit(stack: FrameKey) -> str:
+    """Innermost frame from this package, else the innermost frame."""
+    frame = _culprit_frame(stack)
+    if frame is None:
+        return "<unknown>"
+    filename, lineno, name = frame
+    return f"{name} ({_short_path(filename)}:{lineno})"
+
+
+def culprit_module(stack: FrameKey) -> str:
+    """Module of the culprit frame, such as ``core.session_manager``."""
+    frame = _culprit_frame(stack)
+    if frame is None:
+        return "<unknown>"
+    module, _ = os.path.splitext(_short_path(frame[0]))
+    return module.replace(os.sep, ".")
+
+
+def format_frame(frame: Tuple[str, int, str]) -> str:
+    filename, lineno, name = frame
+    return f"{name} ({filename}:{lineno})"
+
+
+class _Offender:
+    __slots__ = ("samples", "stalled_seconds", "first_seen", "last_seen")
+
+    def __init__(self, now: float):
+        self.samples = 0
+        self.stalled_seconds = 0.0
+        self.first_seen = now
+        self.last_seen = now
+
+
+class LoopMonitor:
+    """Measures event-loop lag and samples the stacks that cause it."""
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        threshold: Optional[float] = None,
+    ):
+        self._interval = interval
+        self._threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown_event = asyncio.Event()
+        self._thread_stop = threading.Event()
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self.offenders: Dict[FrameKey, _Offender] = {}
+        self._pending_culprits: List[Tuple[str, str]] = []
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    @property
+    def interval(self) -> float:
+        if self._interval is not None:
+            return self._interval
+        return max(0.001, settings.loop_monitor_interval_seconds)
+
+    @property
+    def threshold(self) -> float:
+        if self._threshold is not None:
+            return self._threshold
+        return settings.loop_lag_threshold_seconds
+
+    def start(self) -> None:
+        """Start the heartbeat task and the watchdog thread."""
+        if self._task is None or self._task.done():
+            self._shutdown_event.clear()
+            self._thread_stop.clear()
+            self._loop_thread_id = threading.get_ident()
+            self._last_beat = time.monotonic()
+            self._task = asyncio.create_task(self._heartbeat())
+            self._thread = threading.Thread(
+                target=self._watch, name="loop-monitor", daemon=True
+            )
+            self._thread.start()
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(), timeout=self.interval
+                )
+                break
+            except asyncio.TimeoutError:
+                lag = max(0.0, loop.time() - expected)
+                self._last_beat = time.monotonic()
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                event_loop_lag_seconds.observe(lag)
+                if lag >= self.threshold:
+                    self.stalls += 1
+                    event_loop_stalls_total.inc()
+                    culprits = self._drain_culprits()
+                    logger.warning(
+                        "Event loop stalled",
+                        lag_ms=round(lag * 1000, 1),
+                        culprits=sorted(set(culprits)),
+                    )
+            except asyncio.CancelledError:
+                raise
+
+    def _watch(self) -> None:
+        # Sample a few times per threshold so short stalls are still caught.
+        period = max(0.001, min(self.interval, self.threshold) / 2)
+        while not self._thread_stop.wait(period):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self.record_sample(stack_key(frame), period)
+
+    def record_sample(self, stack: FrameKey, weight: float) -> None:
+        """Attribute ``weight`` seconds of stall to ``stack``."""
+        now = time.time()
+        with self._lock:
+            offender = self.offenders.get(stack)
+            if offender is None:
+                if len(self.offenders) >= MAX_OFFENDERS:
+                    coldest = min(
+                        self.offenders, key=lambda key: self.offenders[key].samples
+                    )
+                    del self.offenders[coldest]
+                offender = self.offenders[stack] = _Offender(now)
+            offender.samples += 1
+            offender.stalled_seconds += weight
+            offender.last_seen = now
+            self._pending_culprits.append((culprit(stack), culprit_module(stack)))
+
+    def _drain_culprits(self) -> List[str]:
+        # Metrics are only touched on the loop, so the watchdog queues its
+        # samples and the heartbeat counts them once the loop is free again.
+        with self._lock:
+            pending, self._pending_culprits = self._pending_culprits, []
+        for _, module in pending:
+            event_loop_stall_samples_total.inc(module=module)
+        return [name for name, _ in pending]
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        """Lag summary and the stacks sampled most often during stalls."""
+        with self._lock:
+            ranked = sorted(
+                self.offenders.items(), key=lambda item: item[1].samples, reverse=True
+            )[:limit]
+            offenders: List[Dict[str, Any]] = [
+                {
+                    "culprit": culprit(stack),
+                    "samples": offender.samples,
+                    "stalled_seconds": round(offender.stalled_seconds, 4),
+                    "first_seen": offender.first_seen,
+                    "last_seen": offender.last_seen,
+                    "stack": [format_frame(frame) for frame in stack],
+                }
+                for stack, offender in ranked
+            ]
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "last_lag_seconds": round(self.last_lag, 6),
+            "max_lag_seconds": round(self.max_lag, 6),
+            "stalls": self.stalls,
+            "offenders": offenders,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.offenders.clear()
+            self._pending_culprits.clear()
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    async def stop(self) -> None:
+        """Stop the heartbeat and the watchdog."""
+        self._thread_stop.set()
+        if self._task and not self._task.done():
+            self._shutdown_event.set()
+            await self._task
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,340 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Metrics are plain counters updated in place on the event loop: there are no
+locks, and recording a value costs a bisect plus a few integer adds. A scrape
+only formats the current values, and gauges that mirror live state (such as
+running processes) are computed by callbacks at scrape time.
+"""
+
+import bisect
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Request paths timed by ``MetricsMiddleware``; a fixed set keeps labels bounded.
+TIMED_PATHS = frozenset({"/v1/chat/completions"})
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for the current values."""
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Current value, either set directly or read from a callback."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Optional[Callable[[], float]]) -> None:
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+
+    def _child(self, labels: Dict[str, str]) -> _HistogramChild:
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            # One extra slot for values above the last bucket (+Inf).
+            child = self._children[key] = _HistogramChild(len(self.buckets) + 1)
+        return child
+
+    def observe(self, value: float, **labels: str) -> None:
+        child = self._child(labels)
+        child.counts[bisect.bisect_left(self.buckets, value)] += 1
+        child.sum += value
+        child.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        child = self._children.get(self._key(labels))
+        return child.count if child else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, bucket_count in zip(
+                self.buckets + (float("inf"),), child.counts
+            ):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def histogram(
+        self, name: str, documentation: str, buckets=LATENCY_BUCKETS, labelnames=()
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+claude_spawn_seconds = registry.histogram(
+    "claude_spawn_seconds",
+    "Time to spawn a Claude process and verify it started.",
+)
+claude_first_event_seconds = registry.histogram(
+    "claude_first_event_seconds",
+    "Time from spawning a Claude process to its first stdout event.",
+)
+claude_run_events = registry.histogram(
+    "claude_run_events",
+    "Stdout events emitted per Claude run.",
+    buckets=COUNT_BUCKETS,
+)
+claude_output_queue_depth = registry.histogram(
+    "claude_output_queue_depth",
+    "Events waiting in a process output queue, sampled on every enqueue.",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+http_first_byte_seconds = registry.histogram(
+    "http_first_byte_seconds",
+    "Time from request start to the first response body byte.",
+    labelnames=("path", "stream"),
+)
+http_request_seconds = registry.histogram(
+    "http_request_seconds",
+    "Time from request start to the last response body byte.",
+    labelnames=("path", "stream", "status"),
+)
+db_write_seconds = registry.histogram(
+    "db_write_seconds",
+    "Latency of database writes.",
+    labelnames=("operation",),
+)
+rate_limit_rejections_total = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the rate limiter.",
+)
+claude_active_processes = registry.gauge(
+    "claude_active_processes",
+    "Claude processes currently running.",
+)
+active_streams = registry.gauge(
+    "active_streams",
+    "Streaming responses currently open.",
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing first and last body bytes of completions.
+
+    For streaming responses the first byte is the first SSE event, and the
+    last byte marks the end of the completion.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in TIMED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        started = time.perf_counter()
+        state = {"status": "500", "stream": "false", "first_byte": False}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                state["status"] = str(message["status"])
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(
+                        b"text/event-stream"
+                    ):
+                        state["stream"] = "true"
+            elif message["type"] == "http.response.body":
+                if not state["first_byte"] and message.get("body"):
+                    state["first_byte"] = True
+                    http_first_byte_seconds.observe(
+                        time.perf_counter() - started,
+                        path=path,
+                        stream=state["stream"],
+                    )
+                if not message.get("more_body", False):
+                    http_request_seconds.observe(
+                        time.perf_counter() - started,
+                        path=path,
+                        stream=state["stream"],
+                        status=state["status"],
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
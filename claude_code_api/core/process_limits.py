@@ -0,0 +1,281 @@
+"""CPU, memory and process-count limits for Claude child processes.
+
+With ``process_cgroup_root`` pointing at a delegated cgroup v2 directory
+(for example a systemd unit with ``Delegate=yes``), every run gets its own
+child cgroup with ``cpu.weight``, ``memory.max`` and ``pids.max``. The
+gateway writes the child's pid to ``cgroup.procs`` right after spawning it,
+before the CLI has started any tool, so every tool it launches is inside.
+When the run ends the cgroup is killed (taking leftover tool processes with
+it) and removed.
+
+Without a usable cgroup root the same limits fall back to rlimits and a nice
+level, applied by starting the CLI through the ``prlimit`` and ``nice``
+commands. Those are per-process (``RLIMIT_DATA``) or per-user
+(``RLIMIT_NPROC``) caps rather than a budget for the whole tree, so they only
+bound the worst runaway.
+
+No Python code runs between fork and exec: the server is multithreaded, and
+``preexec_fn`` is not safe in the presence of threads.
+"""
+
+import errno
+import functools
+import math
+import os
+import shutil
+import signal
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+
+from .config import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = structlog.get_logger()
+
+CONTROLLERS = ("cpu", "memory", "pids")
+DEFAULT_CPU_WEIGHT = 100
+MAX_CPU_WEIGHT = 10000
+# Each nice level changes the scheduler weight by about 25%.
+NICE_STEP = 1.25
+MAX_NICE = 19
+RMDIR_ATTEMPTS = 20
+RMDIR_RETRY_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class ProcessLimits:
+    """Resource limits for one Claude run; zero leaves a limit unset."""
+
+    cpu_weight: int = 0
+    memory_max_bytes: int = 0
+    pids_max: int = 0
+
+    @classmethod
+    def from_settings(cls) -> "ProcessLimits":
+        return cls(
+            cpu_weight=settings.process_cpu_weight,
+            memory_max_bytes=settings.process_memory_max_mb * 1024 * 1024,
+            pids_max=settings.process_pids_max,
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.cpu_weight or self.memory_max_bytes or self.pids_max)
+
+    def cgroup_files(self) -> Dict[str, str]:
+        """Interface files of a cgroup v2 directory and their values."""
+        files = {}
+        if self.cpu_weight > 0:
+            files["cpu.weight"] = str(min(self.cpu_weight, MAX_CPU_WEIGHT))
+        if self.memory_max_bytes > 0:
+            files["memory.max"] = str(self.memory_max_bytes)
+        if self.pids_max > 0:
+            files["pids.max"] = str(self.pids_max)
+        return files
+
+    @property
+    def niceness(self) -> int:
+        """Nice increment approximating ``cpu_weight`` below the default.
+
+        Raising priority needs privileges, so weights above 100 map to 0.
+        """
+        if not 0 < self.cpu_weight < DEFAULT_CPU_WEIGHT:
+            return 0
+        steps = math.log(DEFAULT_CPU_WEIGHT / self.cpu_weight, NICE_STEP)
+        return min(MAX_NICE, round(steps))
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="ascii") as handle:
+            return handle.read()
+    except OSError:
+        return None
+
+
+def _write(path: str, value: str) -> None:
+    with open(path, "w", encoding="ascii") as handle:
+        handle.write(value)
+
+
+class CgroupPlacer:
+    """Creates and removes one child cgroup per Claude run."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+        self._checked_root: Optional[str] = None
+        self._usable = False
+
+    @property
+    def root(self) -> str:
+        if self._root is not None:
+            return self._root
+        return settings.process_cgroup_root
+
+    def available(self) -> bool:
+        """True when the root is a cgroup v2 directory; checked once per root."""
+        root = self.root
+        if not root:
+            return False
+        if root != self._checked_root:
+            self._checked_root = root
+            self._usable = self._prepare(root)
+        return self._usable
+
+    def _prepare(self, root: str) -> bool:
+        controllers = _read(os.path.join(root, "cgroup.controllers"))
+        if controllers is None:
+            logger.warning(
+                "Process cgroup root is not a cgroup v2 directory; "
+                "falling back to setrlimit",
+                root=root,
+            )
+            return False
+        subtree_control = os.path.join(root, "cgroup.subtree_control")
+        enabled = set((_read(subtree_control) or "").split())
+        wanted = [
+            name
+            for name in CONTROLLERS
+            if name in controllers.split() and name not in enabled
+        ]
+        if wanted:
+            # Fails with EBUSY while the root itself holds processes; the
+            # gateway has to run in a sibling leaf cgroup.
+            try:
+                _write(subtree_control, " ".join(f"+{name}" for name in wanted))
+            except OSError as e:
+                logger.warning(
+                    "Failed to enable cgroup controllers",
+                    root=root,
+                    controllers=wanted,
+                    error=str(e),
+                )
+        return True
+
+    def create(self, limits: ProcessLimits) -> Optional[str]:
+        """Create a child cgroup with ``limits``; None without a usable root."""
+        if not self.available():
+            return None
+        path = os.path.join(self.root, f"claude-{uuid.uuid4().hex[:12]}")
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            logger.warning("Failed to create process cgroup", path=path, error=str(e))
+            return None
+        for filename, value in limits.cgroup_files().items():
+            try:
+                _write(os.path.join(path, filename), value)
+            except OSError as e:
+                # The controller is not enabled for the subtree.
+                logger.warning(
+                    "Failed to set cgroup limit",
+                    path=path,
+                    limit=filename,
+                    error=str(e),
+                )
+        return path
+
+    def attach(self, path: str, pid: int) -> bool:
+        """Move the process ``pid`` into the cgroup at ``path``."""
+        try:
+            _write(os.path.join(path, "cgroup.procs"), str(pid))
+        except OSError as e:
+            logger.warning(
+                "Failed to move process into its cgroup",
+                path=path,
+                pid=pid,
+                error=str(e),
+            )
+            return False
+        return True
+
+    def remove(self, path: str) -> None:
+        """Kill whatever is left in the cgroup and remove it."""
+        kill_file = os.path.join(path, "cgroup.kill")
+        try:
+            if os.path.exists(kill_file):
+                _write(kill_file, "1")
+            else:
+                # cgroup.kill needs Linux 5.14.
+                for pid in (_read(os.path.join(path, "cgroup.procs")) or "").split():
+                    try:
+                        os.kill(int(pid), signal.SIGKILL)
+                    except (ProcessLookupError, ValueError):
+                        pass
+        except OSError as e:
+            logger.warning("Failed to kill process cgroup", path=path, error=str(e))
+
+        # rmdir fails with EBUSY until the killed processes are gone.
+        for _ in range(RMDIR_ATTEMPTS):
+            try:
+                os.rmdir(path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if e.errno != errno.EBUSY:
+                    logger.warning(
+                        "Failed to remove process cgroup", path=path, error=str(e)
+                    )
+                    return
+            time.sleep(RMDIR_RETRY_SECONDS)
+        logger.warning("Process cgroup still busy; leaving it", path=path)
+
+
+cgroups = CgroupPlacer()
+
+
+def _rlimits(limits: ProcessLimits) -> List[Tuple[str, int]]:
+    """``prlimit`` options and values, capped at this process's hard limits."""
+    if resource is None:
+        return []
+    wanted = []
+    if limits.memory_max_bytes > 0:
+        # RLIMIT_DATA covers heap and private mappings but not address space
+        # reserved without access, which Node reserves generously.
+        wanted.append(("data", resource.RLIMIT_DATA, limits.memory_max_bytes))
+    if limits.pids_max > 0:
+        # Counts every process of the user, not just this run's.
+        wanted.append(("nproc", resource.RLIMIT_NPROC, limits.pids_max))
+    rlimits = []
+    for name, which, value in wanted:
+        # The child inherits our hard limit and cannot raise it.
+        _, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        rlimits.append((name, value))
+    return rlimits
+
+
+@functools.lru_cache(maxsize=None)
+def _find_tool(name: str) -> Optional[str]:
+    path = shutil.which(name)
+    if path is None:
+        logger.warning("Limit tool not found; leaving its limits unset", tool=name)
+    return path
+
+
+def limit_wrapper(limits: ProcessLimits) -> List[str]:
+    """Command prefix that applies the rlimit and nice fallback.
+
+    ``prlimit`` and ``nice`` set the limits on themselves and exec the next
+    program, so the CLI keeps the pid of the spawned process.
+    """
+    prefix: List[str] = []
+    rlimits = _rlimits(limits)
+    prlimit = _find_tool("prlimit") if rlimits else None
+    if prlimit:
+        prefix += [prlimit, *(f"--{name}={value}" for name, value in rlimits), "--"]
+    niceness = limits.niceness
+    nice = _find_tool("nice") if niceness else None
+    if nice:
+        prefix += [nice, "-n", str(niceness)]
+    return prefix
@@ -0,0 +1,237 @@
+"""CPU, memory and I/O usage of Claude child processes, read from /proc.
+
+``ProcessSampler`` reads ``/proc/<pid>/stat``, ``status`` and ``io`` for every
+running process each ``process_sample_interval_seconds``. Processes take a
+last sample when their output ends. The values are cumulative per process,
+so a missed sample only loses the tail since the previous one.
+
+``wait4`` rusage is not used: asyncio's child watcher reaps the children
+itself, so their exit status and rusage never reach this code.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from .config import settings
+from .metrics import COUNT_BUCKETS, LATENCY_BUCKETS, registry
+
+logger = structlog.get_logger()
+
+PROC_ROOT = "/proc"
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+
+BYTE_BUCKETS = tuple(2**power for power in range(20, 36, 2))
+
+claude_process_cpu_seconds = registry.histogram(
+    "claude_process_cpu_seconds",
+    "CPU time (user + system, including reaped descendants) per Claude run.",
+    buckets=LATENCY_BUCKETS,
+)
+claude_process_peak_rss_bytes = registry.histogram(
+    "claude_process_peak_rss_bytes",
+    "Peak resident memory per Claude run.",
+    buckets=BYTE_BUCKETS,
+)
+claude_process_io_bytes = registry.histogram(
+    "claude_process_io_bytes",
+    "Storage bytes read or written per Claude run.",
+    buckets=(0,) + BYTE_BUCKETS,
+    labelnames=("direction",),
+)
+claude_process_samples = registry.histogram(
+    "claude_process_samples",
+    "Usage samples taken per Claude run.",
+    buckets=COUNT_BUCKETS,
+)
+claude_processes_rss_bytes = registry.gauge(
+    "claude_processes_rss_bytes",
+    "Resident memory of running Claude processes at the last sample.",
+)
+
+
+@dataclass
+class ProcessUsage:
+    """Resource usage of one process, or the sum over a session's runs."""
+
+    cpu_user_seconds: float = 0.0
+    cpu_system_seconds: float = 0.0
+    rss_bytes: int = 0
+    peak_rss_bytes: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    samples: int = 0
+    runs: int = 0
+    # Process start time in clock ticks; guards against reading a reused pid
+    start_ticks: int = 0
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.cpu_user_seconds + self.cpu_system_seconds
+
+    def update(self, sample: "ProcessUsage") -> None:
+        """Fold in a newer sample of the same process.
+
+        Counters only grow, so the maximum keeps the latest value and
+        ignores a partial read (a zombie has no memory figures left).
+        """
+        if self.start_ticks and sample.start_ticks != self.start_ticks:
+            return
+        self.start_ticks = sample.start_ticks
+        self.cpu_user_seconds = max(self.cpu_user_seconds, sample.cpu_user_seconds)
+        self.cpu_system_seconds = max(
+            self.cpu_system_seconds, sample.cpu_system_seconds
+        )
+        self.rss_bytes = sample.rss_bytes
+        self.peak_rss_bytes = max(
+            self.peak_rss_bytes, sample.peak_rss_bytes, sample.rss_bytes
+        )
+        self.read_bytes = max(self.read_bytes, sample.read_bytes)
+        self.write_bytes = max(self.write_bytes, sample.write_bytes)
+        self.samples += 1
+
+    def add(self, run: "ProcessUsage") -> None:
+        """Add a finished run to session totals."""
+        self.cpu_user_seconds += run.cpu_user_seconds
+        self.cpu_system_seconds += run.cpu_system_seconds
+        self.peak_rss_bytes = max(self.peak_rss_bytes, run.peak_rss_bytes)
+        self.read_bytes += run.read_bytes
+        self.write_bytes += run.write_bytes
+        self.samples += run.samples
+        self.runs += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "cpu_user_seconds": round(self.cpu_user_seconds, 3),
+            "cpu_system_seconds": round(self.cpu_system_seconds, 3),
+            "rss_bytes": self.rss_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "samples": self.samples,
+            "runs": self.runs,
+        }
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="ascii", errors="replace") as handle:
+            return handle.read()
+    except OSError:
+        return None
+
+
+def read_proc_usage(pid: int, proc_root: str = PROC_ROOT) -> Optional[ProcessUsage]:
+    """Read a process's usage from procfs; None once it is gone.
+
+    CPU time includes descendants the process has waited for, such as tool
+    commands. Files that cannot be read (``io`` may need ptrace access)
+    leave their fields at zero.
+    """
+    stat = _read(f"{proc_root}/{pid}/stat")
+    if stat is None:
+        return None
+    usage = ProcessUsage()
+    # The command name may contain spaces or parentheses; fields follow the
+    # last ")". utime, stime, cutime and cstime are fields 14-17 and
+    # starttime is field 22.
+    fields = stat.rsplit(")", 1)[-1].split()
+    try:
+        utime, stime, cutime, cstime = (int(value) for value in fields[11:15])
+        usage.start_ticks = int(fields[19])
+    except (ValueError, IndexError):
+        return None
+    usage.cpu_user_seconds = (utime + cutime) / CLOCK_TICKS
+    usage.cpu_system_seconds = (stime + cstime) / CLOCK_TICKS
+
+    for line in (_read(f"{proc_root}/{pid}/status") or "").splitlines():
+        if line.startswith("VmHWM:"):
+            usage.peak_rss_bytes = int(line.split()[1]) * 1024
+        elif line.startswith("VmRSS:"):
+            usage.rss_bytes = int(line.split()[1]) * 1024
+
+    for line in (_read(f"{proc_root}/{pid}/io") or "").splitlines():
+        key, _, value = line.partition(":")
+        if key == "read_bytes":
+            usage.read_bytes = int(value)
+        elif key == "write_bytes":
+            usage.write_bytes = int(value)
+    return usage
+
+
+def observe_run(usage: ProcessUsage) -> None:
+    """Record a finished run's usage in metrics."""
+    if not usage.samples:
+        return
+    claude_process_cpu_seconds.observe(usage.cpu_seconds)
+    claude_process_peak_rss_bytes.observe(usage.peak_rss_bytes)
+    claude_process_io_bytes.observe(usage.read_bytes, direction="read")
+    claude_process_io_bytes.observe(usage.write_bytes, direction="write")
+    claude_process_samples.observe(usage.samples)
+
+
+class ProcessSampler:
+    """Periodically samples the usage of running Claude processes."""
+
+    def __init__(self, processes: Callable[[], Iterable[Any]]):
+        self._processes = processes
+        self._task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+
+    async def sample_once(self) -> int:
+        """Sample every running process; returns how many were read."""
+        targets: List[Tuple[Any, int]] = [
+            (process, process.pid)
+            for process in list(self._processes())
+            if process.pid is not None
+        ]
+        if not targets:
+            claude_processes_rss_bytes.set(0)
+            return 0
+        samples = await asyncio.to_thread(
+            lambda: [read_proc_usage(pid) for _, pid in targets]
+        )
+        rss = 0
+        read = 0
+        for (process, _), sample in zip(targets, samples):
+            if sample is not None:
+                process.usage.update(sample)
+                rss += sample.rss_bytes
+                read += 1
+        claude_processes_rss_bytes.set(rss)
+        return read
+
+    def start(self) -> None:
+        """Start periodic sampling."""
+        if self._task is None or self._task.done():
+            self._shutdown_event.clear()
+            self._task = asyncio.create_task(self._periodic_sample())
+
+    async def _periodic_sample(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(),
+                    timeout=settings.process_sample_interval_seconds,
+                )
+                break
+            except asyncio.TimeoutError:
+                try:
+                    await self.sample_once()
+                except Exception as e:
+                    logger.error("Process sampling failed", error=str(e))
+            except asyncio.CancelledError:
+                raise
+
+    async def stop(self) -> None:
+        """Stop periodic sampling."""
+        if self._task and not self._task.done():
+            self._shutdown_event.set()
+            await self._task
@@ -0,0 +1,262 @@
+"""On-demand sampling profiler for the event-loop thread.
+
+A timer thread wakes every ``interval`` seconds, reads the loop thread's
+frame from ``sys._current_frames`` and counts the stack. There is no tracing
+hook, so code runs at full speed between samples. Each sample costs a frame
+walk under the GIL, a few tens of microseconds.
+
+Samples are attributed to the request being served. ``TaskLabelMiddleware``
+labels each request's task with its ASGI scope, chat handlers add the session
+id, and the loop's task factory copies the labels to every task the request
+starts (stream writers, process readers). The sampler looks up the labels of
+``asyncio.current_task``.
+"""
+
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .loop_monitor import PACKAGE_DIR
+from .tracing import route_template
+
+FORMATS = ("collapsed", "speedscope")
+IDLE_FUNCTIONS = frozenset({"select", "poll", "epoll", "kqueue", "control"})
+MAX_DEPTH = 128
+
+Frame = Tuple[str, int, str]
+
+_task_labels: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _labels_for(task: Optional[asyncio.Task]) -> Optional[Dict[str, Any]]:
+    if task is None:
+        return None
+    try:
+        return _task_labels.get(task)
+    except TypeError:
+        return None
+
+
+def label_task(**labels: Any) -> None:
+    """Attach labels to the current task and the tasks it starts later."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return
+    if task is None:
+        return
+    current = _labels_for(task)
+    if current is None:
+        _task_labels[task] = dict(labels)
+    else:
+        # Shared with child tasks, so they see labels added after they start.
+        current.update(labels)
+
+
+def install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """Make new tasks inherit the labels of the task that created them."""
+    previous = loop.get_task_factory()
+    if getattr(previous, "_inherits_labels", False):
+        return
+
+    def factory(loop, coro, context=None):
+        if previous is not None:
+            task = (
+                previous(loop, coro)
+                if context is None
+                else previous(loop, coro, context=context)
+            )
+        else:
+            task = asyncio.Task(coro, loop=loop, context=context)
+        labels = _labels_for(asyncio.current_task(loop))
+        if labels is not None:
+            _task_labels[task] = labels
+        return task
+
+    factory._inherits_labels = True
+    factory._previous = previous
+    loop.set_task_factory(factory)
+
+
+def uninstall_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    factory = loop.get_task_factory()
+    if getattr(factory, "_inherits_labels", False):
+        loop.set_task_factory(factory._previous)
+
+
+class TaskLabelMiddleware:
+    """Pure ASGI middleware labelling each HTTP request's task with its scope."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            label_task(scope=scope)
+        await self.app(scope, receive, send)
+
+
+def route_label(labels: Optional[Dict[str, Any]]) -> str:
+    """``METHOD /route/{template}`` of a labelled request, else ``(no request)``."""
+    scope = (labels or {}).get("scope")
+    if not scope:
+        return "(no request)"
+    path = route_template(scope) or scope.get("path", "?")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+def frame_name(frame: Frame) -> str:
+    filename, lineno, name = frame
+    if filename.startswith(PACKAGE_DIR):
+        filename = os.path.relpath(filename, PACKAGE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{name} ({filename}:{lineno})"
+
+
+def _walk(frame) -> Tuple[Frame, ...]:
+    stack: List[Frame] = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, frame.f_lineno, code.co_qualname))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """Samples the loop thread's stack from a timer thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.01):
+        self.loop = loop
+        self.interval = max(0.001, interval)
+        self.samples: Dict[Tuple[str, str, Tuple[Frame, ...]], int] = (
+            collections.Counter()
+        )
+        self.idle_samples = 0
+        self.duration = 0.0
+        self._started = time.monotonic()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        task = asyncio.current_task(self.loop)
+        if task is None and frame.f_code.co_name in IDLE_FUNCTIONS:
+            self.idle_samples += 1
+            return
+        labels = _labels_for(task)
+        session_id = str((labels or {}).get("session_id") or "-")
+        self.samples[(route_label(labels), session_id, _walk(frame))] += 1
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+        self.duration = time.monotonic() - self._started
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, rooted at route and session."""
+        lines = []
+        for (route, session_id, stack), count in sorted(
+            self.samples.items(), key=lambda item: -item[1]
+        ):
+            names = [f"route:{route}", f"session:{session_id}"]
+            names.extend(frame_name(frame) for frame in stack)
+            lines.append(
+                f"{';'.join(name.replace(';', ',') for name in names)} {count}"
+            )
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per route."""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Any, int] = {}
+
+        def index_of(key, name, file=None, line=None):
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                entry: Dict[str, Any] = {"name": name}
+                if file is not None:
+                    entry["file"] = file
+                    entry["line"] = line
+                frames.append(entry)
+            return frame_index[key]
+
+        by_route: Dict[str, Dict[str, List]] = {}
+        for (route, session_id, stack), count in self.samples.items():
+            profile = by_route.setdefault(route, {"samples": [], "weights": []})
+            indexes = [index_of(("session", session_id), f"session:{session_id}")]
+            indexes.extend(
+                index_of(frame, frame_name(frame), frame[0], frame[1])
+                for frame in stack
+            )
+            profile["samples"].append(indexes)
+            profile["weights"].append(round(count * self.interval, 6))
+
+        profiles = [
+            {
+                "type": "sampled",
+                "name": route,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(profile["weights"]), 6),
+                "samples": profile["samples"],
+                "weights": profile["weights"],
+            }
+            for route, profile in sorted(
+                by_route.items(), key=lambda item: -sum(item[1]["weights"])
+            )
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"claude-code-api event loop ({self.duration:.1f}s)",
+            "exporter": "claude-code-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        busy = sum(self.samples.values())
+        return {
+            "seconds": round(self.duration, 3),
+            "interval_seconds": self.interval,
+            "samples": busy + self.idle_samples,
+            "busy_samples": busy,
+            "idle_samples": self.idle_samples,
+        }
+
+
+async def profile(seconds: float, interval: float) -> SamplingProfiler:
+    """Sample the running loop for ``seconds`` and return the profiler."""
+    profiler = SamplingProfiler(asyncio.get_running_loop(), interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await profiler.stop()
+    return profiler
@@ -0,0 +1,169 @@
+"""Garbage collection of idle auto-created project directories.
+
+Chat requests without a ``project_id`` work in ``default-<client>``
+directories, and ``fork_project`` requests in ``<project_id>-fork-<suffix>``
+clones; nothing else ever removes either. Each use touches the directory mtime,
+which doubles as a last-used time that survives restarts and is shared by
+all workers. When the filesystem holding ``project_root`` fills past
+``project_gc_high_watermark_percent``, the collector deletes idle default
+projects, least recently used first, in small batches in a worker thread,
+until usage drops below ``project_gc_low_watermark_percent``. Named projects
+are never touched.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import structlog
+
+from .config import settings
+from .file_index import file_index
+from .project_usage import project_usage
+
+logger = structlog.get_logger()
+
+AUTO_PROJECT_PREFIX = "default-"
+_FORK_SUFFIX = re.compile(r"-fork-[0-9a-f]{8}$")
+
+
+def fork_project_id(project_id: str) -> str:
+    """A fresh id for a ``fork_project`` clone of ``project_id``."""
+    return f"{project_id}-fork-{uuid.uuid4().hex[:8]}"
+
+
+def is_auto_project(name: str) -> bool:
+    """True for project directories the gateway created on its own."""
+    return name.startswith(AUTO_PROJECT_PREFIX) or bool(_FORK_SUFFIX.search(name))
+
+
+def touch_project(project_path: str) -> None:
+    """Record that ``project_path`` was just used."""
+    try:
+        os.utime(project_path)
+    except OSError as e:
+        logger.debug("Failed to touch project", path=project_path, error=str(e))
+
+
+def disk_used_percent(path: str) -> float:
+    usage = shutil.disk_usage(path)
+    return usage.used * 100.0 / usage.total if usage.total else 0.0
+
+
+def _idle_candidates(
+    project_root: str, min_idle_seconds: float, busy: Iterable[str]
+) -> List[Tuple[float, str]]:
+    busy_paths = {os.path.realpath(path) for path in busy}
+    cutoff = time.time() - min_idle_seconds
+    candidates = []
+    with os.scandir(project_root) as entries:
+        for entry in entries:
+            if not is_auto_project(entry.name):
+                continue
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                last_used = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if last_used > cutoff or os.path.realpath(entry.path) in busy_paths:
+                continue
+            candidates.append((last_used, entry.path))
+    candidates.sort()
+    return candidates
+
+
+class ProjectGC:
+    """Evicts idle default and fork projects when the disk runs full."""
+
+    def __init__(
+        self,
+        busy_paths: Optional[Callable[[], Iterable[str]]] = None,
+        used_percent: Optional[Callable[[str], float]] = None,
+    ):
+        self._busy_paths = busy_paths or (lambda: ())
+        self._used_percent = used_percent or disk_used_percent
+        self._task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+        self.evicted_total = 0
+
+    def _over(self, percent: float) -> bool:
+        return self._used_percent(settings.project_root) >= percent
+
+    def _delete(self, paths: List[str]) -> None:
+        for path in paths:
+            # Re-check in case the project was used since it was listed.
+            try:
+                last_used = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if time.time() - last_used < settings.project_gc_min_idle_minutes * 60:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+    async def run_once(self) -> List[str]:
+        """Evict projects until usage is under the low watermark."""
+        if not await asyncio.to_thread(
+            self._over, settings.project_gc_high_watermark_percent
+        ):
+            return []
+        candidates = await asyncio.to_thread(
+            _idle_candidates,
+            settings.project_root,
+            settings.project_gc_min_idle_minutes * 60,
+            list(self._busy_paths()),
+        )
+        evicted: List[str] = []
+        batch_size = max(1, settings.project_gc_batch_size)
+        for start in range(0, len(candidates), batch_size):
+            if self._shutdown_event.is_set():
+                break
+            busy = {os.path.realpath(path) for path in self._busy_paths()}
+            batch = [
+                path
+                for _, path in candidates[start : start + batch_size]
+                if os.path.realpath(path) not in busy
+            ]
+            await asyncio.to_thread(self._delete, batch)
+            for path in batch:
+                if not os.path.exists(path):
+                    project_usage.forget(path)
+                    file_index.forget(path)
+                    evicted.append(path)
+            if not await asyncio.to_thread(
+                self._over, settings.project_gc_low_watermark_percent
+            ):
+                break
+        if evicted:
+            self.evicted_total += len(evicted)
+            logger.info("Evicted idle projects", count=len(evicted))
+        return evicted
+
+    def start(self) -> None:
+        """Start the periodic collector."""
+        if self._task is None or self._task.done():
+            self._shutdown_event.clear()
+            self._task = asyncio.create_task(self._periodic_gc())
+
+    async def _periodic_gc(self) -> None:
+        interval = max(1, settings.project_gc_interval_seconds)
+        while True:
+            try:
+                await asyncio.wait_for(self._shutdown_event.wait(), timeout=interval)
+                break
+            except asyncio.TimeoutError:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error collecting idle projects", error=str(e))
+
+    async def stop(self) -> None:
+        """Stop the periodic collector."""
+        if self._task and not self._task.done():
+            self._shutdown_event.set()
+            await self._task
@@ -0,0 +1,331 @@
+"""Incremental disk usage tracking for project directories.
+
+The first lookup walks a project once with ``os.scandir`` and keeps, per
+directory, its mtime and the sizes of its files. Later refreshes only
+``stat`` each known directory: a changed mtime (a file created, removed or
+renamed) rescans that directory alone and new subdirectories are walked.
+Files modified recently are re-stat'ed on every refresh so in-place growth
+of files an agent is writing is seen too. Untouched old files are trusted
+until the next full rescan (``project_usage_full_rescan_seconds``).
+
+The same per-directory cache records in which pass each file last changed
+or disappeared; ``core.file_index`` builds paged listings and change feeds
+from it. Running Claude processes are watched while they run and stopped
+once their project exceeds ``max_project_size_mb``.
+"""
+
+import asyncio
+import os
+import stat as stat_module
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import structlog
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Files modified this recently are re-stat'ed on every refresh.
+HOT_FILE_SECONDS = 300
+# Removals remembered for change cursors; older cursors must resync.
+MAX_REMOVED_ENTRIES = 10000
+
+
+class _DirState:
+    """Cached listing of one directory."""
+
+    __slots__ = ("mtime_ns", "files", "subdirs", "size")
+
+    def __init__(
+        self,
+        mtime_ns: int,
+        files: Dict[str, Tuple[int, int, int]],
+        subdirs: List[str],
+    ):
+        self.mtime_ns = mtime_ns
+        # name -> (size, mtime_ns, inode)
+        self.files = files
+        self.subdirs = subdirs
+        self.size = sum(entry[0] for entry in files.values())
+
+
+def _scan_dir(path: str) -> _DirState:
+    mtime_ns = os.stat(path).st_mtime_ns
+    files: Dict[str, Tuple[int, int, int]] = {}
+    subdirs: List[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files[entry.name] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    return _DirState(mtime_ns, files, subdirs)
+
+
+class ProjectUsage:
+    """Size and file listing of one project tree, refreshed incrementally.
+
+    Every pass that finds a difference bumps ``seq``. ``file_seq`` holds the
+    pass in which each file last changed and ``removed`` the pass in which a
+    file disappeared, so callers can ask for changes since a cursor.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dirs: Dict[str, _DirState] = {}
+        self.size_bytes = 0
+        self.file_count = 0
+        self.scanned_at = 0.0
+        self.full_scanned_at = 0.0
+        self.seq = 0
+        self.file_seq: Dict[str, int] = {}
+        self.removed: "OrderedDict[str, int]" = OrderedDict()
+        # Cursors at or below this may have missed pruned removals.
+        self.oldest_cursor = 0
+        self._pass_seq = 0
+        self._dirty = False
+
+    def _record(self, rel_path: str, removed: bool = False) -> None:
+        self._dirty = True
+        if removed:
+            self.file_seq.pop(rel_path, None)
+            self.removed[rel_path] = self._pass_seq
+            self.removed.move_to_end(rel_path)
+            while len(self.removed) > MAX_REMOVED_ENTRIES:
+                _, seq = self.removed.popitem(last=False)
+                self.oldest_cursor = max(self.oldest_cursor, seq)
+        else:
+            self.removed.pop(rel_path, None)
+            self.file_seq[rel_path] = self._pass_seq
+
+    def _set_dir(
+        self, rel_path: str, state: _DirState, old: Optional[_DirState]
+    ) -> None:
+        old_files = old.files if old else {}
+        for name, entry in state.files.items():
+            if old_files.get(name) != entry:
+                self._record(os.path.join(rel_path, name))
+        for name in old_files.keys() - state.files.keys():
+            self._record(os.path.join(rel_path, name), removed=True)
+        self.dirs[rel_path] = state
+
+    def _walk(self, rel_path: str, previous: Dict[str, _DirState]) -> None:
+        stack = [rel_path]
+        while stack:
+            current = stack.pop()
+            try:
+                state = _scan_dir(os.path.join(self.root, current))
+            except OSError:
+                continue
+            self._set_dir(current, state, previous.get(current))
+            stack.extend(os.path.join(current, name) for name in state.subdirs)
+
+    def _drop(self, rel_path: str) -> None:
+        prefix = rel_path + os.sep
+        for key in [
+            k
+            for k in self.dirs
+            if not rel_path or k == rel_path or k.startswith(prefix)
+        ]:
+            for name in self.dirs.pop(key).files:
+                self._record(os.path.join(key, name), removed=True)
+
+    def _refresh_hot_files(
+        self, rel_path: str, state: _DirState, cutoff_ns: int
+    ) -> None:
+        path = os.path.join(self.root, rel_path)
+        for name, (size, mtime_ns, ino) in list(state.files.items()):
+            if mtime_ns < cutoff_ns:
+                continue
+            try:
+                stat = os.lstat(os.path.join(path, name))
+            except OSError:
+                continue
+            if stat_module.S_ISDIR(stat.st_mode):
+                continue
+            entry = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if entry != (size, mtime_ns, ino):
+                state.files[name] = entry
+                state.size += stat.st_size - size
+                self._record(os.path.join(rel_path, name))
+
+    def full_scan(self) -> None:
+        """Walk the whole tree."""
+        self._pass_seq = self.seq + 1
+        previous, self.dirs = self.dirs, {}
+        self._walk("", previous)
+        for rel_path in previous.keys() - self.dirs.keys():
+            for name in previous[rel_path].files:
+                self._record(os.path.join(rel_path, name), removed=True)
+        self.full_scanned_at = time.time()
+        self._finish()
+
+    def refresh(self) -> None:
+        """Rescan only the directories that changed since the last pass."""
+        self._pass_seq = self.seq + 1
+        cutoff_ns = int((time.time() - HOT_FILE_SECONDS) * 1e9)
+        for rel_path in sorted(self.dirs):
+            state = self.dirs.get(rel_path)
+            if state is None:
+                continue  # Dropped with a removed parent.
+            path = os.path.join(self.root, rel_path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                self._drop(rel_path)
+                continue
+            if mtime_ns == state.mtime_ns:
+                self._refresh_hot_files(rel_path, state, cutoff_ns)
+                continue
+            try:
+                new_state = _scan_dir(path)
+            except OSError:
+                self._drop(rel_path)
+                continue
+            self._set_dir(rel_path, new_state, state)
+            for name in set(state.subdirs) - set(new_state.subdirs):
+                self._drop(os.path.join(rel_path, name))
+            for name in set(new_state.subdirs) - set(state.subdirs):
+                self._walk(os.path.join(rel_path, name), self.dirs)
+        if not self.dirs:
+            self._walk("", {})
+        self._finish()
+
+    def _finish(self) -> None:
+        if self._dirty:
+            self.seq = self._pass_seq
+            self._dirty = False
+        self.size_bytes = sum(state.size for state in self.dirs.values())
+        self.file_count = sum(len(state.files) for state in self.dirs.values())
+        self.scanned_at = time.time()
+
+
+class ProjectUsageTracker:
+    """Caches ``ProjectUsage`` per project and enforces the size quota."""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        full_rescan_seconds: Optional[float] = None,
+        poll_seconds: Optional[float] = None,
+    ):
+        self._max_bytes = max_bytes
+        self._full_rescan_seconds = full_rescan_seconds
+        self._poll_seconds = poll_seconds
+        self.projects: Dict[str, ProjectUsage] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._watchers: set = set()
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return settings.max_project_size_mb * 1024 * 1024
+
+    @property
+    def full_rescan_seconds(self) -> float:
+        if self._full_rescan_seconds is not None:
+            return self._full_rescan_seconds
+        return settings.project_usage_full_rescan_seconds
+
+    @property
+    def poll_seconds(self) -> float:
+        if self._poll_seconds is not None:
+            return self._poll_seconds
+        return settings.project_usage_poll_seconds
+
+    def _update(self, usage: ProjectUsage) -> None:
+        if (
+            not usage.full_scanned_at
+            or time.time() - usage.full_scanned_at >= self.full_rescan_seconds
+        ):
+            usage.full_scan()
+        else:
+            usage.refresh()
+
+    async def get_usage(self, project_path: str) -> ProjectUsage:
+        """Refresh and return the usage of ``project_path``."""
+        return await self.query(project_path, lambda usage: usage)
+
+    async def query(self, project_path: str, read: Callable[[ProjectUsage], T]) -> T:
+        """Refresh the project, then run ``read`` on it in the same worker thread.
+
+        ``read`` runs under the project's lock, so it sees a consistent state.
+        """
+        project_path = os.path.abspath(project_path)
+        lock = self._locks.setdefault(project_path, asyncio.Lock())
+        async with lock:
+            usage = self.projects.get(project_path)
+            if usage is None:
+                usage = self.projects[project_path] = ProjectUsage(project_path)
+
+            def _update_and_read() -> T:
+                self._update(usage)
+                return read(usage)
+
+            return await asyncio.to_thread(_update_and_read)
+
+    def peek(self, project_path: str) -> Optional[ProjectUsage]:
+        """Last known usage without touching the filesystem."""
+        return self.projects.get(os.path.abspath(project_path))
+
+    def forget(self, project_path: str) -> None:
+        """Drop cached usage, e.g. after the project was deleted."""
+        project_path = os.path.abspath(project_path)
+        self.projects.pop(project_path, None)
+        self._locks.pop(project_path, None)
+
+    def is_over_quota(self, usage: ProjectUsage) -> bool:
+        return self.max_bytes > 0 and usage.size_bytes > self.max_bytes
+
+    async def check(self, project_path: str) -> Optional[ProjectUsage]:
+        """Return the usage when the project is over quota, else None."""
+        if self.max_bytes <= 0:
+            return None
+        usage = await self.get_usage(project_path)
+        return usage if self.is_over_quota(usage) else None
+
+    def watch(self, process, project_path: str) -> None:
+        """Stop ``process`` if its project outgrows the quota while it runs."""
+        if self.max_bytes <= 0 or self.poll_seconds <= 0:
+            return
+        task = asyncio.create_task(self._watch(process, project_path))
+        self._watchers.add(task)
+        task.add_done_callback(self._watchers.discard)
+
+    async def _watch(self, process, project_path: str) -> None:
+        try:
+            while process.is_running:
+                await asyncio.sleep(self.poll_seconds)
+                usage = await self.check(project_path)
+                if usage is not None and process.is_running:
+                    logger.warning(
+                        "Project over size quota, stopping Claude process",
+                        session_id=process.session_id,
+                        project_path=project_path,
+                        size_bytes=usage.size_bytes,
+                        max_bytes=self.max_bytes,
+                    )
+                    await process.stop()
+                    return
+        except Exception as e:
+            logger.warning(
+                "Project size watch failed", project_path=project_path, error=str(e)
+            )
+
+    async def stop(self) -> None:
+        """Cancel running watchers."""
+        for task in list(self._watchers):
+            task.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+
+
+project_usage = ProjectUsageTracker()
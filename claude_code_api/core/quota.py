@@ -0,0 +1,212 @@
+"""Per-API-key token and cost quotas.
+
+Usage is charged in memory as stream events arrive, so quota checks never
+touch the database. Accumulated deltas are written to the ``api_keys`` table
+by a periodic flush task.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import structlog
+
+from claude_code_api.utils.time import utc_now
+
+from .config import settings
+from .database import db_manager
+
+logger = structlog.get_logger()
+
+WINDOW_SECONDS = 60
+
+QUOTA_TOKENS_PER_MINUTE = "tokens_per_minute"
+QUOTA_COST_PER_DAY = "cost_per_day"
+
+
+@dataclass
+class QuotaLimits:
+    """Budget for one API key; zero means unlimited."""
+
+    tokens_per_minute: int = 0
+    cost_per_day_usd: float = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "QuotaLimits":
+        return cls(
+            tokens_per_minute=settings.quota_tokens_per_minute,
+            cost_per_day_usd=settings.quota_cost_per_day_usd,
+        )
+
+
+@dataclass
+class KeyUsage:
+    """In-memory usage counters for one API key."""
+
+    token_buckets: List[int] = field(default_factory=lambda: [0] * WINDOW_SECONDS)
+    bucket_seconds: List[int] = field(default_factory=lambda: [0] * WINDOW_SECONDS)
+    day: Optional[date] = None
+    cost_today: float = 0.0
+    pending_requests: int = 0
+    pending_tokens: int = 0
+    pending_cost: float = 0.0
+    last_used_at: Optional[datetime] = None
+
+    def add_tokens(self, tokens: int, now: float) -> None:
+        second = int(now)
+        idx = second % WINDOW_SECONDS
+        if self.bucket_seconds[idx] != second:
+            self.bucket_seconds[idx] = second
+            self.token_buckets[idx] = 0
+        self.token_buckets[idx] += tokens
+
+    def tokens_last_minute(self, now: float) -> int:
+        floor = int(now) - WINDOW_SECONDS
+        return sum(
+            tokens
+            for tokens, second in zip(self.token_buckets, self.bucket_seconds)
+            if second > floor
+        )
+
+    def add_cost(self, cost: float, today: date) -> None:
+        if self.day != today:
+            self.day = today
+            self.cost_today = 0.0
+        self.cost_today += cost
+
+    def cost_for(self, today: date) -> float:
+        return self.cost_today if self.day == today else 0.0
+
+
+class QuotaMeter:
+    """Charges one run against a key's budget as usage arrives."""
+
+    def __init__(self, manager: "QuotaManager", key_hash: str, limits: QuotaLimits):
+        self.manager = manager
+        self.key_hash = key_hash
+        self.limits = limits
+        self.exceeded: Optional[str] = None
+
+    def charge(self, tokens: int, cost: float) -> None:
+        """Record usage; sets ``exceeded`` once the budget is spent."""
+        self.manager.charge(self.key_hash, tokens, cost)
+        if self.exceeded is None:
+            self.exceeded = self.manager.check(self.key_hash, self.limits)
+
+
+class QuotaManager:
+    """Tracks per-key usage in memory and flushes it to the database."""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = (
+            settings.quota_flush_interval_seconds
+            if flush_interval is None
+            else flush_interval
+        )
+        self.usage: Dict[str, KeyUsage] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._shutdown_event = asyncio.Event()
+
+    def _usage(self, key_hash: str) -> KeyUsage:
+        usage = self.usage.get(key_hash)
+        if usage is None:
+            usage = self.usage[key_hash] = KeyUsage()
+        return usage
+
+    def check(
+        self, key_hash: str, limits: Optional[QuotaLimits] = None
+    ) -> Optional[str]:
+        """Return the name of the exhausted quota, or None when within budget."""
+        limits = limits or QuotaLimits.from_settings()
+        usage = self.usage.get(key_hash)
+        if usage is None:
+            return None
+        now = time.time()
+        if (
+            limits.tokens_per_minute
+            and usage.tokens_last_minute(now) >= limits.tokens_per_minute
+        ):
+            return QUOTA_TOKENS_PER_MINUTE
+        if (
+            limits.cost_per_day_usd
+            and usage.cost_for(utc_now().date()) >= limits.cost_per_day_usd
+        ):
+            return QUOTA_COST_PER_DAY
+        return None
+
+    def record_request(self, key_hash: str) -> None:
+        """Count a completion request against the key."""
+        usage = self._usage(key_hash)
+        usage.pending_requests += 1
+        usage.last_used_at = utc_now()
+
+    def charge(self, key_hash: str, tokens: int, cost: float) -> None:
+        """Add token and dollar usage for the key."""
+        usage = self._usage(key_hash)
+        if tokens:
+            usage.add_tokens(tokens, time.time())
+            usage.pending_tokens += tokens
+        if cost:
+            usage.add_cost(cost, utc_now().date())
+            usage.pending_cost += cost
+        usage.last_used_at = utc_now()
+
+    def meter(self, key_hash: str, limits: Optional[QuotaLimits] = None) -> QuotaMeter:
+        """Create a meter that charges one run against ``key_hash``."""
+        return QuotaMeter(self, key_hash, limits or QuotaLimits.from_settings())
+
+    async def flush(self) -> None:
+        """Write pending usage deltas to the database."""
+        for key_hash, usage in list(self.usage.items()):
+            if not (
+                usage.pending_requests or usage.pending_tokens or usage.pending_cost
+            ):
+                continue
+            requests = usage.pending_requests
+            tokens = usage.pending_tokens
+            cost = usage.pending_cost
+            usage.pending_requests = 0
+            usage.pending_tokens = 0
+            usage.pending_cost = 0.0
+            try:
+                await db_manager.record_api_key_usage(
+                    key_hash,
+                    requests=requests,
+                    tokens=tokens,
+                    cost=cost,
+                    last_used_at=usage.last_used_at,
+                )
+            except Exception as e:
+                usage.pending_requests += requests
+                usage.pending_tokens += tokens
+                usage.pending_cost += cost
+                logger.error("Failed to flush API key usage", error=str(e))
+
+    def start(self) -> None:
+        """Start the periodic flush task."""
+        if self._flush_task is None or self._flush_task.done():
+            self._shutdown_event.clear()
+            self._flush_task = asyncio.create_task(self._periodic_flush())
+
+    async def _periodic_flush(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._shutdown_event.wait(), timeout=self.flush_interval
+                )
+                break
+            except asyncio.TimeoutError:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error in quota flush", error=str(e))
+
+    async def stop(self) -> None:
+        """Stop the flush task and write remaining usage."""
+        if self._flush_task and not self._flush_task.done():
+            self._shutdown_event.set()
+            await self._flush_task
+        await self.flush()
@@ -0,0 +1,267 @@
+"""Content-addressed cache of Claude runs for repeated prompts.
+
+Entries hold the raw Claude stream-json events of a completed run, keyed by
+a hash of the resolved model, prompts, project id and optionally a project
+tree fingerprint. Hits are replayed through ``CachedProcess`` so the normal
+streaming and non-streaming paths produce the response unchanged.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+import structlog
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+CACHE_DEFAULT = "default"
+CACHE_BYPASS = "bypass"
+CACHE_ONLY = "only"
+
+
+@dataclass
+class CacheEntry:
+    """Cached events of one completed run."""
+
+    events: List[Dict[str, Any]]
+    expires_at: float
+
+
+def make_cache_key(
+    model: Optional[str],
+    system_prompt: Optional[str],
+    user_prompt: str,
+    project_id: str,
+    fingerprint: Optional[str] = None,
+) -> str:
+    """Hash the inputs that determine a completion."""
+    payload = json.dumps(
+        [model, system_prompt, user_prompt, project_id, fingerprint],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def project_fingerprint(project_path: str) -> str:
+    """Hash relative path, size and mtime of every file under the project."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(project_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            rel_path = os.path.relpath(path, project_path)
+            digest.update(f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _is_complete_result(event: Any) -> bool:
+    return (
+        isinstance(event, dict)
+        and event.get("type") == "result"
+        and not event.get("is_error")
+    )
+
+
+class CachedProcess:
+    """Stand-in for ``ClaudeProcess`` that replays cached events."""
+
+    def __init__(self, session_id: str, events: List[Dict[str, Any]]):
+        self.session_id = session_id
+        self.cli_session_id: Optional[str] = None
+        self.is_running = False
+        self.events = events
+
+    async def get_output(
+        self, timeout: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        for event in self.events:
+            yield event
+
+    async def stop(self):
+        return None
+
+
+class RecordingProcess:
+    """Wraps a Claude process and hands its events over once it succeeds."""
+
+    def __init__(self, process, on_complete: Callable[[List[Dict[str, Any]]], None]):
+        self._process = process
+        self._on_complete = on_complete
+
+    def __getattr__(self, name: str):
+        return getattr(self._process, name)
+
+    async def get_output(
+        self, timeout: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        events: List[Dict[str, Any]] = []
+        output = (
+            self._process.get_output(timeout=timeout)
+            if timeout is not None
+            else self._process.get_output()
+        )
+        async for event in output:
+            events.append(event)
+            # Consumers stop iterating at the result event, so record it first.
+            if _is_complete_result(event):
+                self._on_complete(events)
+            yield event
+
+
+class ResponseCache:
+    """Two-tier (memory LRU plus disk) cache of completed Claude runs."""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        disk_max_bytes: Optional[int] = None,
+    ):
+        self.ttl_seconds = (
+            settings.response_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        self.max_entries = (
+            settings.response_cache_max_entries if max_entries is None else max_entries
+        )
+        self.cache_dir = settings.response_cache_dir if cache_dir is None else cache_dir
+        self.disk_max_bytes = (
+            settings.response_cache_disk_max_mb * 1024 * 1024
+            if disk_max_bytes is None
+            else disk_max_bytes
+        )
+        self.memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tasks: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def disk_enabled(self) -> bool:
+        return bool(self.cache_dir) and self.disk_max_bytes > 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > max(self.max_entries, 0):
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable cache entry", key=key, error=str(e))
+            self._remove_disk(key)
+            return None
+        entry = CacheEntry(events=data["events"], expires_at=data["expires_at"])
+        if entry.expires_at <= time.time():
+            self._remove_disk(key)
+            return None
+        # Refresh mtime so disk eviction is least-recently-used.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key: str, entry: CacheEntry) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"expires_at": entry.expires_at, "events": entry.events}, handle)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+
+    def _remove_disk(self, key: str) -> None:
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _prune_disk(self) -> None:
+        now = time.time()
+        files = []
+        total = 0
+        with os.scandir(self.cache_dir) as entries:
+            for dir_entry in entries:
+                if not dir_entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                total += stat.st_size
+        files.sort()
+        for mtime, size, path in files:
+            if total <= self.disk_max_bytes and mtime + self.ttl_seconds > now:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached events for ``key``, or None on a miss."""
+        entry = self.memory.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            del self.memory[key]
+            entry = None
+        if entry is None and self.disk_enabled:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.memory.move_to_end(key)
+        self.hits += 1
+        return entry.events
+
+    def put(self, key: str, events: List[Dict[str, Any]]) -> None:
+        """Store a completed run; the disk write happens in the background."""
+        if self.ttl_seconds <= 0:
+            return
+        entry = CacheEntry(
+            events=list(events), expires_at=time.time() + self.ttl_seconds
+        )
+        self._remember(key, entry)
+        if self.disk_enabled:
+            task = asyncio.create_task(self._store_disk(key, entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _store_disk(self, key: str, entry: CacheEntry) -> None:
+        try:
+            await asyncio.to_thread(self._write_disk, key, entry)
+        except Exception as e:
+            logger.warning("Failed to write cache entry", key=key, error=str(e))
+
+    def record(self, key: str, process) -> RecordingProcess:
+        """Wrap ``process`` so its events are cached once it succeeds."""
+        return RecordingProcess(process, lambda events: self.put(key, events))
+
+    async def close(self) -> None:
+        """Wait for pending disk writes."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
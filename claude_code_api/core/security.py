@@ -1,16 +1,29 @@
 """Security utilities."""
 
+import hashlib
 import os
 import re
+from typing import Optional
 
 import structlog
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
 
 logger = structlog.get_logger()
 
 PATH_TRAVERSAL_MSG = "Invalid path: Path traversal detected"
 
 
+def hash_api_key(api_key: str) -> str:
+    """Return the SHA-256 hex digest stored as ``APIKey.key_hash``."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def request_owner(req: Request) -> Optional[str]:
+    """Identify the caller for batch, file and job ownership checks."""
+    api_key = getattr(req.state, "api_key", None)
+    return hash_api_key(api_key) if api_key else None
+
+
 def _bad_request(detail: str) -> HTTPException:
     return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
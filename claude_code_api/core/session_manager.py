@@ -1,18 +1,23 @@
 """Session management for Claude Code API Gateway."""
 
 import asyncio
+import heapq
 import json
 import os
 import tempfile
+import time
 import uuid
-from datetime import timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import structlog
 
 from claude_code_api.core.config import settings
 from claude_code_api.core.database import db_manager
+from claude_code_api.core.process_stats import ProcessUsage
+from claude_code_api.core.session_stats import SessionStats
 from claude_code_api.models.claude import get_default_model
 from claude_code_api.utils.time import utc_now
 
@@ -31,26 +36,52 @@ class SessionInfo:
     """Session information and metadata."""
 
     def __init__(
-        self, session_id: str, project_id: str, model: str, system_prompt: str = None
+        self,
+        session_id: str,
+        project_id: str,
+        model: str,
+        system_prompt: str = None,
+        api_key_name: Optional[str] = None,
     ):
         self.session_id = session_id
         self.cli_session_id: Optional[str] = None
         self.project_id = project_id
         self.model = model
         self.system_prompt = system_prompt
+        self.api_key_name = api_key_name
         self.created_at = utc_now()
         self.updated_at = utc_now()
         self.message_count = 0
         self.total_tokens = 0
         self.total_cost = 0.0
         self.is_active = True
+        # CPU, memory and I/O of the session's Claude runs
+        self.resource_usage = ProcessUsage()
 
 
 class SessionManager:
-    """Manages active sessions and their lifecycle."""
+    """Manages active sessions and their lifecycle.
+
+    ``active_sessions`` is an LRU capped at ``max_active_sessions``. The
+    least recently used session is dropped from memory when the cap is hit;
+    its row stays active in the database and is restored on the next
+    lookup. Ids the database does not know, or knows as inactive, are cached
+    as misses for ``session_negative_cache_ttl_seconds``.
+
+    Expiry uses a min-heap of ``(deadline, session_id)``. Activity only
+    bumps ``updated_at``; an entry that comes due for a session that has
+    been used since is pushed back with its new deadline. A check therefore
+    touches only the sessions that are due, not every active one.
+    """
 
     def __init__(self):
-        self.active_sessions: Dict[str, SessionInfo] = {}
+        self.active_sessions: "OrderedDict[str, SessionInfo]" = OrderedDict()
+        # session id -> monotonic time the cached miss expires
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        # session id -> deadline of its live heap entry
+        self._expiry_deadlines: Dict[str, datetime] = {}
+        self.stats = SessionStats()
         self.cli_session_index: Dict[str, str] = {}
         self.session_map_path = settings.session_map_path
         self._persist_lock = Lock()
@@ -70,7 +101,7 @@ class SessionManager:
             try:
                 await asyncio.wait_for(
                     self._shutdown_event.wait(),
-                    timeout=settings.cleanup_interval_minutes * 60,
+                    timeout=settings.session_expiry_check_seconds,
                 )
                 break
             except asyncio.TimeoutError:
@@ -148,6 +179,7 @@ class SessionManager:
         model: str = None,
         system_prompt: str = None,
         session_id: str = None,
+        api_key_name: Optional[str] = None,
     ) -> str:
         """Create new session."""
         if session_id is None:
@@ -159,10 +191,11 @@ class SessionManager:
             project_id=project_id,
             model=model or get_default_model(),
             system_prompt=system_prompt,
+            api_key_name=api_key_name,
         )
 
         # Store in active sessions
-        self.active_sessions[session_id] = session_info
+        self._track(session_info)
 
         # Create database record
         session_data = {
@@ -193,11 +226,18 @@ class SessionManager:
             resolved_id = session_id
 
         # Check active sessions first
-        if resolved_id in self.active_sessions:
-            return self.active_sessions[resolved_id]
+        session_info = self.active_sessions.get(resolved_id)
+        if session_info is not None:
+            self.active_sessions.move_to_end(resolved_id)
+            return session_info
+        if self._is_known_missing(resolved_id):
+            return None
 
         # Load from database if not in memory
         db_session = await db_manager.get_session(resolved_id)
+        if resolved_id in self.active_sessions:
+            # Created or restored by another request meanwhile.
+            return self.active_sessions[resolved_id]
         if db_session and db_session.is_active:
             # Restore to active sessions
             session_info = SessionInfo(
@@ -212,11 +252,30 @@ class SessionManager:
             session_info.total_tokens = db_session.total_tokens
             session_info.total_cost = db_session.total_cost
 
-            self.active_sessions[resolved_id] = session_info
+            self._track(session_info)
             return session_info
 
+        self._remember_missing(resolved_id)
         return None
 
+    def _is_known_missing(self, session_id: str) -> bool:
+        expires_at = self._missing.get(session_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._missing[session_id]
+            return False
+        return True
+
+    def _remember_missing(self, session_id: str):
+        ttl = settings.session_negative_cache_ttl_seconds
+        if ttl <= 0 or settings.session_negative_cache_size <= 0:
+            return
+        self._missing[session_id] = time.monotonic() + ttl
+        self._missing.move_to_end(session_id)
+        while len(self._missing) > settings.session_negative_cache_size:
+            self._missing.popitem(last=False)
+
     async def update_session(
         self,
         session_id: str,
@@ -234,6 +293,7 @@ class SessionManager:
         session_info.updated_at = utc_now()
         session_info.total_tokens += tokens_used
         session_info.total_cost += cost
+        self.stats.usage(session_info, tokens_used, cost, 1 if message_content else 0)
 
         if message_content:
             session_info.message_count += 1
@@ -264,17 +324,93 @@ class SessionManager:
             total_tokens=session_info.total_tokens,
         )
 
+    def _track(self, session_info: SessionInfo):
+        """Add a session to the active set and schedule its expiry."""
+        previous = self.active_sessions.get(session_info.session_id)
+        if previous is not None:
+            self.stats.session_removed(previous)
+        self._missing.pop(session_info.session_id, None)
+        self.active_sessions[session_info.session_id] = session_info
+        self.active_sessions.move_to_end(session_info.session_id)
+        self.stats.session_added(session_info)
+        self._schedule_expiry(session_info)
+        while len(self.active_sessions) > max(1, settings.max_active_sessions):
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        """Drop the least recently used session from memory only.
+
+        Its database row stays active, with metrics already written by
+        ``update_session``, so a later lookup restores it. The expiry entry
+        stays too: a session that is not looked up again before its deadline
+        is deactivated in the database like any other idle session.
+        """
+        session_id, session_info = self.active_sessions.popitem(last=False)
+        self.stats.session_removed(session_info)
+        deadline = session_info.updated_at + timedelta(
+            minutes=settings.session_timeout_minutes
+        )
+        if self._expiry_deadlines.get(session_id) != deadline:
+            self._expiry_deadlines[session_id] = deadline
+            heapq.heappush(self._expiry_heap, (deadline, session_id))
+        logger.debug("Session evicted from memory", session_id=session_id)
+
+    def _untrack(self, session_id: str) -> SessionInfo:
+        session_info = self.active_sessions.pop(session_id)
+        self.stats.session_removed(session_info)
+        session_info.is_active = False
+        return session_info
+
+    def _schedule_expiry(self, session_info: SessionInfo):
+        if session_info.session_id in self._expiry_deadlines:
+            return
+        deadline = session_info.updated_at + timedelta(
+            minutes=settings.session_timeout_minutes
+        )
+        self._expiry_deadlines[session_info.session_id] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, session_info.session_id))
+
+    def _pop_expired(self) -> Tuple[List[SessionInfo], List[str]]:
+        """Remove the sessions whose idle timeout has passed.
+
+        Returns the expired sessions that were in memory and the ids of
+        those that had been evicted from it.
+        """
+        now = utc_now()
+        timeout_delta = timedelta(minutes=settings.session_timeout_minutes)
+        expired = []
+        evicted = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            deadline, session_id = heapq.heappop(self._expiry_heap)
+            if self._expiry_deadlines.get(session_id) != deadline:
+                continue
+            del self._expiry_deadlines[session_id]
+            session_info = self.active_sessions.get(session_id)
+            if session_info is None:
+                # Evicted and not looked up since, so idle since eviction.
+                evicted.append(session_id)
+                continue
+            if session_info.updated_at + timeout_delta > now:
+                # Used since this entry was scheduled.
+                self._schedule_expiry(session_info)
+                continue
+            expired.append(self._untrack(session_id))
+        return expired, evicted
+
     async def end_session(self, session_id: str):
         """End session and cleanup."""
         resolved_id = self._resolve_session_id(session_id) or session_id
+        if resolved_id not in self.active_sessions:
+            # May have been evicted from memory while still active in the DB.
+            await self.get_session(resolved_id)
         if resolved_id in self.active_sessions:
-            session_info = self.active_sessions[resolved_id]
-            session_info.is_active = False
             await db_manager.deactivate_session(resolved_id)
+            session_info = self._untrack(resolved_id)
+            self._expiry_deadlines.pop(resolved_id, None)
+            self._remember_missing(resolved_id)
             if session_info.cli_session_id:
                 self.cli_session_index.pop(session_info.cli_session_id, None)
                 self._persist_cli_session_map()
-            del self.active_sessions[resolved_id]
 
             logger.info(
                 "Session ended",
@@ -286,18 +422,40 @@ class SessionManager:
             )
 
     async def cleanup_expired_sessions(self):
-        """Clean up expired sessions."""
-        current_time = utc_now()
-        timeout_delta = timedelta(minutes=settings.session_timeout_minutes)
-        expired_sessions = []
+        """Clean up expired sessions with one database update per batch."""
+        expired, evicted = self._pop_expired()
+        if not expired and not evicted:
+            return
 
-        for session_id, session_info in self.active_sessions.items():
-            if current_time - session_info.updated_at > timeout_delta:
-                expired_sessions.append(session_id)
+        mapping_changed = False
+        for session_info in expired:
+            if session_info.cli_session_id:
+                mapping_changed |= (
+                    self.cli_session_index.pop(session_info.cli_session_id, None)
+                    is not None
+                )
+        if evicted:
+            # Evicted sessions no longer carry their CLI id; one pass over
+            # the index finds their entries.
+            evicted_ids = set(evicted)
+            stale = [
+                cli_id
+                for cli_id, api_id in self.cli_session_index.items()
+                if api_id in evicted_ids
+            ]
+            for cli_id in stale:
+                del self.cli_session_index[cli_id]
+            mapping_changed |= bool(stale)
+        if mapping_changed:
+            self._persist_cli_session_map()
+        session_ids = [s.session_id for s in expired] + evicted
+        await db_manager.deactivate_sessions(session_ids)
 
-        for session_id in expired_sessions:
-            await self.end_session(session_id)
-            logger.info("Session expired and cleaned up", session_id=session_id)
+        logger.info(
+            "Sessions expired and cleaned up",
+            count=len(session_ids),
+            session_ids=session_ids,
+        )
 
     async def cleanup_all(self):
         """Clean up all sessions."""
@@ -311,6 +469,12 @@ class SessionManager:
 
         logger.info("All sessions cleaned up")
 
+    def record_process_usage(self, session_id: str, usage: ProcessUsage) -> None:
+        """Add a finished Claude run's resource usage to its session."""
+        session_info = self.active_sessions.get(session_id)
+        if session_info:
+            session_info.resource_usage.add(usage)
+
     def register_cli_session(self, api_session_id: str, cli_session_id: str):
         if not cli_session_id:
             return
@@ -330,18 +494,8 @@ class SessionManager:
         return len(self.active_sessions)
 
     def get_session_stats(self) -> Dict[str, Any]:
-        """Get session statistics."""
-        total_tokens = sum(s.total_tokens for s in self.active_sessions.values())
-        total_cost = sum(s.total_cost for s in self.active_sessions.values())
-        total_messages = sum(s.message_count for s in self.active_sessions.values())
-
-        return {
-            "active_sessions": len(self.active_sessions),
-            "total_tokens": total_tokens,
-            "total_cost": total_cost,
-            "total_messages": total_messages,
-            "models_in_use": list({s.model for s in self.active_sessions.values()}),
-        }
+        """Get session statistics, with per-model/project/key totals and rates."""
+        return self.stats.snapshot()
 
 
 class ConversationManager:
@@ -0,0 +1,167 @@
+"""Running session aggregates for the stats endpoint.
+
+Totals over the active sessions are adjusted as sessions start, record
+usage and end, so reading them never walks ``active_sessions``. Recent
+throughput comes from a ring of fixed-width time buckets.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BUCKET_SECONDS = 5
+BUCKET_COUNT = 60  # five minutes of history
+RATE_WINDOWS = {"1m": 60, "5m": 300}
+
+
+class UsageTotals:
+    """Session count and usage summed over a group of active sessions."""
+
+    __slots__ = ("sessions", "tokens", "cost", "messages")
+
+    def __init__(self):
+        self.sessions = 0
+        self.tokens = 0
+        self.cost = 0.0
+        self.messages = 0
+
+    def add(self, sessions: int, tokens: int, cost: float, messages: int) -> None:
+        self.sessions += sessions
+        self.tokens += tokens
+        self.cost += cost
+        self.messages += messages
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "tokens": self.tokens,
+            "cost": round(self.cost, 6),
+            "messages": self.messages,
+        }
+
+
+class RateWindow:
+    """Ring buffer of per-bucket token, cost and message counts."""
+
+    def __init__(
+        self,
+        bucket_seconds: int = BUCKET_SECONDS,
+        bucket_count: int = BUCKET_COUNT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self._clock = clock
+        # Bucket index (clock // bucket_seconds) each slot currently holds.
+        self._epochs: List[int] = [-1] * bucket_count
+        self._tokens: List[int] = [0] * bucket_count
+        self._cost: List[float] = [0.0] * bucket_count
+        self._messages: List[int] = [0] * bucket_count
+
+    def _epoch(self) -> int:
+        return int(self._clock() // self.bucket_seconds)
+
+    def record(self, tokens: int, cost: float, messages: int) -> None:
+        epoch = self._epoch()
+        slot = epoch % self.bucket_count
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._tokens[slot] = 0
+            self._cost[slot] = 0.0
+            self._messages[slot] = 0
+        self._tokens[slot] += tokens
+        self._cost[slot] += cost
+        self._messages[slot] += messages
+
+    def rates(self, window_seconds: int) -> Dict[str, float]:
+        """Per-minute rates over the last ``window_seconds``."""
+        buckets = max(1, min(self.bucket_count, window_seconds // self.bucket_seconds))
+        oldest = self._epoch() - buckets + 1
+        tokens = cost = messages = 0
+        for slot, epoch in enumerate(self._epochs):
+            if epoch >= oldest:
+                tokens += self._tokens[slot]
+                cost += self._cost[slot]
+                messages += self._messages[slot]
+        minutes = buckets * self.bucket_seconds / 60
+        return {
+            "tokens_per_minute": round(tokens / minutes, 3),
+            "cost_per_minute": round(cost / minutes, 6),
+            "messages_per_minute": round(messages / minutes, 3),
+        }
+
+
+class SessionStats:
+    """Aggregates over active sessions, overall and per model/project/key."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.totals = UsageTotals()
+        self.groups: Dict[str, Dict[str, UsageTotals]] = {
+            "model": {},
+            "project": {},
+            "key": {},
+        }
+        self.window = RateWindow(clock=clock)
+
+    @staticmethod
+    def _labels(session_info) -> Dict[str, Optional[str]]:
+        return {
+            "model": session_info.model,
+            "project": session_info.project_id,
+            "key": session_info.api_key_name,
+        }
+
+    def _apply(
+        self, session_info, sessions: int, tokens: int, cost: float, messages: int
+    ) -> None:
+        self.totals.add(sessions, tokens, cost, messages)
+        for group, label in self._labels(session_info).items():
+            if label is None:
+                continue
+            totals = self.groups[group].get(label)
+            if totals is None:
+                totals = self.groups[group][label] = UsageTotals()
+            totals.add(sessions, tokens, cost, messages)
+            if totals.sessions <= 0:
+                del self.groups[group][label]
+
+    def session_added(self, session_info) -> None:
+        self._apply(
+            session_info,
+            1,
+            session_info.total_tokens,
+            session_info.total_cost,
+            session_info.message_count,
+        )
+
+    def session_removed(self, session_info) -> None:
+        self._apply(
+            session_info,
+            -1,
+            -session_info.total_tokens,
+            -session_info.total_cost,
+            -session_info.message_count,
+        )
+
+    def usage(self, session_info, tokens: int, cost: float, messages: int) -> None:
+        self._apply(session_info, 0, tokens, cost, messages)
+        self.window.record(tokens, cost, messages)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": self.totals.sessions,
+            "total_tokens": self.totals.tokens,
+            "total_cost": round(self.totals.cost, 6),
+            "total_messages": self.totals.messages,
+            "models_in_use": list(self.groups["model"]),
+            "by_model": _group_dict(self.groups["model"]),
+            "by_project": _group_dict(self.groups["project"]),
+            "by_key": _group_dict(self.groups["key"]),
+            "rates": {
+                name: self.window.rates(seconds)
+                for name, seconds in RATE_WINDOWS.items()
+            },
+        }
+
+
+def _group_dict(groups: Dict[str, UsageTotals]) -> Dict[str, Dict[str, Any]]:
+    return {label: totals.to_dict() for label, totals in groups.items()}
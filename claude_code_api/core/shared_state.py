@@ -0,0 +1,518 @@
+"""State shared between gateway worker processes.
+
+Rate-limit counters, concurrency slots, session ownership and the leases of
+background jobs and batches live behind ``StateBackend`` so that several
+uvicorn workers on one host can enforce a single set of limits. ``MemoryStateBackend`` keeps everything in the current
+process; ``SQLiteStateBackend`` stores it in a WAL-mode SQLite file that every
+worker opens.
+
+Backend methods are synchronous. Code on the event loop calls them through
+``offload``, which runs blocking backends (SQLite may wait up to its busy
+timeout for another worker's lock) in a thread.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar
+
+import structlog
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+RATE_WINDOW_SECONDS = 60
+
+T = TypeVar("T")
+
+
+def _pid_alive(pid: int) -> bool:
+    """Return True when a process with the given PID exists."""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class StateBackend(ABC):
+    """Interface for counters, slots and ownership shared across workers."""
+
+    # True when calls may block on I/O or on other workers' locks.
+    blocking = False
+
+    def __init__(self):
+        self.pid = os.getpid()
+
+    @abstractmethod
+    def check_rate(
+        self, key: str, now: float, requests_per_minute: int, burst: int
+    ) -> bool:
+        """Record a request for ``key`` and return whether it is allowed."""
+
+    @abstractmethod
+    def acquire_slot(self, pool: str, slot_id: str, limit: int) -> bool:
+        """Take one of ``limit`` slots in ``pool``; idempotent per slot_id."""
+
+    @abstractmethod
+    def release_slot(self, pool: str, slot_id: str) -> None:
+        """Give back a slot taken with ``acquire_slot``."""
+
+    @abstractmethod
+    def count_slots(self, pool: str) -> int:
+        """Number of slots currently held in ``pool`` by live workers."""
+
+    @abstractmethod
+    def claim_session(self, session_id: str) -> bool:
+        """Mark this worker as the owner of a running session."""
+
+    @abstractmethod
+    def release_session(self, session_id: str) -> None:
+        """Drop this worker's ownership of a session."""
+
+    @abstractmethod
+    def get_session_owner(self, session_id: str) -> Optional[int]:
+        """PID of the live worker owning ``session_id``, if any."""
+
+    @abstractmethod
+    def claim_lease(self, name: str) -> bool:
+        """Take ownership of ``name`` unless a live worker already holds it."""
+
+    @abstractmethod
+    def release_lease(self, name: str) -> None:
+        """Drop this worker's lease on ``name`` and any cancel request for it."""
+
+    @abstractmethod
+    def get_lease_owner(self, name: str) -> Optional[int]:
+        """PID of the live worker holding the lease on ``name``, if any."""
+
+    @abstractmethod
+    def request_cancel(self, name: str) -> bool:
+        """Ask the worker holding ``name`` to cancel it.
+
+        Returns False when no live worker holds the lease.
+        """
+
+    @abstractmethod
+    def pending_cancels(self) -> List[str]:
+        """Leases held by this worker that another worker asked to cancel."""
+
+    @abstractmethod
+    def release_worker(self) -> None:
+        """Release every slot, session and lease held by this worker."""
+
+    @abstractmethod
+    def prune(self, now: float) -> int:
+        """Drop expired rate counters and rows of dead workers.
+
+        ``check_rate`` only trims the key it is called for, so keys that
+        stop sending need this sweep. Returns the number of rows removed.
+        """
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+    def held_elsewhere(self, name: str, recorded_pid: Optional[int] = None) -> bool:
+        """Whether a live worker other than this one holds ``name``.
+
+        ``recorded_pid`` is the worker stored with the leased record; it covers
+        the memory backend, which cannot see other workers' leases.
+        """
+        pid = self.get_lease_owner(name) or recorded_pid
+        return bool(pid) and pid != self.pid and _pid_alive(pid)
+
+
+async def offload(method: Callable[..., T], *args: Any) -> T:
+    """Call a backend method from the event loop without blocking it."""
+    if getattr(method.__self__, "blocking", False):
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+class MemoryStateBackend(StateBackend):
+    """Single-process backend; limits apply per worker."""
+
+    def __init__(self):
+        super().__init__()
+        self._rates: Dict[str, Dict[str, object]] = {}
+        self._slots: Dict[str, Dict[str, int]] = {}
+        self._sessions: Dict[str, int] = {}
+        self._leases: Dict[str, int] = {}
+        self._cancels: Set[str] = set()
+
+    def check_rate(
+        self, key: str, now: float, requests_per_minute: int, burst: int
+    ) -> bool:
+        user_data = self._rates.setdefault(key, {"requests": [], "burst_used": 0})
+
+        # Remove old requests (older than 1 minute)
+        user_data["requests"] = [
+            req_time
+            for req_time in user_data["requests"]
+            if now - req_time < RATE_WINDOW_SECONDS
+        ]
+
+        # Check burst limit
+        if user_data["burst_used"] >= burst:
+            # Reset burst if enough time has passed
+            if len(user_data["requests"]) == 0:
+                user_data["burst_used"] = 0
+            else:
+                return False
+
+        # Check rate limit
+        if len(user_data["requests"]) >= requests_per_minute:
+            return False
+
+        user_data["requests"].append(now)
+        user_data["burst_used"] += 1
+        return True
+
+    def acquire_slot(self, pool: str, slot_id: str, limit: int) -> bool:
+        slots = self._slots.setdefault(pool, {})
+        if slot_id in slots:
+            return True
+        if len(slots) >= limit:
+            return False
+        slots[slot_id] = self.pid
+        return True
+
+    def release_slot(self, pool: str, slot_id: str) -> None:
+        self._slots.get(pool, {}).pop(slot_id, None)
+
+    def count_slots(self, pool: str) -> int:
+        return len(self._slots.get(pool, {}))
+
+    def claim_session(self, session_id: str) -> bool:
+        self._sessions[session_id] = self.pid
+        return True
+
+    def release_session(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def get_session_owner(self, session_id: str) -> Optional[int]:
+        return self._sessions.get(session_id)
+
+    def claim_lease(self, name: str) -> bool:
+        self._leases[name] = self.pid
+        return True
+
+    def release_lease(self, name: str) -> None:
+        self._leases.pop(name, None)
+        self._cancels.discard(name)
+
+    def get_lease_owner(self, name: str) -> Optional[int]:
+        return self._leases.get(name)
+
+    def request_cancel(self, name: str) -> bool:
+        if name not in self._leases:
+            return False
+        self._cancels.add(name)
+        return True
+
+    def pending_cancels(self) -> List[str]:
+        return sorted(self._cancels)
+
+    def release_worker(self) -> None:
+        self._slots.clear()
+        self._sessions.clear()
+        self._leases.clear()
+        self._cancels.clear()
+
+    def prune(self, now: float) -> int:
+        stale = [
+            key
+            for key, data in self._rates.items()
+            if all(now - ts >= RATE_WINDOW_SECONDS for ts in data["requests"])
+        ]
+        for key in stale:
+            del self._rates[key]
+        return len(stale)
+
+
+class SQLiteStateBackend(StateBackend):
+    """Host-wide backend stored in a SQLite database file.
+
+    Every operation runs in its own ``BEGIN IMMEDIATE`` transaction, which
+    serialises writers across processes. Rows owned by workers that have
+    exited are reclaimed lazily so a crashed worker cannot leak slots.
+    """
+
+    blocking = True
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS rate_events (key TEXT NOT NULL, ts REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS rate_events_key_ts ON rate_events (key, ts)",
+        "CREATE TABLE IF NOT EXISTS rate_state ("
+        "key TEXT PRIMARY KEY, burst_used INTEGER NOT NULL DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS slots ("
+        "pool TEXT NOT NULL, slot_id TEXT NOT NULL, pid INTEGER NOT NULL, "
+        "acquired_at REAL NOT NULL, PRIMARY KEY (pool, slot_id))",
+        "CREATE TABLE IF NOT EXISTS session_owners ("
+        "session_id TEXT PRIMARY KEY, pid INTEGER NOT NULL, claimed_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS leases ("
+        "name TEXT PRIMARY KEY, pid INTEGER NOT NULL, claimed_at REAL NOT NULL, "
+        "cancel_requested INTEGER NOT NULL DEFAULT 0)",
+    )
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._SCHEMA:
+            self._conn.execute(statement)
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn, self._lock)
+
+    def _reap_dead_slots(self, pool: str) -> None:
+        pids = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT DISTINCT pid FROM slots WHERE pool = ?", (pool,)
+            )
+        ]
+        for pid in pids:
+            if pid != self.pid and not _pid_alive(pid):
+                self._conn.execute(
+                    "DELETE FROM slots WHERE pool = ? AND pid = ?", (pool, pid)
+                )
+
+    def check_rate(
+        self, key: str, now: float, requests_per_minute: int, burst: int
+    ) -> bool:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM rate_events WHERE key = ? AND ts <= ?",
+                (key, now - RATE_WINDOW_SECONDS),
+            )
+            recent = conn.execute(
+                "SELECT COUNT(*) FROM rate_events WHERE key = ?", (key,)
+            ).fetchone()[0]
+            row = conn.execute(
+                "SELECT burst_used FROM rate_state WHERE key = ?", (key,)
+            ).fetchone()
+            burst_used = row[0] if row else 0
+
+            if burst_used >= burst:
+                if recent == 0:
+                    burst_used = 0
+                else:
+                    return False
+
+            if recent >= requests_per_minute:
+                return False
+
+            conn.execute("INSERT INTO rate_events (key, ts) VALUES (?, ?)", (key, now))
+            conn.execute(
+                "INSERT INTO rate_state (key, burst_used) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET burst_used = excluded.burst_used",
+                (key, burst_used + 1),
+            )
+            return True
+
+    def acquire_slot(self, pool: str, slot_id: str, limit: int) -> bool:
+        with self._transaction() as conn:
+            existing = conn.execute(
+                "SELECT pid FROM slots WHERE pool = ? AND slot_id = ?",
+                (pool, slot_id),
+            ).fetchone()
+            if existing and (existing[0] == self.pid or _pid_alive(existing[0])):
+                return existing[0] == self.pid
+            self._reap_dead_slots(pool)
+            held = conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE pool = ?", (pool,)
+            ).fetchone()[0]
+            if held >= limit:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO slots (pool, slot_id, pid, acquired_at) "
+                "VALUES (?, ?, ?, ?)",
+                (pool, slot_id, self.pid, time.time()),
+            )
+            return True
+
+    def release_slot(self, pool: str, slot_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM slots WHERE pool = ? AND slot_id = ? AND pid = ?",
+                (pool, slot_id, self.pid),
+            )
+
+    def count_slots(self, pool: str) -> int:
+        with self._transaction() as conn:
+            self._reap_dead_slots(pool)
+            return conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE pool = ?", (pool,)
+            ).fetchone()[0]
+
+    def claim_session(self, session_id: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT pid FROM session_owners WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row and row[0] != self.pid and _pid_alive(row[0]):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO session_owners (session_id, pid, claimed_at) "
+                "VALUES (?, ?, ?)",
+                (session_id, self.pid, time.time()),
+            )
+            return True
+
+    def release_session(self, session_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM session_owners WHERE session_id = ? AND pid = ?",
+                (session_id, self.pid),
+            )
+
+    def get_session_owner(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pid FROM session_owners WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row and _pid_alive(row[0]):
+            return row[0]
+        return None
+
+    def claim_lease(self, name: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT pid FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            if row and row[0] == self.pid:
+                return True
+            if row and _pid_alive(row[0]):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, pid, claimed_at) "
+                "VALUES (?, ?, ?)",
+                (name, self.pid, time.time()),
+            )
+            return True
+
+    def release_lease(self, name: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM leases WHERE name = ? AND pid = ?", (name, self.pid)
+            )
+
+    def get_lease_owner(self, name: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pid FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+        if row and _pid_alive(row[0]):
+            return row[0]
+        return None
+
+    def request_cancel(self, name: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT pid FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            if not row or not (row[0] == self.pid or _pid_alive(row[0])):
+                return False
+            conn.execute(
+                "UPDATE leases SET cancel_requested = 1 WHERE name = ?", (name,)
+            )
+            return True
+
+    def pending_cancels(self) -> List[str]:
+        with self._lock:
+            return [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT name FROM leases WHERE pid = ? AND cancel_requested = 1 "
+                    "ORDER BY name",
+                    (self.pid,),
+                )
+            ]
+
+    def release_worker(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE pid = ?", (self.pid,))
+            conn.execute("DELETE FROM session_owners WHERE pid = ?", (self.pid,))
+            conn.execute("DELETE FROM leases WHERE pid = ?", (self.pid,))
+
+    def prune(self, now: float) -> int:
+        with self._transaction() as conn:
+            removed = conn.execute(
+                "DELETE FROM rate_events WHERE ts <= ?", (now - RATE_WINDOW_SECONDS,)
+            ).rowcount
+            # A key with no events in the window starts with a fresh burst
+            # anyway, so its burst counter can go too.
+            removed += conn.execute(
+                "DELETE FROM rate_state WHERE key NOT IN "
+                "(SELECT DISTINCT key FROM rate_events)"
+            ).rowcount
+            for table in ("slots", "session_owners", "leases"):
+                pids = [
+                    row[0] for row in conn.execute(f"SELECT DISTINCT pid FROM {table}")
+                ]
+                for pid in pids:
+                    if pid != self.pid and not _pid_alive(pid):
+                        removed += conn.execute(
+                            f"DELETE FROM {table} WHERE pid = ?", (pid,)
+                        ).rowcount
+            return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _ImmediateTransaction:
+    """Serialise a block of statements with ``BEGIN IMMEDIATE``."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if exc_type is None:
+                self._conn.execute("COMMIT")
+            else:
+                self._conn.execute("ROLLBACK")
+        finally:
+            self._lock.release()
+        return False
+
+
+def create_state_backend(kind: Optional[str] = None) -> StateBackend:
+    """Build the backend selected by ``settings.shared_state_backend``."""
+    kind = (kind or settings.shared_state_backend or "memory").lower()
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(settings.shared_state_path)
+    raise ValueError(f"Unknown shared state backend: {kind}")
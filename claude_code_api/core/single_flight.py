@@ -0,0 +1,140 @@
+"""Coalescing of identical in-flight completions.
+
+The first request for a key (the leader) starts a Claude process as usual; a
+pump task buffers its events. Identical requests that arrive while it runs
+attach to the same flight and get a ``FlightProcess`` view that replays the
+buffered events and then follows live ones, so each caller builds its own
+response (and completion id) from a single CLI run.
+
+Only the leader pays for the run: its quota meter and session are charged,
+while followers are charged nothing. A leader that disconnects early has
+paid for the events it consumed up to then.
+"""
+
+import asyncio
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class Flight:
+    """One running Claude process shared by identical requests."""
+
+    def __init__(self, group: "SingleFlight", key: str):
+        self.group = group
+        self.key = key
+        self.process = None
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.subscribers = 1
+        self._started: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._changed = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def start(self, process) -> None:
+        """Attach the leader's process and begin buffering its events."""
+        self.process = process
+        self._pump_task = asyncio.create_task(self._pump())
+        self._started.set_result(True)
+
+    def fail(self) -> None:
+        """Mark the leader as failed; waiting followers start their own run."""
+        self.group._finish(self)
+        if not self._started.done():
+            self._started.set_result(False)
+
+    async def wait_started(self) -> bool:
+        """Wait for the leader; False when it failed to start."""
+        return await asyncio.shield(self._started)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self) -> None:
+        try:
+            async for event in self.process.get_output():
+                self.events.append(event)
+                self._notify()
+        except Exception as e:
+            logger.error("Shared Claude stream failed", key=self.key, error=str(e))
+        finally:
+            self.done = True
+            self.group._finish(self)
+            self._notify()
+
+    async def wait_for_event(self, index: int) -> None:
+        """Wait until event ``index`` exists or the run has ended."""
+        while index >= len(self.events) and not self.done:
+            await self._changed.wait()
+
+    def view(self, session_id: str, is_leader: bool = False) -> "FlightProcess":
+        """Create a process-like view of this flight for one request."""
+        return FlightProcess(self, session_id, is_leader)
+
+    async def release(self) -> None:
+        """Detach one subscriber; the last one stops the process."""
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.done and self.process is not None:
+            await self.process.stop()
+
+
+class FlightProcess:
+    """Per-request view of a shared Claude process."""
+
+    def __init__(self, flight: Flight, session_id: str, is_leader: bool = False):
+        self.flight = flight
+        self.session_id = session_id
+        self.is_leader = is_leader
+        self._released = False
+
+    @property
+    def is_running(self) -> bool:
+        return not self.flight.done
+
+    @property
+    def cli_session_id(self) -> Optional[str]:
+        return getattr(self.flight.process, "cli_session_id", None)
+
+    async def get_output(
+        self, timeout: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        # The leader's pump applies the process timeout.
+        index = 0
+        while True:
+            await self.flight.wait_for_event(index)
+            if index >= len(self.flight.events):
+                break
+            yield self.flight.events[index]
+            index += 1
+
+    async def stop(self):
+        if not self._released:
+            self._released = True
+            await self.flight.release()
+
+
+class SingleFlight:
+    """Registry of in-flight runs keyed by normalized request."""
+
+    def __init__(self):
+        self.flights: Dict[str, Flight] = {}
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """Join the flight for ``key``; the bool is True for the leader."""
+        flight = self.flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            return flight, False
+        flight = self.flights[key] = Flight(self, key)
+        return flight, True
+
+    def _finish(self, flight: Flight) -> None:
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
+    def get_inflight_count(self) -> int:
+        """Number of runs currently shared."""
+        return len(self.flights)
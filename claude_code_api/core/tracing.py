@@ -0,0 +1,386 @@
+"""Lightweight request tracing with OTLP/JSON export and Server-Timing.
+
+Spans are plain objects kept in a per-trace list; the active span lives in a
+``ContextVar``, so tasks started inside a span (stream writers, process
+readers) inherit it as their parent. ``TracingMiddleware`` opens one root
+span per HTTP request and adds a ``Server-Timing`` header built from the
+spans that finished before the response started. For a streaming response
+that covers everything up to the first event; the rest reaches the exporter.
+
+When a root span ends its trace is handed to the exporter (``stdout`` or
+``file``, one OTLP/JSON ``resourceSpans`` document per line), which writes on
+a background thread so the event loop never blocks on output.
+"""
+
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+MAX_SPANS_PER_TRACE = 1000
+MAX_SERVER_TIMING_ENTRIES = 20
+SERVICE_NAME = "claude-code-api"
+
+_CURRENT = object()
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return os.urandom(bits // 8).hex()
+
+
+class _Trace:
+    __slots__ = ("trace_id", "finished", "exported", "dropped")
+
+    def __init__(self):
+        self.trace_id = _new_id(128)
+        self.finished: List["Span"] = []
+        self.exported = False
+        self.dropped = 0
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "trace",
+        "span_id",
+        "parent",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "_start_perf",
+        "duration",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"],
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.span_id = _new_id(64)
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.end_ns: Optional[int] = None
+        self.duration = 0.0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self) -> None:
+        """Finish the span; ending a root span exports its trace."""
+        if self.end_ns is not None:
+            return
+        self.duration = time.perf_counter() - self._start_perf
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        trace = self.trace
+        if len(trace.finished) < MAX_SPANS_PER_TRACE:
+            trace.finished.append(self)
+        else:
+            trace.dropped += 1
+        if trace.exported:
+            # A detached task outlived the request; ship its span on its own.
+            exporter.export([self])
+        elif self.is_root:
+            trace.exported = True
+            exporter.export(trace.finished)
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    is_root = False
+    duration = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(
+    name: str, parent: Any = _CURRENT, kind: int = SPAN_KIND_INTERNAL, **attributes
+):
+    """Start a span without making it current; call ``end()`` when done.
+
+    The parent defaults to the current span; ``parent=None`` starts a trace.
+    """
+    if not settings.tracing_enabled:
+        return NOOP_SPAN
+    if parent is _CURRENT:
+        parent = _current_span.get()
+    elif isinstance(parent, _NoopSpan):
+        parent = None
+    return Span(name, parent, kind, attributes)
+
+
+@contextmanager
+def span(name: str, parent: Any = _CURRENT, **attributes) -> Iterator[Any]:
+    """Run the ``with`` block in a new current span."""
+    current = start_span(name, parent, **attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.set_error(type(exc).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def server_timing(root: Span) -> str:
+    """``Server-Timing`` value summing finished spans by name."""
+    totals: Dict[str, float] = {}
+    for finished in root.trace.finished:
+        if finished is not root:
+            totals[finished.name] = totals.get(finished.name, 0.0) + finished.duration
+    entries = [
+        f"{name};dur={seconds * 1000:.1f}"
+        for name, seconds in itertools.islice(totals.items(), MAX_SERVER_TIMING_ENTRIES)
+    ]
+    entries.append(f"total;dur={(time.perf_counter() - root._start_perf) * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    encoded = []
+    for item in spans:
+        entry: Dict[str, Any] = {
+            "traceId": item.trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": item.kind,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns or item.start_ns),
+            "attributes": _otlp_attributes(item.attributes),
+            "status": {"code": item.status},
+        }
+        if item.parent is not None:
+            entry["parentSpanId"] = item.parent.span_id
+        if item.status_message:
+            entry["status"]["message"] = item.status_message
+        encoded.append(entry)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes(
+                        {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+                    )
+                },
+                "scopeSpans": [
+                    {"scope": {"name": "claude_code_api"}, "spans": encoded}
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Writes finished traces as OTLP/JSON lines from a background thread."""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[Optional[List[Span]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.tracing_exporter in ("stdout", "file")
+
+    def export(self, spans: List[Span]) -> None:
+        if not self.enabled or not spans:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="trace-exporter", daemon=True
+                    )
+                    self._thread.start()
+        self._queue.put(list(spans))
+
+    def _open(self):
+        if settings.tracing_exporter == "stdout":
+            return sys.stdout, False
+        os.makedirs(os.path.dirname(settings.tracing_file_path) or ".", exist_ok=True)
+        return open(settings.tracing_file_path, "a", encoding="utf-8"), True
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            try:
+                handle, close = self._open()
+                try:
+                    handle.write(json.dumps(to_otlp(batch), separators=(",", ":")))
+                    handle.write("\n")
+                    # Drain what queued up meanwhile with the same handle.
+                    while True:
+                        try:
+                            batch = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if batch is None:
+                            return
+                        handle.write(json.dumps(to_otlp(batch), separators=(",", ":")))
+                        handle.write("\n")
+                    handle.flush()
+                finally:
+                    if close:
+                        handle.close()
+            except Exception as e:
+                logger.warning("Trace export failed", error=str(e))
+
+    def shutdown(self) -> None:
+        """Flush queued traces and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5.0)
+
+
+exporter = SpanExporter()
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a root span per HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        root = start_span(
+            f"{scope['method']} {scope['path']}",
+            parent=None,
+            kind=SPAN_KIND_SERVER,
+            **{"http.request.method": scope["method"], "url.path": scope["path"]},
+        )
+        token = _current_span.set(root)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.set_error(str(message["status"]))
+                if settings.tracing_server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(root).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                _finish(root, scope)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            root.set_error(type(exc).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            _finish(root, scope)
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """Path template of the matched route, including router prefixes."""
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return None
+    path = scope.get("path", "")
+    if ":path}" in template or path == template:
+        return template
+    # Routes of an included router report their path without its prefix;
+    # every template segment matches one path segment, so the extra leading
+    # segments of the request path are the prefix.
+    extra = path.count("/") - template.count("/")
+    if extra <= 0:
+        return template
+    return "/".join(path.split("/")[: extra + 1]) + template
+
+
+def _finish(root: Span, scope: Scope) -> None:
+    route = route_template(scope)
+    if route and root.end_ns is None:
+        root.name = f"{scope['method']} {route}"
+        root.set_attribute("http.route", route)
+    root.end()
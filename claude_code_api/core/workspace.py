@@ -0,0 +1,128 @@
+"""Copy-on-write clones of project directories.
+
+Parallel samples (``n > 1``), forked chat requests and
+``POST /v1/projects/{id}/clone`` need their own copy of a project so tool
+edits do not collide. Files are cloned with reflinks (``FICLONE``) where the
+filesystem supports them (btrfs, XFS, bcachefs, ...), which shares data blocks
+until either side writes. Elsewhere files are copied byte for byte. With
+``workspace_clone_mode`` set to ``copy`` reflinks are never tried.
+
+Hardlinks are not an option: the Claude CLI's tools edit files in place, and
+a write through a shared inode would change the source project too.
+"""
+
+import asyncio
+import errno
+import os
+import re
+import shutil
+from typing import Optional
+
+import structlog
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = structlog.get_logger()
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+CLONE_REFLINK = "reflink"
+CLONE_COPY = "copy"
+CLONE_MODES = {"auto", CLONE_COPY}
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]")
+_REFLINK_UNSUPPORTED = {
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+}
+
+
+def workspace_path(name: str) -> str:
+    """Path of the workspace ``name`` under the workspace root."""
+    safe_name = _UNSAFE_NAME.sub("_", name).lstrip(".") or "workspace"
+    return os.path.join(settings.workspace_root, safe_name)
+
+
+def reflink_file(source_path: str, target_path: str) -> None:
+    """Clone one file with ``FICLONE``; raises OSError when unsupported."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported here")
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(target_path)
+            raise
+    shutil.copystat(source_path, target_path)
+
+
+class _TreeCloner:
+    """``copytree`` copy function that degrades from reflink to byte copy."""
+
+    def __init__(self, mode: str):
+        self.method = CLONE_COPY if mode == CLONE_COPY else CLONE_REFLINK
+
+    def __call__(self, source_path: str, target_path: str) -> None:
+        if self.method == CLONE_REFLINK:
+            try:
+                reflink_file(source_path, target_path)
+                return
+            except OSError as e:
+                if e.errno not in _REFLINK_UNSUPPORTED:
+                    raise
+                self.method = CLONE_COPY
+        shutil.copy2(source_path, target_path)
+
+
+def clone_workspace(
+    source_path: str, target_path: str, mode: Optional[str] = None
+) -> str:
+    """Clone ``source_path`` to ``target_path``, replacing any previous copy.
+
+    Returns the method used for the files: reflink or copy.
+    """
+    mode = mode or settings.workspace_clone_mode
+    if mode not in CLONE_MODES:
+        raise ValueError(f"Unknown workspace clone mode: {mode}")
+    if os.path.lexists(target_path):
+        shutil.rmtree(target_path)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    cloner = _TreeCloner(mode)
+    shutil.copytree(source_path, target_path, symlinks=True, copy_function=cloner)
+    return cloner.method
+
+
+def remove_workspace(path: str) -> None:
+    """Delete a workspace copy; missing paths are ignored."""
+    shutil.rmtree(path, ignore_errors=True)
+
+
+async def clone_project(source_path: str, target_path: str) -> str:
+    """Clone a project tree without blocking the event loop."""
+    method = await asyncio.to_thread(clone_workspace, source_path, target_path)
+    logger.info(
+        "Workspace cloned", source=source_path, target=target_path, method=method
+    )
+    return method
+
+
+async def clone_for_run(source_path: str, name: str) -> str:
+    """Clone ``source_path`` into a fresh workspace named ``name``."""
+    target_path = workspace_path(name)
+    await clone_project(source_path, target_path)
+    return target_path
+
+
+async def release_workspace(path: str) -> None:
+    """Remove a workspace created by ``clone_for_run``."""
+    await asyncio.to_thread(remove_workspace, path)
@@ -5,6 +5,8 @@ A FastAPI-based service that provides OpenAI-compatible endpoints
 while leveraging Claude Code's powerful workflow capabilities.
 """
 
+import asyncio
+import os
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
@@ -12,19 +14,49 @@ import structlog
 from fastapi import FastAPI, HTTPException, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from claude_code_api.api.admin import router as admin_router
+from claude_code_api.api.batches import create_batch_runner
+from claude_code_api.api.batches import router as batches_router
 from claude_code_api.api.chat import router as chat_router
+from claude_code_api.api.files import router as files_router
+from claude_code_api.api.jobs import router as jobs_router
 from claude_code_api.api.models import router as models_router
 from claude_code_api.api.projects import router as projects_router
 from claude_code_api.api.sessions import router as sessions_router
-from claude_code_api.core.auth import auth_middleware
+from claude_code_api.core.auth import AuthMiddleware, get_rate_limiter
+from claude_code_api.core.batch_scheduler import BatchScheduler
 from claude_code_api.core.claude_manager import ClaudeManager
 from claude_code_api.core.config import settings
 from claude_code_api.core.database import close_database, create_tables
+from claude_code_api.core.jobs import JobManager
+from claude_code_api.core.key_registry import key_registry
 from claude_code_api.core.logging_config import configure_logging
+from claude_code_api.core.loop_monitor import loop_monitor
+from claude_code_api.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from claude_code_api.core.metrics import (
+    MetricsMiddleware,
+    active_streams,
+    claude_active_processes,
+)
+from claude_code_api.core.metrics import registry as metrics_registry
+from claude_code_api.core.process_stats import ProcessSampler
+from claude_code_api.core.profiler import (
+    TaskLabelMiddleware,
+    install_task_factory,
+    uninstall_task_factory,
+)
+from claude_code_api.core.project_gc import ProjectGC
+from claude_code_api.core.project_usage import project_usage
+from claude_code_api.core.quota import QuotaManager
+from claude_code_api.core.response_cache import ResponseCache
 from claude_code_api.core.session_manager import SessionManager
+from claude_code_api.core.single_flight import SingleFlight
+from claude_code_api.core.tracing import TracingMiddleware
+from claude_code_api.core.tracing import exporter as trace_exporter
 from claude_code_api.models.openai import ChatCompletionChunk
+from claude_code_api.utils.streaming import streaming_manager
 
 logger = structlog.get_logger()
 
@@ -43,6 +75,50 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Initialize managers
     app.state.session_manager = SessionManager()
     app.state.claude_manager = ClaudeManager()
+    app.state.quota_manager = QuotaManager()
+    app.state.quota_manager.start()
+    app.state.response_cache = (
+        ResponseCache() if settings.response_cache_enabled else None
+    )
+    app.state.single_flight = SingleFlight() if settings.single_flight_enabled else None
+    app.state.batch_scheduler = BatchScheduler(
+        create_batch_runner(app), state_backend=app.state.claude_manager.state_backend
+    )
+    await app.state.batch_scheduler.start()
+    app.state.job_manager = JobManager(
+        state_backend=app.state.claude_manager.state_backend
+    )
+    await app.state.job_manager.start()
+    await key_registry.reload()
+    key_registry.start()
+    get_rate_limiter().start()
+
+    def busy_project_paths():
+        # Live sessions may start another run in their project at any time.
+        yield from (
+            os.path.join(settings.project_root, session.project_id)
+            for session in app.state.session_manager.active_sessions.values()
+        )
+        yield from (
+            process.project_path
+            for process in app.state.claude_manager.processes.values()
+        )
+
+    app.state.project_gc = ProjectGC(busy_paths=busy_project_paths)
+    if settings.project_gc_enabled:
+        app.state.project_gc.start()
+    app.state.process_sampler = ProcessSampler(
+        lambda: app.state.claude_manager.processes.values()
+    )
+    if settings.process_sample_interval_seconds > 0:
+        app.state.process_sampler.start()
+    claude_active_processes.set_function(
+        lambda: len(app.state.claude_manager.processes)
+    )
+    active_streams.set_function(streaming_manager.get_active_stream_count)
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    install_task_factory(asyncio.get_running_loop())
     logger.info("Managers initialized", lifecycle=True)
 
     # Verify Claude Code availability
@@ -60,8 +136,22 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     # Cleanup
     logger.info("Shutting down Claude Code API Gateway", lifecycle=True)
+    await app.state.batch_scheduler.stop()
+    await app.state.job_manager.stop()
     await app.state.session_manager.cleanup_all()
+    await app.state.claude_manager.cleanup_all()
+    await key_registry.stop()
+    await get_rate_limiter().stop()
+    await app.state.project_gc.stop()
+    await app.state.process_sampler.stop()
+    await loop_monitor.stop()
+    uninstall_task_factory(asyncio.get_running_loop())
+    await project_usage.stop()
+    if app.state.response_cache is not None:
+        await app.state.response_cache.close()
+    await app.state.quota_manager.stop()
     await close_database()
+    await asyncio.to_thread(trace_exporter.shutdown)
     logger.info("Shutdown complete", lifecycle=True)
 
 
@@ -117,8 +207,14 @@ app.add_middleware(
     allow_headers=settings.allowed_headers,
 )
 
-# Authentication middleware
-app.middleware("http")(auth_middleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TaskLabelMiddleware)
+
+# Authentication middleware, outside everything but tracing
+app.add_middleware(AuthMiddleware)
+
+# Tracing runs outermost so the root span and Server-Timing cover auth
+app.add_middleware(TracingMiddleware)
 
 
 @app.exception_handler(HTTPException)
@@ -195,6 +291,12 @@ async def health_check():
         )
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of in-process metrics."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -207,9 +309,13 @@ async def root():
             "models": "/v1/models",
             "projects": "/v1/projects",
             "sessions": "/v1/sessions",
+            "files": "/v1/files",
+            "batches": "/v1/batches",
+            "jobs": "/v1/jobs",
         },
         "docs": "/docs",
         "health": "/health",
+        "metrics": "/metrics",
     }
 
 
@@ -218,6 +324,10 @@ app.include_router(chat_router, prefix="/v1", tags=["chat"])
 app.include_router(models_router, prefix="/v1", tags=["models"])
 app.include_router(projects_router, prefix="/v1", tags=["projects"])
 app.include_router(sessions_router, prefix="/v1", tags=["sessions"])
+app.include_router(files_router, prefix="/v1", tags=["files"])
+app.include_router(batches_router, prefix="/v1", tags=["batches"])
+app.include_router(jobs_router, prefix="/v1", tags=["jobs"])
+app.include_router(admin_router, tags=["admin"])
 
 
 if __name__ == "__main__":
@@ -57,6 +57,7 @@ class ClaudeMessage(BaseModel):
     error: Optional[str] = Field(None, description="Error message")
     usage: Optional[Dict[str, Any]] = Field(None, description="Token usage")
     cost_usd: Optional[float] = Field(None, description="Cost in USD")
+    total_cost_usd: Optional[float] = Field(None, description="Run cost in USD")
     duration_ms: Optional[int] = Field(None, description="Duration in milliseconds")
     num_turns: Optional[int] = Field(None, description="Number of turns")
     timestamp: Optional[str] = Field(None, description="Timestamp")
@@ -181,6 +182,22 @@ class ClaudeWorkspaceInfo(BaseModel):
     claude_md_files: List[str] = Field(..., description="CLAUDE.md files found")
 
 
+class ClaudeWorkspaceListing(ClaudeWorkspaceInfo):
+    """One page of a workspace file listing."""
+
+    cursor: int = Field(..., description="Pass as 'since' to list only later changes")
+    has_more: bool = Field(..., description="Whether more files follow this page")
+    next_after: Optional[str] = Field(
+        None, description="Pass as 'after' to fetch the next page"
+    )
+    removed: List[str] = Field(
+        default_factory=list, description="Paths removed since the given cursor"
+    )
+    reset: bool = Field(
+        False, description="The cursor was too old; relist without 'since'"
+    )
+
+
 class ClaudeVersionInfo(BaseModel):
     """Claude version information."""
 
@@ -128,6 +128,11 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: Optional[int] = Field(
         None, ge=1, description="Maximum number of tokens to generate"
     )
+    n: Optional[int] = Field(
+        1,
+        ge=1,
+        description="Number of choices to generate; each runs as its own Claude process",
+    )
     stream: Optional[bool] = Field(
         False, description="Whether to stream partial message deltas"
     )
@@ -159,6 +164,20 @@ class ChatCompletionRequest(BaseModel):
         None, description="Session ID to continue conversation"
     )
     system_prompt: Optional[str] = Field(None, description="System prompt override")
+    fork_project: Optional[bool] = Field(
+        False,
+        description=(
+            "Run in a copy-on-write clone of the project; the response's "
+            "project_id names the clone"
+        ),
+    )
+    cache: Optional[Literal["default", "bypass", "only"]] = Field(
+        None,
+        description=(
+            "Response cache control: 'bypass' skips the lookup and refreshes the "
+            "entry, 'only' answers from cache or fails with cache_miss"
+        ),
+    )
 
 
 class ChatCompletionChoice(BaseModel):
@@ -296,6 +315,15 @@ class ProjectInfo(BaseModel):
     created_at: datetime = Field(..., description="Creation timestamp")
     updated_at: datetime = Field(..., description="Last update timestamp")
     is_active: bool = Field(True, description="Whether the project is active")
+    size_bytes: Optional[int] = Field(
+        None, description="Disk usage of the project directory, when known"
+    )
+    file_count: Optional[int] = Field(
+        None, description="Number of files in the project directory, when known"
+    )
+    quota_bytes: Optional[int] = Field(
+        None, description="Disk quota for the project (None when unlimited)"
+    )
 
 
 class CreateProjectRequest(BaseModel):
@@ -306,6 +334,13 @@ class CreateProjectRequest(BaseModel):
     path: Optional[str] = Field(None, description="Custom project path")
 
 
+class CloneProjectRequest(BaseModel):
+    """Clone project request model."""
+
+    name: Optional[str] = Field(None, description="Name of the clone")
+    description: Optional[str] = Field(None, description="Description of the clone")
+
+
 class SessionInfo(BaseModel):
     """Session information model."""
 
@@ -426,6 +461,108 @@ class FileUploadResponse(BaseModel):
     uploaded_at: datetime = Field(..., description="Upload timestamp")
 
 
+# Batch API models
+class FileObject(BaseModel):
+    """Stored file model."""
+
+    id: str = Field(..., description="File identifier")
+    object: Literal["file"] = Field("file", description="Object type")
+    bytes: int = Field(..., description="File size in bytes")
+    created_at: int = Field(..., description="Unix timestamp of creation")
+    filename: str = Field(..., description="Original filename")
+    purpose: str = Field(..., description="Intended use of the file")
+
+
+class BatchRequestCounts(BaseModel):
+    """Progress counters for a batch."""
+
+    total: int = Field(..., description="Number of requests in the batch")
+    completed: int = Field(..., description="Requests that succeeded")
+    failed: int = Field(..., description="Requests that failed")
+
+
+class BatchObject(BaseModel):
+    """Batch model."""
+
+    id: str = Field(..., description="Batch identifier")
+    object: Literal["batch"] = Field("batch", description="Object type")
+    endpoint: str = Field(..., description="Endpoint used for every request")
+    errors: Optional[Dict[str, Any]] = Field(None, description="Validation errors")
+    input_file_id: str = Field(..., description="Input file identifier")
+    completion_window: str = Field(..., description="Time frame for the batch")
+    status: Literal[
+        "validating",
+        "failed",
+        "in_progress",
+        "finalizing",
+        "completed",
+        "expired",
+        "cancelling",
+        "cancelled",
+    ] = Field(..., description="Batch status")
+    output_file_id: Optional[str] = Field(None, description="Successful results")
+    error_file_id: Optional[str] = Field(None, description="Failed results")
+    created_at: int = Field(..., description="Unix timestamp of creation")
+    in_progress_at: Optional[int] = Field(None, description="When processing began")
+    completed_at: Optional[int] = Field(None, description="When the batch completed")
+    failed_at: Optional[int] = Field(None, description="When the batch failed")
+    cancelling_at: Optional[int] = Field(None, description="When cancel was requested")
+    cancelled_at: Optional[int] = Field(
+        None, description="When the batch was cancelled"
+    )
+    request_counts: BatchRequestCounts = Field(..., description="Progress counters")
+    metadata: Optional[Dict[str, str]] = Field(None, description="User metadata")
+
+
+class CreateBatchRequest(BaseModel):
+    """Create batch request model."""
+
+    input_file_id: str = Field(..., description="Uploaded JSONL file of requests")
+    endpoint: str = Field(
+        "/v1/chat/completions", description="Endpoint used for every request"
+    )
+    completion_window: Literal["24h"] = Field(
+        "24h", description="Time frame for the batch"
+    )
+    metadata: Optional[Dict[str, str]] = Field(None, description="User metadata")
+
+
+class BatchListResponse(BaseModel):
+    """List of batches."""
+
+    object: Literal["list"] = Field("list", description="Object type")
+    data: List[BatchObject] = Field(..., description="Batches, newest first")
+    first_id: Optional[str] = Field(None, description="First batch id in data")
+    last_id: Optional[str] = Field(None, description="Last batch id in data")
+    has_more: bool = Field(False, description="Whether more batches exist")
+
+
+# Async job models
+class ChatCompletionJob(BaseModel):
+    """Detached chat completion job."""
+
+    id: str = Field(..., description="Job identifier")
+    object: Literal["chat.completion.job"] = Field(
+        "chat.completion.job", description="Object type"
+    )
+    status: Literal["running", "cancelling", "completed", "failed", "cancelled"] = (
+        Field(..., description="Job status")
+    )
+    session_id: str = Field(..., description="Session running the completion")
+    project_id: str = Field(..., description="Project context")
+    model: str = Field(..., description="Model used")
+    created_at: int = Field(..., description="Unix timestamp of creation")
+    completed_at: Optional[int] = Field(None, description="When the job finished")
+    event_count: int = Field(0, description="Claude events stored so far")
+    partial_output: Optional[str] = Field(
+        None, description="Assistant text so far while the job is running"
+    )
+    result: Optional[Dict[str, Any]] = Field(
+        None, description="Final chat completion response"
+    )
+    error: Optional[Dict[str, Any]] = Field(None, description="Error details")
+
+
 # Configuration models
 class APIConfiguration(BaseModel):
     """API configuration model."""
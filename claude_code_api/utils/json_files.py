@@ -0,0 +1,27 @@
+"""JSON record files shared by the job and batch stores."""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+def public_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip internal ``_``-prefixed fields from a stored record."""
+    return {k: v for k, v in record.items() if not k.startswith("_")}
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    """Write ``data`` atomically: readers see the old or the new file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Optional[Dict[str, Any]]:
+    """Load a JSON file; None when it does not exist."""
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
@@ -3,7 +3,7 @@
 import json
 import uuid
 from datetime import datetime
-from typing import Any, Dict, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple
 
 import structlog
 
@@ -41,15 +41,23 @@ def _text_from_part(part: Any) -> Optional[str]:
     return None
 
 
+def _usage_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    if not usage:
+        return 0
+    return int(usage.get("input_tokens") or 0) + int(usage.get("output_tokens") or 0)
+
+
 class ClaudeOutputParser:
     """Parser for Claude Code JSONL output."""
 
-    def __init__(self):
+    def __init__(self, usage_callback: Optional[Callable[[int, float], None]] = None):
         self.session_id: Optional[str] = None
         self.model: Optional[str] = None
         self.total_tokens = 0
         self.total_cost = 0.0
         self.message_count = 0
+        self.usage_callback = usage_callback
+        self._charged_message_ids: Set[str] = set()
 
     def parse_line(self, line: str) -> Optional[ClaudeMessage]:
         """Parse a single JSONL line."""
@@ -80,19 +88,48 @@ class ClaudeOutputParser:
             self.model = message.model
 
         # Track metrics
-        if message.usage:
-            input_tokens = message.usage.get("input_tokens", 0)
-            output_tokens = message.usage.get("output_tokens", 0)
-            self.total_tokens += input_tokens + output_tokens
+        if message.type == "result":
+            tokens, cost = self._result_remainder(message)
+        else:
+            tokens = _usage_tokens(message.usage or self._turn_usage(message))
+            cost = message.cost_usd or 0.0
+        self.total_tokens += tokens
+        self.total_cost += cost
 
-        if message.cost_usd:
-            self.total_cost += message.cost_usd
+        if self.usage_callback and (tokens or cost):
+            self.usage_callback(tokens, cost)
 
         if message.type in ["user", "assistant"]:
             self.message_count += 1
 
         return message
 
+    def _turn_usage(self, message: ClaudeMessage) -> Optional[Dict[str, Any]]:
+        """Usage of one API turn, charged once per message id.
+
+        The CLI repeats the same ``message.usage`` on every assistant event
+        that carries a content block of that turn.
+        """
+        payload = message.message or {}
+        usage = payload.get("usage")
+        if not isinstance(usage, dict):
+            return None
+        message_id = payload.get("id")
+        if message_id:
+            if message_id in self._charged_message_ids:
+                return None
+            self._charged_message_ids.add(message_id)
+        return usage
+
+    def _result_remainder(self, message: ClaudeMessage) -> Tuple[int, float]:
+        """Run totals from the result event minus what the turns charged."""
+        run_cost = message.total_cost_usd
+        if run_cost is None:
+            run_cost = message.cost_usd or 0.0
+        tokens = max(0, _usage_tokens(message.usage) - self.total_tokens)
+        cost = max(0.0, run_cost - self.total_cost)
+        return tokens, cost
+
     def parse_stream(self, lines: List[str]) -> Generator[ClaudeMessage, None, None]:
         """Parse multiple JSONL lines."""
         for line in lines:
@@ -208,6 +245,7 @@ class ClaudeOutputParser:
         self.total_tokens = 0
         self.total_cost = 0.0
         self.message_count = 0
+        self._charged_message_ids.clear()
 
 
 class OpenAIConverter:
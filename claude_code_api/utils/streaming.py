@@ -5,11 +5,22 @@ import contextlib
 import json
 import uuid
 from dataclasses import dataclass
-from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import structlog
 
 from claude_code_api.core.claude_manager import ClaudeProcess
+from claude_code_api.core.quota import QuotaMeter
 from claude_code_api.utils.parser import (
     ClaudeOutputParser,
     OpenAIConverter,
@@ -22,6 +33,9 @@ logger = structlog.get_logger()
 
 CHUNK_OBJECT_TYPE = "chat.completion.chunk"
 
+# Called with the merged usage summary and cost once a stream has finished.
+UsageRecorder = Callable[[Dict[str, Any], float], Awaitable[None]]
+
 
 class SSEFormatter:
     """Formats data for Server-Sent Events."""
@@ -59,13 +73,25 @@ class SSEFormatter:
 class OpenAIStreamConverter:
     """Converts Claude Code output to OpenAI-compatible streaming format."""
 
-    def __init__(self, model: str, session_id: str):
+    def __init__(
+        self,
+        model: str,
+        session_id: str,
+        quota_meter: Optional[QuotaMeter] = None,
+        choice_index: int = 0,
+        completion_id: Optional[str] = None,
+        created: Optional[int] = None,
+    ):
         self.model = model
         self.session_id = session_id
-        self.completion_id = f"chatcmpl-{uuid.uuid4().hex[:29]}"
-        self.created = utc_timestamp()
+        self.completion_id = completion_id or f"chatcmpl-{uuid.uuid4().hex[:29]}"
+        self.created = created or utc_timestamp()
+        self.choice_index = choice_index
         self.chunk_index = 0
-        self.parser = ClaudeOutputParser()
+        self.quota_meter = quota_meter
+        self.parser = ClaudeOutputParser(
+            usage_callback=quota_meter.charge if quota_meter else None
+        )
         self.tool_call_index = 0
 
     def _build_chunk(
@@ -76,7 +102,13 @@ class OpenAIStreamConverter:
             "object": CHUNK_OBJECT_TYPE,
             "created": self.created,
             "model": self.model,
-            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            "choices": [
+                {
+                    "index": self.choice_index,
+                    "delta": delta,
+                    "finish_reason": finish_reason,
+                }
+            ],
         }
 
     def _build_tool_calls(self, tool_uses: List[Any]) -> List[Dict[str, Any]]:
@@ -111,9 +143,13 @@ class OpenAIStreamConverter:
         return chunks, saw_text, saw_tool_calls
 
     async def convert_stream(
-        self, claude_process: ClaudeProcess
+        self, claude_process: ClaudeProcess, include_done: bool = True
     ) -> AsyncGenerator[str, None]:
-        """Convert Claude Code output stream to OpenAI format."""
+        """Convert Claude Code output stream to OpenAI format.
+
+        ``include_done=False`` leaves the ``[DONE]`` signal to the caller, for
+        streams that interleave several choices.
+        """
         try:
             # Send initial chunk to establish streaming
             yield SSEFormatter.format_event(
@@ -122,6 +158,7 @@ class OpenAIStreamConverter:
 
             saw_assistant_text = False
             saw_tool_calls = False
+            stop_reason: Optional[str] = None
 
             # Process Claude output
             async for claude_message in claude_process.get_output():
@@ -140,14 +177,25 @@ class OpenAIStreamConverter:
                 if self.parser.is_final_message(message):
                     break
 
+                if self.quota_meter and self.quota_meter.exceeded:
+                    logger.warning(
+                        "Quota exceeded, stopping Claude process",
+                        session_id=self.session_id,
+                        quota=self.quota_meter.exceeded,
+                    )
+                    await claude_process.stop()
+                    stop_reason = "length"
+                    break
+
             # Send final chunk
-            finish_reason = "tool_calls" if saw_tool_calls else "stop"
+            finish_reason = stop_reason or ("tool_calls" if saw_tool_calls else "stop")
             yield SSEFormatter.format_event(
                 self._build_chunk({}, finish_reason=finish_reason)
             )
 
             # Send completion signal
-            yield SSEFormatter.format_completion()
+            if include_done:
+                yield SSEFormatter.format_completion()
 
         except Exception as e:
             logger.error("Error in stream conversion", error=str(e), exc_info=True)
@@ -156,7 +204,7 @@ class OpenAIStreamConverter:
 
 @dataclass
 class StreamState:
-    converter: OpenAIStreamConverter
+    converters: List[OpenAIStreamConverter]
     heartbeat_queue: asyncio.Queue[Optional[str]]
 
 
@@ -168,35 +216,111 @@ class StreamingManager:
         self.heartbeat_interval = 30  # seconds
 
     async def create_stream(
-        self, session_id: str, model: str, claude_process: ClaudeProcess
+        self,
+        session_id: str,
+        model: str,
+        claude_process: ClaudeProcess,
+        quota_meter: Optional[QuotaMeter] = None,
     ) -> AsyncGenerator[str, None]:
         """Create new streaming connection."""
-        converter = OpenAIStreamConverter(model, session_id)
+        converter = OpenAIStreamConverter(model, session_id, quota_meter=quota_meter)
+        async for chunk in self._run_stream(
+            session_id, [(converter, claude_process)], include_done=True
+        ):
+            yield chunk
+
+    async def create_choices_stream(
+        self,
+        session_id: str,
+        model: str,
+        claude_processes: Sequence[ClaudeProcess],
+        quota_meter: Optional[QuotaMeter] = None,
+        on_usage: Optional[UsageRecorder] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream several choices of one completion, interleaved as they arrive.
+
+        After the last choice finishes, a chunk with empty ``choices`` carries
+        the usage summed over every choice, and ``on_usage`` records it.
+        """
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:29]}"
+        created = utc_timestamp()
+        pairs = [
+            (
+                OpenAIStreamConverter(
+                    model,
+                    session_id,
+                    quota_meter=quota_meter,
+                    choice_index=index,
+                    completion_id=completion_id,
+                    created=created,
+                ),
+                claude_process,
+            )
+            for index, claude_process in enumerate(claude_processes)
+        ]
+        async for chunk in self._run_stream(session_id, pairs, include_done=False):
+            yield chunk
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        total_cost = 0.0
+        for converter, _ in pairs:
+            choice_usage = OpenAIConverter.calculate_usage(converter.parser)
+            for field in usage:
+                usage[field] += choice_usage.get(field, 0)
+            total_cost += converter.parser.total_cost
+        if on_usage:
+            await on_usage(usage, total_cost)
+        yield SSEFormatter.format_event(
+            {
+                "id": completion_id,
+                "object": CHUNK_OBJECT_TYPE,
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+        )
+        yield SSEFormatter.format_completion()
+
+    async def _run_stream(
+        self,
+        session_id: str,
+        pairs: List[Tuple[OpenAIStreamConverter, ClaudeProcess]],
+        include_done: bool,
+    ) -> AsyncGenerator[str, None]:
         heartbeat_queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
         self.active_streams[session_id] = StreamState(
-            converter=converter, heartbeat_queue=heartbeat_queue
+            converters=[converter for converter, _ in pairs],
+            heartbeat_queue=heartbeat_queue,
         )
 
-        async def _pump_stream():
+        async def _pump_stream(converter, claude_process):
             try:
-                async for chunk in converter.convert_stream(claude_process):
+                async for chunk in converter.convert_stream(
+                    claude_process, include_done=include_done
+                ):
                     await heartbeat_queue.put(chunk)
             finally:
                 await heartbeat_queue.put(None)
 
         heartbeat_task: Optional[asyncio.Task] = None
-        stream_task: Optional[asyncio.Task] = None
+        stream_tasks: List[asyncio.Task] = []
         try:
             # Start heartbeat task
             heartbeat_task = asyncio.create_task(
                 self._send_heartbeats(session_id, heartbeat_queue)
             )
 
-            stream_task = asyncio.create_task(_pump_stream())
-            while True:
+            stream_tasks = [
+                asyncio.create_task(_pump_stream(converter, claude_process))
+                for converter, claude_process in pairs
+            ]
+            pending = len(stream_tasks)
+            while pending:
                 chunk = await heartbeat_queue.get()
                 if chunk is None:
-                    break
+                    pending -= 1
+                    continue
                 yield chunk
 
         except Exception as e:
@@ -205,16 +329,13 @@ class StreamingManager:
             )
             yield SSEFormatter.format_error("Streaming failed")
         finally:
-            if heartbeat_task:
-                heartbeat_task.cancel()
-            if stream_task:
-                stream_task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                if heartbeat_task:
-                    await heartbeat_task
-            with contextlib.suppress(asyncio.CancelledError):
-                if stream_task:
-                    await stream_task
+            tasks = [heartbeat_task] if heartbeat_task else []
+            tasks.extend(stream_tasks)
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
             # Cleanup
             if session_id in self.active_streams:
                 del self.active_streams[session_id]
@@ -318,12 +439,39 @@ streaming_manager = StreamingManager()
 
 
 async def create_sse_response(
-    session_id: str, model: str, claude_process: ClaudeProcess
+    session_id: str,
+    model: str,
+    claude_process: ClaudeProcess,
+    quota_meter: Optional[QuotaMeter] = None,
 ) -> AsyncGenerator[str, None]:
     """Create SSE response for Claude Code output."""
     try:
         async for chunk in streaming_manager.create_stream(
-            session_id, model, claude_process
+            session_id, model, claude_process, quota_meter=quota_meter
+        ):
+            yield chunk
+    except Exception as e:
+        logger.error(
+            "SSE response error", session_id=session_id, error=str(e), exc_info=True
+        )
+        yield SSEFormatter.format_error("Stream error")
+
+
+async def create_choices_sse_response(
+    session_id: str,
+    model: str,
+    claude_processes: Sequence[ClaudeProcess],
+    quota_meter: Optional[QuotaMeter] = None,
+    on_usage: Optional[UsageRecorder] = None,
+) -> AsyncGenerator[str, None]:
+    """Create SSE response interleaving ``n`` Claude runs as separate choices."""
+    try:
+        async for chunk in streaming_manager.create_choices_stream(
+            session_id,
+            model,
+            claude_processes,
+            quota_meter=quota_meter,
+            on_usage=on_usage,
         ):
             yield chunk
     except Exception as e:
@@ -386,7 +534,11 @@ def _extract_assistant_payload(
 
 
 def create_non_streaming_response(
-    messages: list, session_id: str, model: str, usage: Optional[Dict[str, Any]] = None
+    messages: list,
+    session_id: str,
+    model: str,
+    usage: Optional[Dict[str, Any]] = None,
+    finish_reason: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Create non-streaming response."""
     completion_id = f"chatcmpl-{uuid.uuid4().hex[:29]}"
@@ -420,7 +572,7 @@ def create_non_streaming_response(
     if usage is None:
         usage = OpenAIConverter.calculate_usage(parser)
 
-    finish_reason = "tool_calls" if tool_calls else "stop"
+    finish_reason = finish_reason or ("tool_calls" if tool_calls else "stop")
 
     message_payload: Dict[str, Any] = {
         "role": "assistant",
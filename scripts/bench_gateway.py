@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Load-test the gateway against the fixture-replaying fake CLI.
+
+The app runs in-process, with its lifespan, in a throwaway state directory.
+Requests are driven straight through the ASGI interface, so the numbers
+reflect the gateway's own overhead (process management, stream conversion,
+session bookkeeping) rather than network or server costs. ``scripts/
+fake_claude.py`` stands in for the CLI; its spawn delay, event pacing and
+payload size are set from the command line, and fixtures recorded with
+timing are replayed at ``--speed``.
+
+Reports per-mode latency and time-to-first-byte percentiles, throughput,
+peak RSS and event-loop lag.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+LAG_INTERVAL = 0.01
+
+
+def _configure_environment(args: argparse.Namespace, state_dir: str) -> None:
+    """Point settings at a scratch directory before the app is imported."""
+    wrapper = os.path.join(state_dir, "claude")
+    with open(wrapper, "w", encoding="utf-8") as handle:
+        handle.write("#!/usr/bin/env bash\n")
+        handle.write(
+            f'exec "{sys.executable}" "{SCRIPTS_DIR / "fake_claude.py"}" "$@"\n'
+        )
+    os.chmod(wrapper, 0o755)
+
+    os.environ.update(
+        {
+            "CLAUDE_BINARY_PATH": wrapper,
+            "DATABASE_URL": f"sqlite:///{state_dir}/bench.db",
+            "PROJECT_ROOT": os.path.join(state_dir, "projects"),
+            "SESSION_MAP_PATH": os.path.join(state_dir, "session_map.json"),
+            "BATCH_STORAGE_DIR": os.path.join(state_dir, "batches"),
+            "JOB_STORAGE_DIR": os.path.join(state_dir, "jobs"),
+            "WORKSPACE_ROOT": os.path.join(state_dir, "workspaces"),
+            "LOG_FILE_PATH": os.path.join(state_dir, "bench.log"),
+            "LOG_LEVEL": args.log_level,
+            "LOG_TO_CONSOLE": "false",
+            "REQUIRE_AUTH": "false",
+            "RESPONSE_CACHE_ENABLED": "false",
+            "SINGLE_FLIGHT_ENABLED": "false",
+            "MAX_CONCURRENT_SESSIONS": str(args.concurrency),
+            "FAKE_CLAUDE_SPAWN_DELAY": str(args.spawn_delay),
+            "FAKE_CLAUDE_EVENT_DELAY": str(args.event_delay),
+            "FAKE_CLAUDE_PAYLOAD_BYTES": str(args.payload_bytes),
+            "FAKE_CLAUDE_SPEED": str(args.speed),
+        }
+    )
+    if args.fixtures:
+        os.environ["FAKE_CLAUDE_FIXTURES"] = os.path.abspath(args.fixtures)
+
+
+async def _request(app, body: Dict[str, Any]) -> Dict[str, Any]:
+    payload = json.dumps(body).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "path": "/v1/chat/completions",
+        "raw_path": b"/v1/chat/completions",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+        "state": {},
+    }
+    sent_request = False
+    done = asyncio.Event()
+    result = {"status": 0, "bytes": 0, "first_byte": None}
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body_bytes = message.get("body", b"")
+            if result["status"] != 200 and not result.get("error"):
+                result["error"] = body_bytes[:200].decode("utf-8", "replace")
+            if body_bytes and result["first_byte"] is None:
+                result["first_byte"] = time.perf_counter() - started
+            result["bytes"] += len(body_bytes)
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    result["latency"] = time.perf_counter() - started
+    return result
+
+
+async def _sample_loop_lag(samples: List[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    if len(values) == 1:
+        return {key: values[0] for key in ("p50", "p95", "p99", "max")}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(values)}
+
+
+def _rss_mib() -> Dict[str, float]:
+    current = 0.0
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as handle:
+            current = int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kib //= 1024
+    return {"current": current / 2**20, "peak": peak_kib / 1024}
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    from claude_code_api.core import auth as auth_module
+    from claude_code_api.main import app
+
+    auth_module.rate_limiter.requests_per_minute = 10**9
+    auth_module.rate_limiter.burst = 10**9
+
+    rng = random.Random(args.seed)
+    modes = [
+        "stream" if rng.random() < args.stream_ratio else "non-stream"
+        for _ in range(args.requests)
+    ]
+    results: Dict[str, List[Dict[str, Any]]] = {"stream": [], "non-stream": []}
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+
+    async with app.router.lifespan_context(app):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(mode: str) -> None:
+            body = {
+                "model": args.model,
+                "messages": [{"role": "user", "content": args.prompt}],
+                "stream": mode == "stream",
+            }
+            async with semaphore:
+                results[mode].append(await _request(app, body))
+
+        for mode in ("stream", "non-stream"):
+            await one(mode)  # warm up imports, routing and the database
+        results = {"stream": [], "non-stream": []}
+
+        lag_task = asyncio.create_task(_sample_loop_lag(lag_samples, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(mode) for mode in modes))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await lag_task
+
+    report: Dict[str, Any] = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seconds": elapsed,
+        "throughput_rps": args.requests / elapsed,
+        "rss_mib": _rss_mib(),
+        "loop_lag_ms": {
+            key: value * 1000 for key, value in _percentiles(lag_samples).items()
+        },
+        "modes": {},
+    }
+    for mode, runs in results.items():
+        if not runs:
+            continue
+        failed = [run for run in runs if run["status"] != 200]
+        report["modes"][mode] = {
+            "requests": len(runs),
+            "errors": len(failed),
+            "error_samples": sorted(
+                {f"{run['status']}: {run.get('error', '')}" for run in failed}
+            )[:3],
+            "latency_ms": {
+                key: value * 1000
+                for key, value in _percentiles([run["latency"] for run in runs]).items()
+            },
+            "first_byte_ms": {
+                key: value * 1000
+                for key, value in _percentiles(
+                    [run["first_byte"] for run in runs if run["first_byte"] is not None]
+                ).items()
+            },
+        }
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['requests']} requests, concurrency {report['concurrency']}: "
+        f"{report['seconds']:.2f}s, {report['throughput_rps']:.1f} req/s"
+    )
+    for mode, stats in report["modes"].items():
+        latency = stats["latency_ms"]
+        first = stats["first_byte_ms"]
+        print(
+            f"{mode:>10}: n={stats['requests']} errors={stats['errors']} "
+            f"latency p50={latency['p50']:.1f} p95={latency['p95']:.1f} "
+            f"p99={latency['p99']:.1f} ms, first byte p50={first['p50']:.1f} "
+            f"p99={first['p99']:.1f} ms"
+        )
+        for sample in stats["error_samples"]:
+            print(f"{'':>12}{sample}")
+    lag = report["loop_lag_ms"]
+    rss = report["rss_mib"]
+    print(
+        f"loop lag p50={lag['p50']:.2f} p99={lag['p99']:.2f} max={lag['max']:.2f} ms; "
+        f"RSS {rss['current']:.1f} MiB (peak {rss['peak']:.1f} MiB)"
+    )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--stream-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of requests that stream (0 to 1).",
+    )
+    parser.add_argument("--prompt", default="hello")
+    parser.add_argument("--model", default="claude-haiku-4-5-20251001")
+    parser.add_argument("--fixtures", default="", help="Fixture directory.")
+    parser.add_argument("--spawn-delay", type=float, default=0.0)
+    parser.add_argument("--event-delay", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed for recorded fixture timings (0 = no delays).",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print a JSON report.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    state_dir = tempfile.mkdtemp(prefix="claude_api_bench_")
+    try:
+        _configure_environment(args, state_dir)
+        sys.path.insert(0, str(REPO_ROOT))
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    failed = sum(stats["errors"] for stats in report["modes"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
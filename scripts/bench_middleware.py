@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Compare streaming throughput of the call_next and pure ASGI auth middleware.
+
+Each variant serves a StreamingResponse of small SSE chunks behind the auth
+middleware. Requests are driven straight through the ASGI interface so the
+numbers reflect middleware overhead rather than network or server costs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from claude_code_api.core import auth as auth_module
+from claude_code_api.core.config import settings
+
+CHUNK = b'data: {"choices":[{"delta":{"content":"x"}}]}\n\n'
+
+
+def _build_app(variant: str, chunks: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/stream")
+    async def stream():
+        async def body():
+            for _ in range(chunks):
+                yield CHUNK
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    if variant == "call_next":
+        app.middleware("http")(auth_module.auth_middleware)
+    else:
+        app.add_middleware(auth_module.AuthMiddleware)
+    return app
+
+
+async def _request(app: FastAPI, api_key: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "path": "/v1/stream",
+        "raw_path": b"/v1/stream",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {api_key}".encode())],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    received = 0
+    sent_request = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return received
+
+
+async def _bench(variant: str, requests: int, chunks: int, concurrency: int) -> dict:
+    app = _build_app(variant, chunks)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await _request(app, "bench-key")
+
+    await one()  # warm up routing and middleware stack
+    started = time.perf_counter()
+    sizes = await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    total_chunks = requests * chunks
+    return {
+        "variant": variant,
+        "seconds": elapsed,
+        "chunks_per_second": total_chunks / elapsed,
+        "mib_per_second": sum(sizes) / elapsed / (1024 * 1024),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.require_auth = True
+    settings.api_keys = ["bench-key"]
+    auth_module.rate_limiter.requests_per_minute = 10**9
+    auth_module.rate_limiter.burst = 10**9
+
+    results = [
+        asyncio.run(_bench(variant, args.requests, args.chunks, args.concurrency))
+        for variant in ("call_next", "asgi")
+    ]
+    for result in results:
+        print(
+            f"{result['variant']:>10}: {result['seconds']:.2f}s "
+            f"{result['chunks_per_second']:,.0f} chunks/s "
+            f"{result['mib_per_second']:.1f} MiB/s"
+        )
+    baseline, asgi = results
+    print(f"speedup: {asgi['chunks_per_second'] / baseline['chunks_per_second']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Stand-in for the Claude CLI that replays recorded stream-json fixtures.
+
+It accepts the arguments the gateway passes (``-p``, ``--model``, ...) and
+picks a fixture the same way the test mock in ``tests/conftest.py`` does: the
+last ``index.json`` rule with a match in the lower-cased prompt wins. Its
+behaviour is tuned through environment variables, because the gateway
+always runs the binary with a fixed argument list:
+
+``FAKE_CLAUDE_FIXTURES``
+    Fixture directory (default: ``tests/fixtures`` next to this script).
+``FAKE_CLAUDE_SPAWN_DELAY``
+    Seconds to wait before the first event, emulating CLI start-up.
+``FAKE_CLAUDE_EVENT_DELAY``
+    Seconds between events when the fixture has no timing sidecar.
+``FAKE_CLAUDE_PAYLOAD_BYTES``
+    Pad the assistant text of each assistant event to this many bytes.
+``FAKE_CLAUDE_SPEED``
+    Replay speed for recorded timings: 1 (default) is real time, 10 is ten
+    times faster, 0 drops all recorded delays.
+
+A fixture ``name.jsonl`` may have a ``name.timing.json`` sidecar holding
+``{"offsets": [...]}``, the seconds from process start at which each event
+was originally written (``scripts/record_claude_fixture.py`` writes it);
+events are then emitted at those offsets divided by the speed.
+
+Each run reports a fresh ``session_id`` so concurrent runs do not share CLI
+sessions.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures"
+DEFAULT_FIXTURE = "claude_stream_simple.jsonl"
+VERSION = "Claude Code 1.0.0 (fake)"
+
+
+def _env_float(name: str, default: float = 0.0) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _prompt(argv: List[str]) -> str:
+    # The gateway passes ``-p <prompt>``; the recorder passes ``--print`` as
+    # a flag and the prompt as the last positional argument.
+    for index, arg in enumerate(argv[:-1]):
+        if arg in ("-p", "--print") and not argv[index + 1].startswith("-"):
+            return argv[index + 1]
+    if argv and not argv[-1].startswith("-"):
+        return argv[-1]
+    return ""
+
+
+def select_fixture(fixtures_dir: Path, prompt: str) -> Path:
+    """Return the fixture for ``prompt`` following ``index.json`` rules."""
+    chosen = fixtures_dir / DEFAULT_FIXTURE
+    index_path = fixtures_dir / "index.json"
+    if not index_path.exists():
+        return chosen
+    prompt_lower = prompt.lower()
+    for rule in json.loads(index_path.read_text(encoding="utf-8")):
+        fixture_file = rule.get("file")
+        if fixture_file and any(
+            str(match).lower() in prompt_lower for match in rule.get("match", [])
+        ):
+            chosen = fixtures_dir / fixture_file
+    return chosen
+
+
+def load_offsets(fixture: Path, count: int) -> Optional[List[float]]:
+    """Read recorded per-event offsets from the fixture's timing sidecar."""
+    sidecar = fixture.with_name(fixture.stem + ".timing.json")
+    if not sidecar.exists():
+        return None
+    offsets = json.loads(sidecar.read_text(encoding="utf-8")).get("offsets") or []
+    if len(offsets) != count:
+        return None
+    return [float(offset) for offset in offsets]
+
+
+def _pad_payload(event: Dict[str, Any], payload_bytes: int) -> None:
+    if event.get("type") != "assistant":
+        return
+    for block in (event.get("message") or {}).get("content") or []:
+        if isinstance(block, dict) and block.get("type") == "text":
+            text = block.get("text") or ""
+            if len(text) < payload_bytes:
+                block["text"] = text + "x" * (payload_bytes - len(text))
+
+
+def replay(
+    events: List[Dict[str, Any]],
+    offsets: Optional[List[float]],
+    spawn_delay: float = 0.0,
+    event_delay: float = 0.0,
+    speed: float = 1.0,
+    out=None,
+) -> None:
+    """Write ``events`` as JSONL, paced by ``offsets`` or ``event_delay``."""
+    out = out or sys.stdout
+    started = time.monotonic()
+    if spawn_delay > 0:
+        time.sleep(spawn_delay)
+    if speed <= 0:
+        offsets = None
+    for index, event in enumerate(events):
+        if offsets is not None:
+            wait = started + spawn_delay + offsets[index] / speed - time.monotonic()
+        else:
+            wait = event_delay if index else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        out.write(json.dumps(event, ensure_ascii=False) + "\n")
+        out.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--version" in argv:
+        print(VERSION)
+        return 0
+
+    fixtures_dir = Path(os.environ.get("FAKE_CLAUDE_FIXTURES") or DEFAULT_FIXTURES)
+    fixture = select_fixture(fixtures_dir, _prompt(argv))
+    lines = fixture.read_text(encoding="utf-8").splitlines()
+    events = [json.loads(line) for line in lines if line.strip()]
+
+    session_id = f"fake_{uuid.uuid4().hex}"
+    payload_bytes = int(_env_float("FAKE_CLAUDE_PAYLOAD_BYTES"))
+    for event in events:
+        if "session_id" in event:
+            event["session_id"] = session_id
+        if payload_bytes:
+            _pad_payload(event, payload_bytes)
+
+    replay(
+        events,
+        load_offsets(fixture, len(events)),
+        spawn_delay=_env_float("FAKE_CLAUDE_SPAWN_DELAY"),
+        event_delay=_env_float("FAKE_CLAUDE_EVENT_DELAY"),
+        speed=_env_float("FAKE_CLAUDE_SPEED", 1.0),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        sys.exit(0)
@@ -1,5 +1,11 @@
 #!/usr/bin/env python3
-"""Record Claude CLI stream-json output into a sanitized fixture."""
+"""Record Claude CLI stream-json output into a sanitized fixture.
+
+Stdout is read as it is produced and each event is timestamped relative to
+process start. The offsets are saved next to the fixture as
+``<name>.timing.json`` so ``scripts/fake_claude.py`` can replay the run with
+its original pacing.
+"""
 
 from __future__ import annotations
 
@@ -8,6 +14,8 @@ import json
 import os
 import subprocess
 import sys
+import threading
+import time
 from typing import Any
 
 
@@ -31,19 +39,36 @@ def _sanitize_event(event: dict, cwd_path: str | None, session_id: str | None) -
     return event
 
 
-def _run_claude(args: list[str], cwd: str | None) -> bytes:
-    result = subprocess.run(
+def _run_claude(args: list[str], cwd: str | None) -> list[tuple[float, bytes]]:
+    """Run the CLI and return ``(seconds since start, line)`` per stdout line."""
+    started = time.monotonic()
+    process = subprocess.Popen(
         args,
         cwd=cwd or None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        check=False,
-        text=False,
     )
-    if result.returncode != 0:
-        stderr = result.stderr.decode("utf-8", errors="replace")
+    stderr_chunks: list[bytes] = []
+    # Drain stderr concurrently so a chatty CLI cannot block on a full pipe.
+    stderr_reader = threading.Thread(
+        target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True
+    )
+    stderr_reader.start()
+
+    lines = []
+    for line in iter(process.stdout.readline, b""):
+        lines.append((time.monotonic() - started, line))
+    returncode = process.wait()
+    stderr_reader.join()
+    if returncode != 0:
+        stderr = b"".join(stderr_chunks).decode("utf-8", errors="replace")
         raise RuntimeError(f"Claude CLI failed: {stderr.strip()}")
-    return result.stdout
+    return lines
+
+
+def _timing_path(out_path: str) -> str:
+    root, _ = os.path.splitext(out_path)
+    return f"{root}.timing.json"
 
 
 def main() -> int:
@@ -57,6 +82,11 @@ def main() -> int:
     parser.add_argument("--permission-mode", default="bypassPermissions")
     parser.add_argument("--include-partial-messages", action="store_true")
     parser.add_argument("--tools", default="", help="Comma-separated tool list for Claude CLI.")
+    parser.add_argument(
+        "--no-timing",
+        action="store_true",
+        help="Do not write the <name>.timing.json sidecar.",
+    )
     args = parser.parse_args()
 
     cmd = [
@@ -79,8 +109,8 @@ def main() -> int:
     cmd.append(args.prompt)
 
     cwd = args.cwd or None
-    raw = _run_claude(cmd, cwd)
-    if not raw.strip():
+    timed_lines = _run_claude(cmd, cwd)
+    if not any(line.strip() for _, line in timed_lines):
         raise RuntimeError("Claude CLI returned empty output.")
 
     out_path = os.path.abspath(args.out)
@@ -89,9 +119,9 @@ def main() -> int:
     cwd_path = os.path.abspath(cwd) if cwd else None
     session_id = args.session_id or None
 
-    lines = raw.splitlines()
+    offsets = []
     with open(out_path, "w", encoding="utf-8") as handle:
-        for line in lines:
+        for offset, line in timed_lines:
             line = line.strip()
             if not line:
                 continue
@@ -101,8 +131,15 @@ def main() -> int:
             event = json.loads(payload.decode("utf-8"))
             event = _sanitize_event(event, cwd_path, session_id)
             handle.write(json.dumps(event, ensure_ascii=False) + "\n")
+            offsets.append(round(offset, 4))
 
     print(f"Wrote fixture to {out_path}")
+    if not args.no_timing:
+        timing_path = _timing_path(out_path)
+        with open(timing_path, "w", encoding="utf-8") as handle:
+            json.dump({"offsets": offsets}, handle)
+            handle.write("\n")
+        print(f"Wrote timing to {timing_path} ({offsets[-1]:.2f}s total)")
     return 0
 
 
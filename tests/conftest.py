@@ -35,6 +35,9 @@ def setup_test_environment():
         "database_url": getattr(settings, "database_url", "sqlite:///./test.db"),
         "debug": getattr(settings, "debug", False),
         "session_map_path": getattr(settings, "session_map_path", None),
+        "batch_storage_dir": getattr(settings, "batch_storage_dir", None),
+        "job_storage_dir": getattr(settings, "job_storage_dir", None),
+        "workspace_root": getattr(settings, "workspace_root", None),
     }
 
     # Set test settings
@@ -104,6 +107,9 @@ def setup_test_environment():
     settings.database_url = f"sqlite:///{temp_dir}/test.db"
     settings.debug = True
     settings.session_map_path = os.path.join(temp_dir, "session_map.json")
+    settings.batch_storage_dir = os.path.join(temp_dir, "batches")
+    settings.job_storage_dir = os.path.join(temp_dir, "jobs")
+    settings.workspace_root = os.path.join(temp_dir, "workspaces")
 
     # Create directories
     os.makedirs(settings.project_root, exist_ok=True)
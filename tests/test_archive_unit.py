@@ -0,0 +1,120 @@
+"""Unit tests for streaming project archives."""
+
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from claude_code_api.core.archive import (
+    CHUNK_SIZE,
+    ArchiveError,
+    ArchiveQuotaError,
+    import_archive,
+    stream_archive,
+)
+
+
+def _make_tree(root):
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("print('hi')\n")
+    (root / "README.md").write_text("readme\n")
+
+
+async def _collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+async def _chunks(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def _tar_bytes(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.SYMTYPE
+                info.linkname = "/etc/passwd"
+                archive.addfile(info)
+            else:
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_export_tar_and_zip(tmp_path):
+    _make_tree(tmp_path)
+
+    data = await _collect(stream_archive(str(tmp_path), "tar.gz"))
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        assert sorted(archive.getnames()) == ["README.md", "src", "src/main.py"]
+
+    data = await _collect(stream_archive(str(tmp_path), "zip"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.read("src/main.py") == b"print('hi')\n"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_in_chunks_and_stops_early(tmp_path):
+    (tmp_path / "big.bin").write_bytes(os.urandom(CHUNK_SIZE * 8))
+
+    stream = stream_archive(str(tmp_path), "tar")
+    first = await stream.__anext__()
+    assert CHUNK_SIZE <= len(first) < CHUNK_SIZE * 2
+    # Closing early must stop the producer thread instead of hanging.
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_import_extracts_files_and_skips_links(tmp_path):
+    data = _tar_bytes({"src/app.py": b"x = 1\n", "link": None})
+
+    stats = await import_archive(str(tmp_path), _chunks(data))
+
+    assert (tmp_path / "src" / "app.py").read_bytes() == b"x = 1\n"
+    assert not os.path.lexists(tmp_path / "link")
+    assert stats["files"] == 1
+    assert stats["skipped"] == ["link"]
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_traversal_and_quota(tmp_path):
+    with pytest.raises(ArchiveError, match="Unsafe path"):
+        await import_archive(str(tmp_path), _chunks(_tar_bytes({"../evil": b"x"})))
+    assert not (tmp_path.parent / "evil").exists()
+
+    with pytest.raises(ArchiveQuotaError):
+        await import_archive(
+            str(tmp_path), _chunks(_tar_bytes({"big": b"x" * 100})), max_bytes=10
+        )
+
+    with pytest.raises(ArchiveError, match="Invalid tar"):
+        await import_archive(str(tmp_path), _chunks(b"not a tarball" * 100))
+
+
+def test_archive_round_trip_api(test_client):
+    source = test_client.post("/v1/projects", json={"name": "source"}).json()
+    with open(os.path.join(source["path"], "notes.txt"), "w") as handle:
+        handle.write("hello")
+    target = test_client.post("/v1/projects", json={"name": "target"}).json()
+
+    exported = test_client.get(f"/v1/projects/{source['id']}/archive")
+    assert exported.status_code == 200
+    assert exported.headers["content-type"] == "application/gzip"
+
+    imported = test_client.put(
+        f"/v1/projects/{target['id']}/archive", content=exported.content
+    )
+    assert imported.status_code == 200
+    assert imported.json()["files"] == 1
+    with open(os.path.join(target["path"], "notes.txt")) as handle:
+        assert handle.read() == "hello"
+
+    bad = test_client.put(f"/v1/projects/{target['id']}/archive", content=b"junk")
+    assert bad.status_code == 400
+    assert bad.json()["error"]["code"] == "invalid_archive"
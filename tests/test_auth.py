@@ -8,6 +8,7 @@ from starlette.requests import Request
 
 from claude_code_api.core import auth as auth_module
 from claude_code_api.core.config import settings
+from claude_code_api.core.security import hash_api_key
 
 
 def _build_request(
@@ -41,21 +42,30 @@ def test_extract_api_key_sources():
     assert auth_module.extract_api_key(request) is None
 
 
-def test_rate_limiter_basic():
+def _rate_result(allowed):
+    async def is_allowed(_key):
+        return allowed
+
+    return is_allowed
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_basic():
     limiter = auth_module.RateLimiter(requests_per_minute=2, burst=10)
-    assert limiter.is_allowed("client") is True
-    assert limiter.is_allowed("client") is True
-    assert limiter.is_allowed("client") is False
+    assert await limiter.is_allowed("client") is True
+    assert await limiter.is_allowed("client") is True
+    assert await limiter.is_allowed("client") is False
 
 
-def test_rate_limiter_burst_reset(monkeypatch):
+@pytest.mark.asyncio
+async def test_rate_limiter_burst_reset(monkeypatch):
     limiter = auth_module.RateLimiter(requests_per_minute=100, burst=1)
     now = [100.0]
     monkeypatch.setattr(auth_module.time, "time", lambda: now[0])
-    assert limiter.is_allowed("client") is True
+    assert await limiter.is_allowed("client") is True
     # Move time forward so requests are cleared, but burst_used is still set.
     now[0] += 61.0
-    assert limiter.is_allowed("client") is True
+    assert await limiter.is_allowed("client") is True
 
 
 def test_validate_api_key_toggle():
@@ -151,7 +161,9 @@ async def test_auth_middleware_rate_limited(monkeypatch):
     settings.require_auth = True
     settings.api_keys = ["secret"]
 
-    monkeypatch.setattr(auth_module.rate_limiter, "is_allowed", lambda _key: False)
+    monkeypatch.setattr(
+        auth_module.get_rate_limiter(), "is_allowed", _rate_result(False)
+    )
 
     request = _build_request(headers=[(b"authorization", b"Bearer secret")])
 
@@ -176,7 +188,9 @@ async def test_auth_middleware_valid_key():
     settings.require_auth = True
     settings.api_keys = ["secret"]
     monkeypatch = pytest.MonkeyPatch()
-    monkeypatch.setattr(auth_module.rate_limiter, "is_allowed", lambda _key: True)
+    monkeypatch.setattr(
+        auth_module.get_rate_limiter(), "is_allowed", _rate_result(True)
+    )
 
     captured = {}
 
@@ -194,3 +208,79 @@ async def test_auth_middleware_valid_key():
     monkeypatch.undo()
     settings.require_auth = original_require_auth
     settings.api_keys = original_keys
+
+
+def test_extract_api_key_from_scope_matches_request():
+    cases = [
+        ([(b"authorization", b"Bearer secret")], b""),
+        ([(b"x-api-key", b"apikey")], b""),
+        ([], b"api_key=querykey"),
+        ([(b"authorization", b"Basic abc")], b""),
+        ([], b""),
+    ]
+    for headers, query_string in cases:
+        request = _build_request(headers=headers, query_string=query_string)
+        assert auth_module.extract_api_key_from_scope(
+            request.scope
+        ) == auth_module.extract_api_key(request)
+
+
+async def _call_asgi(middleware, scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_asgi_auth_middleware(monkeypatch):
+    monkeypatch.setattr(settings, "require_auth", True)
+    monkeypatch.setattr(settings, "api_keys", ["secret"])
+    monkeypatch.setattr(
+        auth_module.get_rate_limiter(), "is_allowed", _rate_result(True)
+    )
+    captured = {}
+
+    async def app(scope, receive, send):
+        captured.update(scope.get("state", {}))
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+    middleware = auth_module.AuthMiddleware(app)
+
+    messages = await _call_asgi(middleware, _build_request().scope)
+    assert messages[0]["status"] == 401
+    assert json.loads(messages[1]["body"])["error"]["code"] == "missing_api_key"
+    assert captured == {}
+
+    messages = await _call_asgi(middleware, _build_request(path="/health").scope)
+    assert messages[0]["status"] == 200
+    assert captured == {}
+
+    scope = _build_request(headers=[(b"authorization", b"Bearer secret")]).scope
+    messages = await _call_asgi(middleware, scope)
+    assert messages[0]["status"] == 200
+    assert captured["api_key"] == "secret"
+    assert captured["client_id"] == "secret"
+    assert captured["api_key_record"].key_hash == hash_api_key("secret")
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_key_is_the_key_hash(monkeypatch):
+    monkeypatch.setattr(settings, "require_auth", True)
+    monkeypatch.setattr(settings, "api_keys", ["secret"])
+    seen = []
+
+    async def is_allowed(key):
+        seen.append(key)
+        return True
+
+    monkeypatch.setattr(auth_module.get_rate_limiter(), "is_allowed", is_allowed)
+    rejection, _ = await auth_module.authenticate("/v1/models", "secret", None)
+    assert rejection is None
+    assert seen == [hash_api_key("secret")]
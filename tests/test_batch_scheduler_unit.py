@@ -0,0 +1,303 @@
+"""Unit tests for the batch scheduler and Batch API."""
+
+import asyncio
+import io
+import json
+import os
+import time
+
+import pytest
+
+from claude_code_api.api.batches import batch_project_id, create_batch_runner
+from claude_code_api.core.batch_scheduler import (
+    BatchNotCancellableError,
+    BatchRequestError,
+    BatchScheduler,
+    BatchValidationError,
+    parse_batch_input,
+)
+from claude_code_api.core.key_registry import APIKeyRecord, key_registry
+from claude_code_api.core.shared_state import SQLiteStateBackend
+from tests.model_utils import get_test_model_id
+
+
+def _line(custom_id, content="hello"):
+    return json.dumps(
+        {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"messages": [{"role": "user", "content": content}]},
+        }
+    )
+
+
+def _jsonl(*lines):
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+def _read_lines(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+async def _wait_for_status(scheduler, batch_id, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        batch = await scheduler.get_batch(batch_id)
+        if batch["status"] in statuses:
+            return batch
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"batch stuck in {batch['status']}")
+
+
+def test_parse_batch_input_validation(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text(_line("a") + "\n" + _line("a") + "\n")
+    with pytest.raises(BatchValidationError, match="repeats custom_id"):
+        parse_batch_input(str(path))
+
+    path.write_text(json.dumps({"custom_id": "a", "url": "/v1/embeddings"}) + "\n")
+    with pytest.raises(BatchValidationError, match="POST"):
+        parse_batch_input(str(path))
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_with_retries_and_errors(tmp_path):
+    attempts = {}
+
+    async def runner(body, owner):
+        content = body["messages"][0]["content"]
+        attempts[content] = attempts.get(content, 0) + 1
+        if content == "flaky" and attempts[content] == 1:
+            raise BatchRequestError(503, {"error": {"code": "claude_unavailable"}})
+        if content == "bad":
+            raise BatchRequestError(
+                400, {"error": {"code": "invalid", "message": "no"}}
+            )
+        return {"id": f"chatcmpl-{content}", "choices": []}
+
+    scheduler = BatchScheduler(
+        runner, storage_dir=str(tmp_path), parallelism=2, retry_backoff_seconds=0
+    )
+    input_file = await scheduler.create_file(
+        "in.jsonl",
+        "batch",
+        _jsonl(_line("1", "ok"), _line("2", "flaky"), _line("3", "bad")),
+    )
+    batch = await scheduler.create_batch(
+        input_file["id"], "/v1/chat/completions", "24h"
+    )
+    batch = await _wait_for_status(scheduler, batch["id"], {"completed"})
+
+    assert batch["request_counts"] == {"total": 3, "completed": 2, "failed": 1}
+    assert attempts == {"ok": 1, "flaky": 2, "bad": 1}
+    output = _read_lines(scheduler.file_content_path(batch["output_file_id"]))
+    assert sorted(line["custom_id"] for line in output) == ["1", "2"]
+    errors = _read_lines(scheduler.file_content_path(batch["error_file_id"]))
+    assert errors[0]["custom_id"] == "3"
+    assert errors[0]["response"]["status_code"] == 400
+    assert errors[0]["error"] == {"code": "invalid", "message": "no"}
+
+
+@pytest.mark.asyncio
+async def test_batch_resumes_from_checkpoint(tmp_path):
+    calls = []
+
+    async def runner(body, owner):
+        calls.append(body["messages"][0]["content"])
+        return {"id": "chatcmpl", "choices": []}
+
+    blocked = asyncio.Event()
+
+    async def blocking_runner(body, owner):
+        await blocked.wait()
+
+    first = BatchScheduler(blocking_runner, storage_dir=str(tmp_path))
+    input_file = await first.create_file(
+        "in.jsonl", "batch", _jsonl(_line("1", "one"), _line("2", "two"))
+    )
+    batch = await first.create_batch(input_file["id"], "/v1/chat/completions", "24h")
+    await _wait_for_status(first, batch["id"], {"in_progress"})
+    await first.stop()
+
+    # Simulate one finished request plus a torn write from the crash.
+    output_path = first.file_content_path(batch["output_file_id"])
+    with open(output_path, "w", encoding="utf-8") as handle:
+        handle.write(json.dumps({"custom_id": "1", "response": {}}) + "\n")
+        handle.write('{"custom_id": "2", "resp')
+
+    second = BatchScheduler(runner, storage_dir=str(tmp_path))
+    await second.start()
+    batch = await _wait_for_status(second, batch["id"], {"completed"})
+
+    assert calls == ["two"]
+    assert batch["request_counts"]["completed"] == 2
+    assert [line["custom_id"] for line in _read_lines(output_path)] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_cancel_batch(tmp_path):
+    async def runner(body, owner):
+        await asyncio.sleep(10)
+
+    scheduler = BatchScheduler(runner, storage_dir=str(tmp_path))
+    input_file = await scheduler.create_file("in.jsonl", "batch", _jsonl(_line("1")))
+    batch = await scheduler.create_batch(
+        input_file["id"], "/v1/chat/completions", "24h"
+    )
+    await _wait_for_status(scheduler, batch["id"], {"in_progress"})
+
+    batch = await scheduler.cancel_batch(batch["id"])
+    assert batch["status"] == "cancelled"
+    assert batch["cancelled_at"] is not None
+    assert scheduler._tasks == {}
+
+
+@pytest.mark.asyncio
+async def test_batch_leased_by_one_worker(tmp_path):
+    calls = []
+
+    async def blocking_runner(body, owner):
+        await asyncio.sleep(10)
+
+    async def runner(body, owner):
+        calls.append(body)
+        return {"id": "chatcmpl", "choices": []}
+
+    state_path = str(tmp_path / "state.db")
+    owner_backend = SQLiteStateBackend(state_path)
+    other_backend = SQLiteStateBackend(state_path)
+    # Another live process stands in for the second worker.
+    other_backend.pid = os.getppid()
+    storage_dir = str(tmp_path / "batches")
+    owner = BatchScheduler(
+        blocking_runner, storage_dir, state_backend=owner_backend, poll_interval=0.01
+    )
+    other = BatchScheduler(
+        runner, storage_dir, state_backend=other_backend, poll_interval=0.01
+    )
+    try:
+        await owner.start()
+        input_file = await owner.create_file("in.jsonl", "batch", _jsonl(_line("1")))
+        batch = await owner.create_batch(
+            input_file["id"], "/v1/chat/completions", "24h"
+        )
+        await _wait_for_status(owner, batch["id"], {"in_progress"})
+
+        # A second worker starting up leaves the leased batch alone.
+        await other.start()
+        assert other._tasks == {}
+
+        cancelling = await other.cancel_batch(batch["id"])
+        assert cancelling["status"] == "cancelling"
+        cancelled = await _wait_for_status(other, batch["id"], {"cancelled"})
+        assert cancelled["cancelling_at"] is not None
+        assert owner._tasks == {}
+        assert calls == []
+        assert owner_backend.get_lease_owner(f"batch:{batch['id']}") is None
+    finally:
+        await owner.stop()
+        await other.stop()
+        owner_backend.close()
+        other_backend.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_cannot_cancel_another_workers_batch(tmp_path):
+    async def runner(body, owner):
+        raise AssertionError("batch resumed twice")
+
+    scheduler = BatchScheduler(runner, storage_dir=str(tmp_path))
+    input_file = await scheduler.create_file("in.jsonl", "batch", _jsonl(_line("1")))
+    batch_id = "batch_elsewhere"
+    path = os.path.join(scheduler.batches_dir, f"{batch_id}.json")
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "id": batch_id,
+                "status": "in_progress",
+                "created_at": 0,
+                "input_file_id": input_file["id"],
+                "_owner": None,
+                "_worker_pid": os.getppid(),
+            },
+            handle,
+        )
+
+    await scheduler.start()
+    assert scheduler._tasks == {}
+    with pytest.raises(BatchNotCancellableError):
+        await scheduler.cancel_batch(batch_id)
+    await scheduler.stop()
+
+
+def test_batch_api_round_trip(test_client):
+    line = json.dumps(
+        {
+            "custom_id": "req-1",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": get_test_model_id(),
+                "messages": [{"role": "user", "content": "Hi from a batch"}],
+            },
+        }
+    )
+    upload = test_client.post(
+        "/v1/files",
+        files={"file": ("input.jsonl", line + "\n", "application/jsonl")},
+        data={"purpose": "batch"},
+    )
+    assert upload.status_code == 200
+    file_id = upload.json()["id"]
+
+    created = test_client.post("/v1/batches", json={"input_file_id": file_id})
+    assert created.status_code == 200
+    batch_id = created.json()["id"]
+
+    deadline = time.monotonic() + 10
+    batch = created.json()
+    while (
+        batch["status"] not in {"completed", "failed"} and time.monotonic() < deadline
+    ):
+        time.sleep(0.05)
+        batch = test_client.get(f"/v1/batches/{batch_id}").json()
+    assert batch["status"] == "completed"
+    assert batch["request_counts"] == {"total": 1, "completed": 1, "failed": 0}
+
+    content = test_client.get(f"/v1/files/{batch['output_file_id']}/content")
+    result = json.loads(content.text.splitlines()[0])
+    assert result["custom_id"] == "req-1"
+    assert result["response"]["status_code"] == 200
+    assert result["response"]["body"]["object"] == "chat.completion"
+
+    listing = test_client.get("/v1/batches").json()
+    assert batch_id in [item["id"] for item in listing["data"]]
+    assert test_client.get("/v1/batches/batch_missing").status_code == 404
+
+
+def test_batch_lines_follow_the_owner_key_policy(test_client, monkeypatch):
+    record = APIKeyRecord(key_hash="f" * 64, allowed_models=frozenset({"other"}))
+    monkeypatch.setattr(
+        key_registry,
+        "lookup_hash",
+        lambda key_hash: record if key_hash == record.key_hash else None,
+    )
+    runner = create_batch_runner(test_client.app)
+    body = {
+        "model": get_test_model_id(),
+        "messages": [{"role": "user", "content": "Not for this key"}],
+    }
+
+    with pytest.raises(BatchRequestError) as denied:
+        test_client.portal.call(runner, body, record.key_hash)
+    assert denied.value.status_code == 403
+    assert denied.value.body["error"]["code"] == "model_not_allowed"
+
+    with pytest.raises(BatchRequestError) as revoked:
+        test_client.portal.call(runner, body, "0" * 64)
+    assert revoked.value.status_code == 401
+
+    assert batch_project_id(record.key_hash) == "batches-ffffffffffff"
+    assert batch_project_id(None) == "batches"
@@ -0,0 +1,143 @@
+"""Unit tests for n > 1 choices run as parallel Claude processes."""
+
+import json
+import os
+
+import pytest
+
+from claude_code_api.api import chat as chat_module
+from claude_code_api.core.config import settings
+from tests.model_utils import get_test_model_id
+
+
+class FakeProcess:
+    def __init__(self, session_id, project_path):
+        self.session_id = session_id
+        self.project_path = project_path
+        self.is_running = True
+
+    async def stop(self):
+        self.is_running = False
+
+
+class FakeClaudeManager:
+    def __init__(self, fail_index=None):
+        self.started = []
+        self.fail_index = fail_index
+
+    async def create_session(self, session_id, project_path, **kwargs):
+        if len(self.started) == self.fail_index:
+            raise RuntimeError("boom")
+        self.started.append((session_id, project_path, kwargs["on_cli_session_id"]))
+        return FakeProcess(session_id, project_path)
+
+
+class FakeSessionManager:
+    def register_cli_session(self, api_session_id, cli_session_id):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_choices_run_in_private_workspaces(tmp_path, monkeypatch):
+    project_path = tmp_path / "project"
+    project_path.mkdir()
+    (project_path / "main.py").write_text("print('hi')\n")
+    monkeypatch.setattr(settings, "claude_cwd_in_project", True)
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "workspaces"))
+
+    manager = FakeClaudeManager()
+    processes, workspaces = await chat_module._start_choice_processes(
+        claude_manager=manager,
+        session_manager=FakeSessionManager(),
+        session_id="sess",
+        project_path=str(project_path),
+        choice_count=3,
+        prompt="hi",
+        claude_model=None,
+        system_prompt=None,
+    )
+
+    assert [process.session_id for process in processes] == [
+        "sess",
+        "sess-n1",
+        "sess-n2",
+    ]
+    assert processes[0].project_path == str(project_path)
+    assert len(workspaces) == 2
+    for path in workspaces:
+        assert (tmp_path / "workspaces" / os.path.basename(path) / "main.py").exists()
+    # Only the primary choice is linked to the API session.
+    callbacks = {sid: callback for sid, _, callback in manager.started}
+    assert [callbacks[sid] is not None for sid in sorted(callbacks)] == [
+        True,
+        False,
+        False,
+    ]
+
+    await chat_module._release_choices(processes, workspaces)
+    assert not any(process.is_running for process in processes)
+    assert not any(os.path.exists(path) for path in workspaces)
+
+
+@pytest.mark.asyncio
+async def test_failed_choice_stops_the_others(tmp_path):
+    manager = FakeClaudeManager(fail_index=1)
+    with pytest.raises(Exception):
+        await chat_module._start_choice_processes(
+            claude_manager=manager,
+            session_manager=FakeSessionManager(),
+            session_id="sess",
+            project_path=str(tmp_path),
+            choice_count=2,
+            prompt="hi",
+            claude_model=None,
+            system_prompt=None,
+        )
+    assert len(manager.started) == 1
+
+
+def test_chat_completion_with_n_choices(test_client):
+    request_data = {
+        "model": get_test_model_id(),
+        "messages": [{"role": "user", "content": "Give me two samples"}],
+        "n": 2,
+    }
+    response = test_client.post("/v1/chat/completions", json=request_data)
+    assert response.status_code == 200
+    body = response.json()
+    assert [choice["index"] for choice in body["choices"]] == [0, 1]
+    assert all(choice["message"]["role"] == "assistant" for choice in body["choices"])
+
+    response = test_client.post(
+        "/v1/chat/completions", json={**request_data, "stream": True}
+    )
+    assert response.status_code == 200
+    events = [
+        line[len("data: ") :]
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert events.count("[DONE]") == 1
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert len({chunk["id"] for chunk in chunks}) == 1
+    usage_chunk = chunks.pop()
+    assert usage_chunk["choices"] == []
+    assert usage_chunk["usage"] == body["usage"]
+    finished = {
+        chunk["choices"][0]["index"]
+        for chunk in chunks
+        if chunk["choices"][0]["finish_reason"]
+    }
+    assert finished == {0, 1}
+    session_id = response.headers["X-Session-ID"]
+    session = test_client.get(f"/v1/sessions/{session_id}").json()
+    # The prompt estimate is recorded up front; the run's usage comes on top.
+    prompt_tokens = chat_module.estimate_tokens("Give me two samples")
+    assert session["total_tokens"] == prompt_tokens + body["usage"]["total_tokens"]
+
+    too_many = test_client.post(
+        "/v1/chat/completions", json={**request_data, "n": settings.max_choices + 1}
+    )
+    assert too_many.status_code == 400
+    assert too_many.json()["error"]["code"] == "too_many_choices"
@@ -110,6 +110,30 @@ async def test_create_session_replaces_stale_process(monkeypatch, tmp_path):
     await manager.cleanup_all()
 
 
+@pytest.mark.asyncio
+async def test_process_finished_during_startup_releases_slot(monkeypatch, tmp_path):
+    manager = cm.ClaudeManager()
+    manager.max_concurrent = 1
+
+    async def fake_start(self, prompt, model=None, system_prompt=None):
+        # Fast runs can end before the manager registers the process.
+        self.is_running = False
+        self._on_end(self)
+        return True
+
+    monkeypatch.setattr(cm.ClaudeProcess, "start", fake_start)
+
+    for index in range(3):
+        await manager.create_session(
+            session_id=f"sess-fast-{index}",
+            project_path=str(tmp_path),
+            prompt="quick",
+        )
+    assert manager.processes == {}
+
+    await manager.cleanup_all()
+
+
 @pytest.mark.asyncio
 async def test_create_session_retries_opus_45_when_opus_46_rejected(
     monkeypatch, tmp_path
@@ -240,3 +264,34 @@ async def test_create_session_without_model_does_not_force_model_flag(
     assert attempted_models == [None]
 
     await manager.cleanup_all()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_slot_release_lands_before_the_next_claim(monkeypatch, tmp_path):
+    from claude_code_api.core.shared_state import SQLiteStateBackend
+
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+    manager = cm.ClaudeManager(state_backend=backend)
+
+    async def fake_start(self, prompt, model=None, system_prompt=None):
+        self.is_running = True
+        return True
+
+    monkeypatch.setattr(cm.ClaudeProcess, "start", fake_start)
+    try:
+        first = await manager.create_session(
+            session_id="sess-next", project_path=str(tmp_path), prompt="one"
+        )
+        # Output ended: on_end releases the slot from a sync callback.
+        first.is_running = False
+        manager._cleanup_process(first)
+        await manager.create_session(
+            session_id="sess-next", project_path=str(tmp_path), prompt="two"
+        )
+        assert await manager.get_host_process_count() == 1
+        assert await manager.get_session_owner("sess-next") == backend.pid
+
+        await manager.cleanup_all()
+        assert await manager.get_host_process_count() == 0
+    finally:
+        backend.close()
@@ -0,0 +1,85 @@
+"""Unit tests for the project file index."""
+
+import os
+
+import pytest
+
+from claude_code_api.core.file_index import FileIndex
+from claude_code_api.core.project_usage import ProjectUsageTracker
+
+
+def _write(path, content="x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def index():
+    return FileIndex(ProjectUsageTracker(max_bytes=0))
+
+
+@pytest.mark.asyncio
+async def test_paging_and_glob(tmp_path, index):
+    for name in ["b.py", "a.py", "src/c.py", "src/d.txt", "CLAUDE.md"]:
+        _write(tmp_path / name)
+
+    first = await index.list_files(str(tmp_path), limit=2)
+    assert [f["path"] for f in first["files"]] == ["CLAUDE.md", "a.py"]
+    assert first["has_more"] is True
+    assert first["total_files"] == 5
+    assert first["claude_md_files"] == ["CLAUDE.md"]
+
+    second = await index.list_files(str(tmp_path), after=first["next_after"], limit=10)
+    assert [f["path"] for f in second["files"]] == ["b.py", "src/c.py", "src/d.txt"]
+    assert second["has_more"] is False
+
+    python = await index.list_files(str(tmp_path), pattern="*.py")
+    assert [f["path"] for f in python["files"]] == ["a.py", "b.py", "src/c.py"]
+    assert python["files"][0]["extension"] == "py"
+
+
+@pytest.mark.asyncio
+async def test_changes_since_cursor(tmp_path, index):
+    _write(tmp_path / "keep.txt")
+    _write(tmp_path / "src" / "old.py")
+    cursor = (await index.list_files(str(tmp_path)))["cursor"]
+
+    unchanged = await index.list_files(str(tmp_path), since=cursor)
+    assert unchanged["files"] == [] and unchanged["removed"] == []
+    assert unchanged["cursor"] == cursor
+
+    os.remove(tmp_path / "src" / "old.py")
+    _write(tmp_path / "src" / "new.py")
+    _bump_mtime(tmp_path / "src")
+    changes = await index.list_files(str(tmp_path), since=cursor)
+    assert [f["path"] for f in changes["files"]] == ["src/new.py"]
+    assert changes["removed"] == ["src/old.py"]
+    assert changes["cursor"] > cursor
+    assert changes["total_files"] == 2
+
+    stale = await index.list_files(str(tmp_path), since=changes["cursor"] + 10)
+    assert stale["reset"] is True
+    assert len(stale["files"]) == 2
+
+
+def test_project_files_endpoint(test_client):
+    project = test_client.post("/v1/projects", json={"name": "listing"}).json()
+    with open(os.path.join(project["path"], "main.py"), "w") as handle:
+        handle.write("print('hi')\n")
+
+    response = test_client.get(f"/v1/projects/{project['id']}/files?glob=*.py")
+    assert response.status_code == 200
+    body = response.json()
+    assert [f["name"] for f in body["files"]] == ["main.py"]
+    assert body["total_size"] == len("print('hi')\n")
+
+    again = test_client.get(
+        f"/v1/projects/{project['id']}/files?since={body['cursor']}"
+    ).json()
+    assert again["files"] == []
+    assert test_client.get("/v1/projects/missing/files").status_code == 404
@@ -0,0 +1,176 @@
+"""Unit tests for detached chat completion jobs."""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from claude_code_api.core.jobs import JobManager
+from claude_code_api.core.shared_state import SQLiteStateBackend
+from tests.model_utils import get_test_model_id
+
+EVENTS = [
+    {"type": "assistant", "message": {"role": "assistant", "content": "partial"}},
+    {"type": "result", "subtype": "success", "result": "done"},
+]
+
+
+class FakeProcess:
+    def __init__(self, events, gate=None):
+        self.session_id = "sess"
+        self.events = events
+        self.gate = gate
+        self.stopped = False
+        self.timeouts = []
+
+    async def get_output(self, timeout=None):
+        self.timeouts.append(timeout)
+        for index, event in enumerate(self.events):
+            if index == 1 and self.gate is not None:
+                await self.gate.wait()
+            yield event
+
+    async def stop(self):
+        self.stopped = True
+
+
+async def _drain(process):
+    return {"events": [event async for event in process.get_output()]}
+
+
+async def _wait_for(manager, job_id, statuses):
+    for _ in range(500):
+        job = await manager.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.asyncio
+async def test_job_stores_events_and_partial_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "claude_code_api.core.jobs.settings.job_idle_timeout_seconds", 0
+    )
+    manager = JobManager(storage_dir=str(tmp_path))
+    gate = asyncio.Event()
+    process = FakeProcess(EVENTS, gate)
+
+    job = await manager.submit(process, _drain, "sess", "proj", "model")
+    for _ in range(100):
+        running = await manager.get_job(job["id"])
+        if running["event_count"] == 1:
+            break
+        await asyncio.sleep(0.01)
+    assert running["status"] == "running"
+    assert running["partial_output"] == "partial"
+    assert await manager.get_events(job["id"]) == EVENTS[:1]
+
+    gate.set()
+    finished = await _wait_for(manager, job["id"], {"completed"})
+    assert finished["result"] == {"events": EVENTS}
+    assert process.timeouts == [0]
+    assert await manager.get_events(job["id"], after=1) == EVENTS[1:]
+
+
+@pytest.mark.asyncio
+async def test_cancel_and_restart_recovery(tmp_path):
+    manager = JobManager(storage_dir=str(tmp_path))
+    process = FakeProcess(EVENTS, asyncio.Event())
+    job = await manager.submit(process, _drain, "sess", "proj", "model")
+
+    cancelled = await manager.cancel_job(job["id"])
+    assert cancelled["status"] == "cancelled"
+    assert process.stopped is True
+
+    record_path = tmp_path / "job_stale.json"
+    record_path.write_text(json.dumps({"id": "job_stale", "status": "running"}))
+    # Another live process stands in for a worker still running its job.
+    live_path = tmp_path / "job_live.json"
+    live_path.write_text(
+        json.dumps({"id": "job_live", "status": "running", "_worker_pid": os.getppid()})
+    )
+    restarted = JobManager(storage_dir=str(tmp_path))
+    await restarted.start()
+    await restarted.stop()
+    stale = json.loads(record_path.read_text())
+    assert stale["status"] == "failed"
+    assert stale["error"]["code"] == "job_interrupted"
+    assert json.loads(live_path.read_text())["status"] == "running"
+
+
+@pytest.mark.asyncio
+async def test_cancelling_running_job_propagates(tmp_path):
+    manager = JobManager(storage_dir=str(tmp_path))
+    process = FakeProcess(EVENTS, asyncio.Event())
+    job = await manager.submit(process, _drain, "sess", "proj", "model")
+    while (await manager.get_job(job["id"]))["event_count"] < 1:
+        await asyncio.sleep(0.01)
+    task = manager.jobs[job["id"]].task
+
+    cancelled = await manager.cancel_job(job["id"])
+
+    assert task.cancelled() is True
+    assert cancelled["status"] == "cancelled"
+    assert process.stopped is True
+    assert job["id"] not in manager.jobs
+
+
+@pytest.mark.asyncio
+async def test_job_in_another_worker_is_read_and_cancelled(tmp_path):
+    state_path = str(tmp_path / "state.db")
+    owner_backend = SQLiteStateBackend(state_path)
+    other_backend = SQLiteStateBackend(state_path)
+    # Another live process stands in for the second worker.
+    other_backend.pid = os.getppid()
+    storage_dir = str(tmp_path / "jobs")
+    owner = JobManager(storage_dir, state_backend=owner_backend, poll_interval=0.01)
+    other = JobManager(storage_dir, state_backend=other_backend, poll_interval=0.01)
+    await owner.start()
+    await other.start()
+    try:
+        process = FakeProcess(EVENTS, asyncio.Event())
+        job = await owner.submit(process, _drain, "sess", "proj", "model")
+        while (await owner.get_job(job["id"]))["event_count"] < 1:
+            await asyncio.sleep(0.01)
+
+        seen = await other.get_job(job["id"])
+        assert seen["status"] == "running"
+        assert seen["event_count"] == 1
+        assert seen["partial_output"] == "partial"
+
+        cancelling = await other.cancel_job(job["id"])
+        assert cancelling["status"] == "cancelling"
+        await _wait_for(other, job["id"], {"cancelled"})
+        assert process.stopped is True
+        assert owner_backend.get_lease_owner(f"job:{job['id']}") is None
+    finally:
+        await owner.stop()
+        await other.stop()
+        owner_backend.close()
+        other_backend.close()
+
+
+def test_async_chat_completion(test_client):
+    request_data = {
+        "model": get_test_model_id(),
+        "messages": [{"role": "user", "content": "Run this in the background"}],
+    }
+    response = test_client.post("/v1/chat/completions?async=true", json=request_data)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["object"] == "chat.completion.job"
+    assert response.headers["location"] == f"/v1/jobs/{job['id']}"
+
+    deadline = time.monotonic() + 10
+    while job["status"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = test_client.get(f"/v1/jobs/{job['id']}").json()
+
+    assert job["status"] == "completed"
+    assert job["result"]["object"] == "chat.completion"
+    events = test_client.get(f"/v1/jobs/{job['id']}/events").json()
+    assert len(events["data"]) == job["event_count"]
+    assert test_client.get("/v1/jobs/job_missing").status_code == 404
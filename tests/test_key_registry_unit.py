@@ -0,0 +1,110 @@
+"""Unit tests for the API key registry."""
+
+import json
+import os
+
+import pytest
+
+from claude_code_api.core import key_registry as registry_module
+from claude_code_api.core.config import settings
+from claude_code_api.core.key_registry import APIKeyRecord, KeyRegistry
+from claude_code_api.core.security import hash_api_key
+
+
+@pytest.fixture
+def restore_settings():
+    original_keys = settings.api_keys
+    original_path = settings.api_key_policies_path
+    yield
+    settings.api_keys = original_keys
+    settings.api_key_policies_path = original_path
+
+
+@pytest.fixture
+def no_db_keys(monkeypatch):
+    async def fake_load():
+        return []
+
+    monkeypatch.setattr(registry_module, "load_db_keys", fake_load)
+
+
+def test_lookup_tracks_settings_keys(restore_settings):
+    registry = KeyRegistry()
+    settings.api_keys = ["alpha"]
+    record = registry.lookup("alpha")
+    assert record is not None
+    assert record.key_hash == hash_api_key("alpha")
+    assert registry.lookup("beta") is None
+
+    settings.api_keys = ["beta"]
+    assert registry.lookup("alpha") is None
+    assert registry.lookup("beta") is not None
+
+
+@pytest.mark.asyncio
+async def test_policy_file_metadata(tmp_path, restore_settings, no_db_keys):
+    policy_path = tmp_path / "keys.json"
+    policy_path.write_text(
+        json.dumps(
+            {
+                "keys": [
+                    {
+                        "key": "alpha",
+                        "name": "team-a",
+                        "allowed_models": ["claude-haiku-4-5-20251001"],
+                        "tokens_per_minute": 500,
+                    },
+                    {"key_hash": hash_api_key("gamma"), "name": "hashed-only"},
+                ]
+            }
+        )
+    )
+    settings.api_keys = ["alpha", "beta"]
+    settings.api_key_policies_path = str(policy_path)
+
+    registry = KeyRegistry()
+    await registry.reload()
+
+    alpha = registry.lookup("alpha")
+    assert alpha.name == "team-a"
+    assert alpha.allows_model("claude-haiku-4-5-20251001") is True
+    assert alpha.allows_model("claude-opus-4-1-20250805") is False
+    assert alpha.quota_limits().tokens_per_minute == 500
+    assert registry.lookup("beta").source == "settings"
+    assert registry.lookup("gamma").name == "hashed-only"
+
+
+def test_record_defaults_to_global_quota(monkeypatch):
+    monkeypatch.setattr(settings, "quota_tokens_per_minute", 42)
+    record = APIKeyRecord(key_hash="x")
+    assert record.allows_model("anything") is True
+    assert record.quota_limits().tokens_per_minute == 42
+
+
+@pytest.mark.asyncio
+async def test_unchanged_policy_file_is_not_reparsed(
+    tmp_path, monkeypatch, restore_settings, no_db_keys
+):
+    policy_path = tmp_path / "keys.json"
+    policy_path.write_text(json.dumps([{"key": "alpha", "name": "v1"}]))
+    settings.api_key_policies_path = str(policy_path)
+    parses = []
+    load = registry_module.load_policy_file
+    monkeypatch.setattr(
+        registry_module,
+        "load_policy_file",
+        lambda path: parses.append(path) or load(path),
+    )
+
+    registry = KeyRegistry()
+    await registry.reload()
+    await registry.reload()
+    assert len(parses) == 1
+    assert registry.lookup("alpha").name == "v1"
+
+    policy_path.write_text(json.dumps([{"key": "alpha", "name": "v2"}]))
+    mtime = policy_path.stat().st_mtime + 5
+    os.utime(policy_path, (mtime, mtime))
+    await registry.reload()
+    assert len(parses) == 2
+    assert registry.lookup("alpha").name == "v2"
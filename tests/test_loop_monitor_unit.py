@@ -0,0 +1,103 @@
+"""Unit tests for the event-loop lag monitor and the admin report."""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from claude_code_api.api.admin import require_admin
+from claude_code_api.core.config import settings
+from claude_code_api.core.key_registry import APIKeyRecord
+from claude_code_api.core.loop_monitor import (
+    LoopMonitor,
+    culprit,
+    culprit_module,
+    event_loop_stall_samples_total,
+)
+
+
+def _block_loop(seconds):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_stall_is_sampled_and_attributed():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        _block_loop(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    report = monitor.report()
+    assert report["stalls"] >= 1
+    assert report["max_lag_seconds"] >= 0.2
+    top = report["offenders"][0]
+    assert top["samples"] >= 2
+    assert any("_block_loop" in frame for frame in top["stack"])
+    assert event_loop_stall_samples_total.value(module="test_loop_monitor_unit") >= 1
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_records_no_offenders():
+    monitor = LoopMonitor(interval=0.01, threshold=0.2)
+    monitor.start()
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+
+    report = monitor.report()
+    assert report["stalls"] == 0
+    assert report["offenders"] == []
+    assert report["running"] is False
+
+
+def test_culprit_prefers_package_frames():
+    import claude_code_api.core.session_manager as session_module
+
+    stack = (
+        ("/usr/lib/python3/asyncio/events.py", 80, "_run"),
+        (session_module.__file__, 42, "_persist_cli_session_map"),
+        ("/usr/lib/python3/json/encoder.py", 200, "encode"),
+    )
+    assert culprit(stack) == "_persist_cli_session_map (core/session_manager.py:42)"
+    assert culprit_module(stack) == "core.session_manager"
+    assert culprit_module(stack[:1]) == "events"
+
+
+def test_reset_clears_offenders():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.record_sample((("/tmp/x.py", 1, "f"),), 0.05)
+    assert monitor.report()["offenders"]
+    monitor.reset()
+    assert monitor.report()["offenders"] == []
+
+
+def _admin_request(record):
+    request = Request({"type": "http", "headers": [], "state": {}})
+    request.state.api_key_record = record
+    return request
+
+
+def test_require_admin_checks_key_when_auth_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "require_auth", True)
+    with pytest.raises(HTTPException) as exc_info:
+        require_admin(_admin_request(APIKeyRecord(key_hash="a", name="user")))
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail["error"]["code"] == "admin_required"
+
+    require_admin(_admin_request(APIKeyRecord(key_hash="b", name="ops", is_admin=True)))
+
+
+def test_admin_loop_endpoint(test_client):
+    response = test_client.get("/admin/loop", params={"limit": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["threshold_seconds"] == settings.loop_lag_threshold_seconds
+    assert "offenders" in body
+
+    metrics = test_client.get("/metrics")
+    assert "event_loop_lag_seconds_count" in metrics.text
@@ -0,0 +1,55 @@
+"""Unit tests for in-process metrics and the /metrics endpoint."""
+
+from claude_code_api.core.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from tests.model_utils import get_test_model_id
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 4.05" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_registry_renders_labels_and_callbacks():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("hits_total", "Hits.", labelnames=("path",)))
+    registry.register(Gauge("live", "Live things.", function=lambda: 3))
+    counter.inc(path='/a"b')
+    counter.inc(2, path='/a"b')
+
+    text = registry.render()
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{path="/a\\"b"} 3' in text
+    assert "live 3" in text
+
+
+def test_metrics_endpoint_reports_pipeline(test_client):
+    response = test_client.post(
+        "/v1/chat/completions",
+        json={
+            "model": get_test_model_id(),
+            "messages": [{"role": "user", "content": "Hi"}],
+            "stream": True,
+        },
+    )
+    assert response.status_code == 200
+
+    metrics = test_client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = metrics.text
+    assert "claude_spawn_seconds_count" in text
+    assert "claude_first_event_seconds_count" in text
+    assert (
+        'http_first_byte_seconds_count{path="/v1/chat/completions",stream="true"}'
+        in text
+    )
+    assert 'db_write_seconds_count{operation="create_session"}' in text
+    assert "claude_active_processes " in text
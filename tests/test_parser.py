@@ -102,6 +102,32 @@ def test_parse_message_updates_metrics():
     assert parser.message_count == 1
 
 
+def test_parse_message_charges_turn_usage_once_and_result_remainder():
+    charges = []
+    parser = ClaudeOutputParser(usage_callback=lambda t, c: charges.append((t, c)))
+    turn = {
+        "id": "msg_1",
+        "role": "assistant",
+        "usage": {"input_tokens": 10, "output_tokens": 4},
+    }
+    for block in ({"type": "text", "text": "hi"}, {"type": "tool_use", "id": "t"}):
+        parser.parse_message(
+            ClaudeMessage(type="assistant", message={**turn, "content": [block]})
+        )
+    assert charges == [(14, 0.0)]
+
+    parser.parse_message(
+        ClaudeMessage(
+            type="result",
+            usage={"input_tokens": 12, "output_tokens": 6},
+            total_cost_usd=0.02,
+        )
+    )
+    assert charges == [(14, 0.0), (4, 0.02)]
+    assert parser.total_tokens == 18
+    assert parser.total_cost == 0.02
+
+
 def test_error_extraction_helpers():
     message = ClaudeMessage(type="error", error="boom")
     assert extract_error_from_message(message) == "boom"
@@ -0,0 +1,153 @@
+"""Unit tests for cgroup placement and rlimit limits of Claude processes."""
+
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+import claude_code_api.core.claude_manager as cm
+import claude_code_api.core.process_limits as pl
+from claude_code_api.core.config import settings
+from claude_code_api.core.key_registry import APIKeyRecord
+from claude_code_api.core.process_limits import (
+    CgroupPlacer,
+    ProcessLimits,
+    limit_wrapper,
+)
+
+posix_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="needs rlimits and cgroup files"
+)
+
+
+def _fake_cgroup_root(path, controllers="cpu memory pids"):
+    path.mkdir(exist_ok=True)
+    (path / "cgroup.controllers").write_text(controllers + "\n")
+    (path / "cgroup.subtree_control").write_text("")
+    return path
+
+
+class _FakeCgroups(CgroupPlacer):
+    """A cgroup root on a plain filesystem, where the kernel adds no files."""
+
+    def __init__(self, root):
+        super().__init__(str(root))
+        self.contents = {}
+        self.removed = []
+
+    def create(self, limits):
+        path = super().create(limits)
+        open(os.path.join(path, "cgroup.procs"), "w").close()
+        return path
+
+    def remove(self, path):
+        self.contents = {
+            name: open(os.path.join(path, name)).read() for name in os.listdir(path)
+        }
+        self.removed.append(path)
+        shutil.rmtree(path)
+
+
+def test_limits_from_settings_and_key_policy(monkeypatch):
+    monkeypatch.setattr(settings, "process_cpu_weight", 50)
+    monkeypatch.setattr(settings, "process_memory_max_mb", 512)
+    monkeypatch.setattr(settings, "process_pids_max", 0)
+
+    defaults = APIKeyRecord(key_hash="x").process_limits()
+    assert defaults == ProcessLimits(cpu_weight=50, memory_max_bytes=512 * 2**20)
+    assert defaults.cgroup_files() == {
+        "cpu.weight": "50",
+        "memory.max": str(512 * 2**20),
+    }
+    assert defaults.niceness == 3
+
+    record = APIKeyRecord(key_hash="x", cpu_weight=200, pids_max=64, memory_max_mb=0)
+    limits = record.process_limits()
+    assert limits == ProcessLimits(cpu_weight=200, pids_max=64)
+    assert limits.niceness == 0
+    assert ProcessLimits().is_empty
+
+
+def test_placer_enables_controllers_and_writes_limits(tmp_path):
+    root = _fake_cgroup_root(tmp_path / "claude", controllers="cpu io pids")
+    placer = CgroupPlacer(str(root))
+
+    path = placer.create(ProcessLimits(cpu_weight=20, pids_max=32))
+
+    assert (root / "cgroup.subtree_control").read_text() == "+cpu +pids"
+    assert os.path.dirname(path) == str(root)
+    assert open(os.path.join(path, "cpu.weight")).read() == "20"
+    assert open(os.path.join(path, "pids.max")).read() == "32"
+
+
+def test_placer_without_cgroup_root_is_unavailable(tmp_path):
+    placer = CgroupPlacer(str(tmp_path))
+    assert placer.available() is False
+    assert placer.create(ProcessLimits(pids_max=10)) is None
+    assert os.listdir(tmp_path) == []
+    assert CgroupPlacer("").available() is False
+
+
+def test_no_wrapper_without_limits():
+    assert limit_wrapper(ProcessLimits()) == []
+
+
+def test_wrapper_skips_missing_tools(monkeypatch):
+    pl._find_tool.cache_clear()
+    monkeypatch.setattr(pl.shutil, "which", lambda name: None)
+    try:
+        assert limit_wrapper(ProcessLimits(cpu_weight=50, pids_max=10)) == []
+    finally:
+        pl._find_tool.cache_clear()
+
+
+@posix_only
+@pytest.mark.skipif(shutil.which("prlimit") is None, reason="needs prlimit")
+@pytest.mark.asyncio
+async def test_wrapper_falls_back_to_rlimits():
+    limits = ProcessLimits(cpu_weight=50, memory_max_bytes=2**30, pids_max=4096)
+    process = await asyncio.create_subprocess_exec(
+        *limit_wrapper(limits),
+        sys.executable,
+        "-c",
+        "import os, resource; "
+        "print(resource.getrlimit(resource.RLIMIT_DATA)[0], "
+        "resource.getrlimit(resource.RLIMIT_NPROC)[0], os.nice(0))",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await process.communicate()
+
+    data, nproc, niceness = (int(value) for value in stdout.split())
+    assert data == 2**30
+    assert nproc <= 4096
+    assert niceness >= 3
+
+
+@posix_only
+@pytest.mark.asyncio
+async def test_process_joins_and_releases_its_cgroup(tmp_path, monkeypatch):
+    cgroups = _FakeCgroups(_fake_cgroup_root(tmp_path / "claude"))
+    monkeypatch.setattr(cm, "cgroups", cgroups)
+    project = tmp_path / "project"
+    project.mkdir()
+
+    process = cm.ClaudeProcess(
+        session_id="limited",
+        project_path=str(project),
+        limits=ProcessLimits(cpu_weight=30),
+    )
+    assert await process.start(prompt="hello") is True
+    while await process.output_queue.get() is not None:
+        pass
+    await process._cgroup_task
+
+    # The gateway moved the child in by pid right after spawning it.
+    assert cgroups.contents == {
+        "cgroup.procs": str(process.process.pid),
+        "cpu.weight": "30",
+    }
+    assert len(cgroups.removed) == 1
+    assert process.cgroup_path is None
+    await process.stop()
@@ -0,0 +1,101 @@
+"""Unit tests for per-process resource sampling."""
+
+import os
+import sys
+
+import pytest
+
+from claude_code_api.core import process_stats
+from claude_code_api.core.process_stats import (
+    ProcessSampler,
+    ProcessUsage,
+    read_proc_usage,
+)
+from tests.model_utils import get_test_model_id
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="needs /proc"
+)
+
+
+def _fake_proc(root, pid, utime, stime, cutime=0, cstime=0, start=1234):
+    proc = root / str(pid)
+    proc.mkdir(parents=True)
+    fields = ["S", "1"] + ["0"] * 9 + [utime, stime, cutime, cstime] + ["0"] * 4
+    fields += [start]
+    (proc / "stat").write_text(
+        f"{pid} (claude (node) x) " + " ".join(str(f) for f in fields) + "\n"
+    )
+    (proc / "status").write_text(
+        "Name:\tclaude\nVmHWM:\t  2048 kB\nVmRSS:\t  1024 kB\n"
+    )
+    (proc / "io").write_text("rchar: 10\nread_bytes: 4096\nwrite_bytes: 8192\n")
+
+
+def test_read_proc_usage_parses_procfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_stats, "CLOCK_TICKS", 100)
+    _fake_proc(tmp_path, 42, utime=150, stime=50, cutime=100, cstime=25)
+
+    usage = read_proc_usage(42, proc_root=str(tmp_path))
+
+    assert usage.cpu_user_seconds == pytest.approx(2.5)
+    assert usage.cpu_system_seconds == pytest.approx(0.75)
+    assert usage.peak_rss_bytes == 2048 * 1024
+    assert usage.rss_bytes == 1024 * 1024
+    assert (usage.read_bytes, usage.write_bytes) == (4096, 8192)
+    assert usage.start_ticks == 1234
+    assert read_proc_usage(43, proc_root=str(tmp_path)) is None
+
+
+def test_update_ignores_reused_pid_and_add_sums_runs():
+    run = ProcessUsage()
+    run.update(ProcessUsage(cpu_user_seconds=1.0, peak_rss_bytes=100, start_ticks=7))
+    run.update(ProcessUsage(cpu_user_seconds=2.0, peak_rss_bytes=50, start_ticks=7))
+    run.update(ProcessUsage(cpu_user_seconds=9.0, peak_rss_bytes=999, start_ticks=8))
+    assert run.cpu_user_seconds == 2.0
+    assert run.peak_rss_bytes == 100
+    assert run.samples == 2
+
+    session = ProcessUsage()
+    session.add(run)
+    session.add(ProcessUsage(cpu_user_seconds=1.0, peak_rss_bytes=300, samples=1))
+    assert session.cpu_user_seconds == 3.0
+    assert session.peak_rss_bytes == 300
+    assert session.to_dict()["runs"] == 2
+
+
+class FakeProcess:
+    def __init__(self, pid):
+        self.pid = pid
+        self.usage = ProcessUsage()
+
+
+@linux_only
+@pytest.mark.asyncio
+async def test_sampler_reads_running_processes():
+    running = FakeProcess(os.getpid())
+    exited = FakeProcess(None)
+    sampler = ProcessSampler(lambda: [running, exited])
+
+    assert await sampler.sample_once() == 1
+    assert running.usage.samples == 1
+    assert running.usage.peak_rss_bytes > 0
+    assert exited.usage.samples == 0
+
+
+def test_status_reports_session_resource_usage(test_client):
+    response = test_client.post(
+        "/v1/chat/completions",
+        json={
+            "model": get_test_model_id(),
+            "messages": [{"role": "user", "content": "Hi"}],
+        },
+    )
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    status_response = test_client.get(f"/v1/chat/completions/{session_id}/status")
+    assert status_response.status_code == 200
+    body = status_response.json()
+    assert body["resource_usage"]["runs"] == 1
+    assert body["process_usage"] is None
@@ -0,0 +1,101 @@
+"""Unit tests for the sampling profiler and /admin/profile."""
+
+import asyncio
+import time
+
+import pytest
+
+from claude_code_api.core import profiler
+
+
+def _busy(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+async def _labelled_busy_request():
+    profiler.label_task(scope={"type": "http", "method": "POST", "path": "/v1/x"})
+    profiler.label_task(session_id="sess-1")
+    await asyncio.sleep(0.02)
+    _busy(0.2)
+
+
+@pytest.mark.asyncio
+async def test_child_tasks_inherit_labels():
+    loop = asyncio.get_running_loop()
+    profiler.install_task_factory(loop)
+    try:
+        seen = {}
+
+        async def child():
+            await asyncio.sleep(0)
+            seen.update(profiler._labels_for(asyncio.current_task()) or {})
+
+        async def parent():
+            profiler.label_task(route="r")
+            task = asyncio.create_task(child())
+            profiler.label_task(session_id="late")
+            await task
+
+        await asyncio.create_task(parent())
+        assert seen == {"route": "r", "session_id": "late"}
+    finally:
+        profiler.uninstall_task_factory(loop)
+    assert loop.get_task_factory() is None
+
+
+@pytest.mark.asyncio
+async def test_samples_are_attributed_to_route_and_session():
+    sampler = profiler.SamplingProfiler(asyncio.get_running_loop(), interval=0.005)
+    sampler.start()
+    try:
+        await asyncio.create_task(_labelled_busy_request())
+    finally:
+        await sampler.stop()
+
+    collapsed = sampler.collapsed()
+    busy_lines = [
+        line
+        for line in collapsed.splitlines()
+        if line.startswith("route:POST /v1/x;session:sess-1;") and "_busy" in line
+    ]
+    assert busy_lines
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy_lines) >= 5
+
+    document = sampler.speedscope()
+    names = [frame["name"] for frame in document["shared"]["frames"]]
+    assert "session:sess-1" in names
+    route_profile = next(p for p in document["profiles"] if p["name"] == "POST /v1/x")
+    assert route_profile["type"] == "sampled"
+    assert len(route_profile["samples"]) == len(route_profile["weights"])
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_is_counted_separately():
+    result = await profiler.profile(0.1, 0.005)
+    assert result.idle_samples > 0
+    assert result.summary()["busy_samples"] <= result.summary()["samples"]
+
+
+def test_admin_profile_endpoint(test_client):
+    response = test_client.get("/admin/profile", params={"seconds": 0.1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["x-profile-samples"]) > 0
+
+    response = test_client.get(
+        "/admin/profile", params={"seconds": 0.1, "format": "speedscope"}
+    )
+    assert response.status_code == 200
+    assert response.json()["exporter"] == "claude-code-api"
+
+    response = test_client.get("/admin/profile", params={"format": "pprof"})
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "invalid_format"
+
+    for interval_ms in (0, 0.5, 5000):
+        response = test_client.get(
+            "/admin/profile", params={"seconds": 0.1, "interval_ms": interval_ms}
+        )
+        assert response.status_code == 422
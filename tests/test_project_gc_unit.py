@@ -0,0 +1,111 @@
+"""Unit tests for idle project garbage collection."""
+
+import os
+import time
+
+import pytest
+
+from claude_code_api.core.config import settings
+from claude_code_api.core.project_gc import (
+    ProjectGC,
+    fork_project_id,
+    is_auto_project,
+    touch_project,
+)
+from claude_code_api.core.session_manager import SessionInfo
+
+
+def _project(root, name, idle_minutes):
+    path = root / name
+    path.mkdir()
+    (path / "file.txt").write_text("data")
+    last_used = time.time() - idle_minutes * 60
+    os.utime(path, (last_used, last_used))
+    return path
+
+
+class FakeDisk:
+    """Reports usage dropping by ten points for each project removed."""
+
+    def __init__(self, root, start_percent):
+        self.root = root
+        self.start_percent = start_percent
+        self.initial = len(os.listdir(root))
+
+    def __call__(self, _path):
+        removed = self.initial - len(os.listdir(self.root))
+        return self.start_percent - 10 * removed
+
+
+@pytest.fixture
+def gc_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "project_root", str(tmp_path))
+    monkeypatch.setattr(settings, "project_gc_high_watermark_percent", 90.0)
+    monkeypatch.setattr(settings, "project_gc_low_watermark_percent", 80.0)
+    monkeypatch.setattr(settings, "project_gc_min_idle_minutes", 60)
+    monkeypatch.setattr(settings, "project_gc_batch_size", 1)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_until_low_watermark(gc_settings):
+    root = gc_settings
+    oldest = _project(root, "default-a", idle_minutes=300)
+    older = _project(root, "my-project-fork-0123abcd", idle_minutes=200)
+    old = _project(root, "default-c", idle_minutes=120)
+    fresh = _project(root, "default-d", idle_minutes=5)
+    named = _project(root, "my-project", idle_minutes=500)
+
+    gc = ProjectGC(used_percent=FakeDisk(root, start_percent=95))
+    evicted = await gc.run_once()
+
+    assert evicted == [str(oldest), str(older)]
+    assert not oldest.exists() and not older.exists()
+    assert old.exists() and fresh.exists() and named.exists()
+
+
+def test_auto_project_names():
+    assert is_auto_project("default-client")
+    assert is_auto_project(fork_project_id("my-project"))
+    assert not is_auto_project("my-project")
+    assert not is_auto_project("my-project-fork-notahexid")
+
+
+@pytest.mark.asyncio
+async def test_skips_busy_projects_and_idles_below_watermark(gc_settings):
+    root = gc_settings
+    busy = _project(root, "default-busy", idle_minutes=300)
+    idle = _project(root, "default-idle", idle_minutes=200)
+
+    gc = ProjectGC(used_percent=lambda _path: 50.0)
+    assert await gc.run_once() == []
+
+    gc = ProjectGC(
+        busy_paths=lambda: [str(busy)],
+        used_percent=FakeDisk(root, start_percent=100),
+    )
+    assert await gc.run_once() == [str(idle)]
+    assert busy.exists()
+
+
+@pytest.mark.asyncio
+async def test_touch_protects_project(gc_settings):
+    root = gc_settings
+    project = _project(root, "default-x", idle_minutes=300)
+    touch_project(str(project))
+
+    gc = ProjectGC(used_percent=lambda _path: 99.0)
+    assert await gc.run_once() == []
+    assert project.exists()
+
+
+def test_app_treats_active_sessions_as_busy(test_client):
+    state = test_client.app.state
+    state.session_manager._track(
+        SessionInfo(session_id="gc-busy", project_id="default-live", model="m")
+    )
+    try:
+        busy = list(state.project_gc._busy_paths())
+    finally:
+        state.session_manager._untrack("gc-busy")
+    assert os.path.join(settings.project_root, "default-live") in busy
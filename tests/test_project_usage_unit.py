@@ -0,0 +1,118 @@
+"""Unit tests for incremental project size tracking."""
+
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from claude_code_api.core import project_usage as usage_module
+from claude_code_api.core.project_usage import ProjectUsage, ProjectUsageTracker
+from tests.model_utils import get_test_model_id
+
+
+def _write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _bump_mtime(path):
+    # Filesystem timestamps can be coarse; make directory changes visible.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_full_scan_and_incremental_refresh(tmp_path, monkeypatch):
+    _write(tmp_path / "a.txt", 10)
+    _write(tmp_path / "src" / "b.txt", 20)
+    _write(tmp_path / "src" / "deep" / "c.txt", 30)
+
+    usage = ProjectUsage(str(tmp_path))
+    usage.full_scan()
+    assert (usage.size_bytes, usage.file_count) == (60, 3)
+
+    scanned = []
+    real_scan = usage_module._scan_dir
+    monkeypatch.setattr(
+        usage_module,
+        "_scan_dir",
+        lambda path: scanned.append(os.path.relpath(path, tmp_path)) or real_scan(path),
+    )
+
+    _write(tmp_path / "src" / "new" / "d.txt", 5)
+    _bump_mtime(tmp_path / "src")
+    usage.refresh()
+    assert (usage.size_bytes, usage.file_count) == (65, 4)
+    # Only the changed directory and the new subtree were listed.
+    assert sorted(scanned) == ["src", os.path.join("src", "new")]
+
+    # A recently written file growing in place is seen without a rescan.
+    _write(tmp_path / "a.txt", 110)
+    scanned.clear()
+    usage.refresh()
+    assert usage.size_bytes == 165
+    assert scanned == []
+
+
+def test_removed_subtree_is_dropped(tmp_path):
+    _write(tmp_path / "keep.txt", 1)
+    _write(tmp_path / "gone" / "inner" / "big.bin", 100)
+    usage = ProjectUsage(str(tmp_path))
+    usage.full_scan()
+    assert usage.size_bytes == 101
+
+    shutil.rmtree(tmp_path / "gone")
+    _bump_mtime(tmp_path)
+    usage.refresh()
+    assert (usage.size_bytes, usage.file_count) == (1, 1)
+    assert set(usage.dirs) == {""}
+
+
+class FakeProcess:
+    session_id = "sess"
+
+    def __init__(self):
+        self.is_running = True
+
+    async def stop(self):
+        self.is_running = False
+
+
+@pytest.mark.asyncio
+async def test_watch_stops_process_over_quota(tmp_path):
+    tracker = ProjectUsageTracker(max_bytes=50, poll_seconds=0.01)
+    _write(tmp_path / "small.txt", 10)
+    assert await tracker.check(str(tmp_path)) is None
+
+    process = FakeProcess()
+    tracker.watch(process, str(tmp_path))
+    _write(tmp_path / "huge.txt", 100)
+    _bump_mtime(tmp_path)
+    for _ in range(100):
+        if not process.is_running:
+            break
+        await asyncio.sleep(0.01)
+    assert process.is_running is False
+    await tracker.stop()
+
+
+def test_project_usage_in_api(test_client, monkeypatch):
+    project = test_client.post("/v1/projects", json={"name": "sized"}).json()
+    with open(os.path.join(project["path"], "data.bin"), "wb") as handle:
+        handle.write(b"x" * 2048)
+
+    info = test_client.get(f"/v1/projects/{project['id']}").json()
+    assert info["size_bytes"] == 2048
+    assert info["file_count"] == 1
+
+    monkeypatch.setattr(usage_module.project_usage, "_max_bytes", 1024)
+    response = test_client.post(
+        "/v1/chat/completions",
+        json={
+            "model": get_test_model_id(),
+            "messages": [{"role": "user", "content": "Add more files"}],
+            "project_id": project["id"],
+        },
+    )
+    assert response.status_code == 507
+    assert response.json()["error"]["code"] == "project_quota_exceeded"
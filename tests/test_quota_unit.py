@@ -0,0 +1,102 @@
+"""Unit tests for per-key quotas."""
+
+import pytest
+
+from claude_code_api.core import quota as quota_module
+from claude_code_api.core.quota import QuotaLimits, QuotaManager
+from claude_code_api.utils.streaming import OpenAIStreamConverter
+
+
+class FakeProcess:
+    def __init__(self, events):
+        self.session_id = "sess"
+        self.events = events
+        self.stopped = False
+
+    async def get_output(self):
+        for event in self.events:
+            if self.stopped:
+                break
+            yield event
+
+    async def stop(self):
+        self.stopped = True
+
+
+def _assistant(text, tokens):
+    return {
+        "type": "assistant",
+        "message": {
+            "id": f"msg_{text.replace(' ', '_')}",
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": 0, "output_tokens": tokens},
+        },
+        "session_id": "sess",
+    }
+
+
+def test_tokens_per_minute_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quota_module.time, "time", lambda: now[0])
+    manager = QuotaManager()
+    limits = QuotaLimits(tokens_per_minute=100)
+
+    manager.charge("key", 60, 0.0)
+    assert manager.check("key", limits) is None
+    manager.charge("key", 40, 0.0)
+    assert manager.check("key", limits) == quota_module.QUOTA_TOKENS_PER_MINUTE
+
+    now[0] += 61
+    assert manager.check("key", limits) is None
+
+
+def test_cost_per_day_budget():
+    manager = QuotaManager()
+    limits = QuotaLimits(cost_per_day_usd=1.0)
+    manager.charge("key", 0, 0.75)
+    assert manager.check("key", limits) is None
+    manager.charge("key", 0, 0.25)
+    assert manager.check("key", limits) == quota_module.QUOTA_COST_PER_DAY
+    assert manager.check("other", limits) is None
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pending_deltas(monkeypatch):
+    calls = []
+
+    async def fake_record(key_hash, requests, tokens, cost, last_used_at):
+        calls.append((key_hash, requests, tokens, cost))
+
+    monkeypatch.setattr(quota_module.db_manager, "record_api_key_usage", fake_record)
+    manager = QuotaManager()
+    manager.record_request("key")
+    manager.charge("key", 10, 0.5)
+
+    await manager.flush()
+    await manager.flush()
+
+    assert calls == [("key", 1, 10, 0.5)]
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_when_quota_exceeded():
+    manager = QuotaManager()
+    meter = manager.meter("key", QuotaLimits(tokens_per_minute=10))
+    process = FakeProcess(
+        [
+            _assistant("first", 6),
+            _assistant("second", 6),
+            _assistant("never sent", 6),
+        ]
+    )
+    converter = OpenAIStreamConverter("claude", "sess", quota_meter=meter)
+
+    chunks = [chunk async for chunk in converter.convert_stream(process)]
+
+    assert process.stopped is True
+    assert meter.exceeded == quota_module.QUOTA_TOKENS_PER_MINUTE
+    body = "".join(chunks)
+    assert "never sent" not in body
+    assert '"finish_reason":"length"' in body
@@ -0,0 +1,159 @@
+"""Unit tests for the response cache."""
+
+import pytest
+
+from claude_code_api.core import response_cache as cache_module
+from claude_code_api.core.response_cache import (
+    CachedProcess,
+    ResponseCache,
+    make_cache_key,
+    project_fingerprint,
+)
+from claude_code_api.main import app
+from claude_code_api.models.claude import get_default_model
+from tests.model_utils import get_test_model_id
+
+EVENTS = [
+    {"type": "assistant", "message": {"role": "assistant", "content": "hi"}},
+    {"type": "result", "subtype": "success", "result": "hi"},
+]
+
+
+class FakeProcess:
+    def __init__(self, events):
+        self.session_id = "sess"
+        self.events = events
+
+    async def get_output(self):
+        for event in self.events:
+            yield event
+
+
+def test_cache_key_depends_on_inputs():
+    key = make_cache_key("model", None, "prompt", "proj")
+    assert key == make_cache_key("model", None, "prompt", "proj")
+    assert key != make_cache_key("model", "system", "prompt", "proj")
+    assert key != make_cache_key("model", None, "prompt", "other")
+    assert key != make_cache_key("model", None, "prompt", "proj", "tree")
+
+
+def test_project_fingerprint_tracks_changes(tmp_path):
+    (tmp_path / "a.txt").write_text("one")
+    before = project_fingerprint(str(tmp_path))
+    assert before == project_fingerprint(str(tmp_path))
+    (tmp_path / "b.txt").write_text("two")
+    assert project_fingerprint(str(tmp_path)) != before
+
+
+@pytest.mark.asyncio
+async def test_memory_lru_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=60, max_entries=2, cache_dir="")
+
+    cache.put("a", EVENTS)
+    cache.put("b", EVENTS)
+    assert await cache.get("a") == EVENTS
+    cache.put("c", EVENTS)
+    assert await cache.get("b") is None
+    assert await cache.get("a") == EVENTS
+
+    now[0] += 61
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_instance(tmp_path):
+    cache = ResponseCache(ttl_seconds=60, cache_dir=str(tmp_path))
+    cache.put("key", EVENTS)
+    await cache.close()
+
+    fresh = ResponseCache(ttl_seconds=60, cache_dir=str(tmp_path))
+    assert await fresh.get("key") == EVENTS
+    assert "key" in fresh.memory
+
+
+@pytest.mark.asyncio
+async def test_recording_only_stores_successful_runs():
+    cache = ResponseCache(ttl_seconds=60, cache_dir="")
+    failed = [{"type": "result", "is_error": True}]
+
+    async for _ in cache.record("bad", FakeProcess(failed)).get_output():
+        pass
+    async for event in cache.record("good", FakeProcess(EVENTS)).get_output():
+        if event["type"] == "result":
+            break
+
+    assert await cache.get("bad") is None
+    assert await cache.get("good") == EVENTS
+    replayed = [event async for event in CachedProcess("s", EVENTS).get_output()]
+    assert replayed == EVENTS
+
+
+def test_chat_completion_cache_modes(test_client, tmp_path):
+    app.state.response_cache = ResponseCache(cache_dir=str(tmp_path))
+    try:
+        request_data = {
+            "model": get_test_model_id(),
+            "messages": [{"role": "user", "content": "Cache me please"}],
+            "project_id": "cache-test",
+        }
+
+        response = test_client.post(
+            "/v1/chat/completions", json={**request_data, "cache": "only"}
+        )
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "cache_miss"
+
+        first = test_client.post("/v1/chat/completions", json=request_data)
+        assert first.status_code == 200
+
+        cached = test_client.post(
+            "/v1/chat/completions", json={**request_data, "cache": "only"}
+        )
+        assert cached.status_code == 200
+        assert (
+            cached.json()["choices"][0]["message"]["content"]
+            == first.json()["choices"][0]["message"]["content"]
+        )
+
+        streamed = test_client.post(
+            "/v1/chat/completions",
+            json={**request_data, "cache": "only", "stream": True},
+        )
+        assert streamed.status_code == 200
+        assert "[DONE]" in streamed.text
+    finally:
+        app.state.response_cache = None
+
+
+def test_cache_keys_on_resolved_model_and_skips_sessions(test_client, tmp_path):
+    app.state.response_cache = ResponseCache(cache_dir=str(tmp_path))
+    try:
+        request_data = {
+            "messages": [{"role": "user", "content": "Cache the default"}],
+            "project_id": "cache-default-model",
+        }
+        first = test_client.post("/v1/chat/completions", json=request_data)
+        assert first.status_code == 200
+
+        # Naming the default model explicitly is the same request.
+        named = test_client.post(
+            "/v1/chat/completions",
+            json={**request_data, "model": get_default_model(), "cache": "only"},
+        )
+        assert named.status_code == 200
+
+        # A session's reply depends on its history, so it is never cached.
+        in_session = test_client.post(
+            "/v1/chat/completions",
+            json={
+                **request_data,
+                "session_id": first.json()["session_id"],
+                "cache": "only",
+            },
+        )
+        assert in_session.status_code == 404
+        assert in_session.json()["error"]["code"] == "cache_miss"
+    finally:
+        app.state.response_cache = None
@@ -8,6 +8,7 @@ import pytest
 
 from claude_code_api.core import session_manager as sm_module
 from claude_code_api.core.session_manager import SessionInfo, SessionManager
+from claude_code_api.core.session_stats import RateWindow
 from claude_code_api.utils.time import utc_now
 
 
@@ -41,27 +42,158 @@ async def test_get_session_from_db(monkeypatch):
     await manager.cleanup_all()
 
 
+@pytest.mark.asyncio
+async def test_unknown_session_lookups_are_cached(monkeypatch):
+    manager = SessionManager()
+    lookups = []
+
+    async def fake_get_session(session_id):
+        lookups.append(session_id)
+        return None
+
+    monkeypatch.setattr(sm_module.db_manager, "get_session", fake_get_session)
+
+    assert await manager.get_session("ghost") is None
+    assert await manager.get_session("ghost") is None
+    assert lookups == ["ghost"]
+
+    # Creating the session invalidates the cached miss.
+    manager._track(SessionInfo(session_id="ghost", project_id="p", model="m"))
+    assert (await manager.get_session("ghost")).session_id == "ghost"
+
+    monkeypatch.setattr(sm_module.settings, "session_negative_cache_ttl_seconds", 0)
+    assert await manager.get_session("other") is None
+    assert await manager.get_session("other") is None
+    assert lookups == ["ghost", "other", "other"]
+    await manager.cleanup_all()
+
+
+@pytest.mark.asyncio
+async def test_active_sessions_are_capped_lru(monkeypatch):
+    monkeypatch.setattr(sm_module.settings, "max_active_sessions", 2)
+    manager = SessionManager()
+    for session_id in ("a", "b"):
+        manager._track(SessionInfo(session_id=session_id, project_id="p", model="m"))
+    await manager.get_session("a")
+    manager._track(SessionInfo(session_id="c", project_id="p", model="m"))
+
+    assert list(manager.active_sessions) == ["a", "c"]
+    assert manager.get_session_stats()["active_sessions"] == 2
+
+    # The evicted session is still active in the database and comes back.
+    fake_db_session = types.SimpleNamespace(
+        id="b",
+        project_id="p",
+        model="m",
+        system_prompt=None,
+        created_at=utc_now(),
+        updated_at=utc_now(),
+        message_count=0,
+        total_tokens=0,
+        total_cost=0.0,
+        is_active=True,
+    )
+
+    async def fake_get_session(_session_id):
+        return fake_db_session
+
+    monkeypatch.setattr(sm_module.db_manager, "get_session", fake_get_session)
+    assert (await manager.get_session("b")).session_id == "b"
+    assert list(manager.active_sessions) == ["c", "b"]
+
+    manager.active_sessions.clear()
+    await manager.cleanup_all()
+
+
+@pytest.mark.asyncio
+async def test_evicted_sessions_still_expire(monkeypatch):
+    monkeypatch.setattr(sm_module.settings, "max_active_sessions", 1)
+    manager = SessionManager()
+    manager.session_map_path = None
+    idle = SessionInfo(session_id="idle", project_id="p", model="m")
+    idle.updated_at = utc_now() - timedelta(minutes=60)
+    manager._track(idle)
+    manager.register_cli_session("idle", "cli-idle")
+    manager._track(SessionInfo(session_id="fresh", project_id="p", model="m"))
+    assert list(manager.active_sessions) == ["fresh"]
+
+    deactivated = []
+
+    async def fake_deactivate(session_ids):
+        deactivated.append(list(session_ids))
+
+    monkeypatch.setattr(sm_module.db_manager, "deactivate_sessions", fake_deactivate)
+
+    await manager.cleanup_expired_sessions()
+    assert deactivated == [["idle"]]
+    assert "cli-idle" not in manager.cli_session_index
+    assert list(manager.active_sessions) == ["fresh"]
+
+    manager.active_sessions.clear()
+    await manager.cleanup_all()
+
+
 @pytest.mark.asyncio
 async def test_cleanup_expired_sessions(monkeypatch):
     manager = SessionManager()
     session = SessionInfo(session_id="sess", project_id="proj", model="claude")
     session.updated_at = utc_now() - timedelta(minutes=60)
-    manager.active_sessions["sess"] = session
+    manager._track(session)
 
-    async def fake_deactivate(_session_id):
-        return None
+    deactivated = []
 
-    monkeypatch.setattr(sm_module.db_manager, "deactivate_session", fake_deactivate)
+    async def fake_deactivate(session_ids):
+        deactivated.append(list(session_ids))
+
+    monkeypatch.setattr(sm_module.db_manager, "deactivate_sessions", fake_deactivate)
 
     await manager.cleanup_expired_sessions()
     assert "sess" not in manager.active_sessions
+    assert deactivated == [["sess"]]
+    await manager.cleanup_all()
+
+
+@pytest.mark.asyncio
+async def test_expiry_only_visits_due_sessions(monkeypatch):
+    monkeypatch.setattr(sm_module.settings, "session_timeout_minutes", 30)
+    manager = SessionManager()
+    stale = utc_now() - timedelta(minutes=45)
+    for index in range(3):
+        session = SessionInfo(session_id=f"old{index}", project_id="p", model="m")
+        session.updated_at = stale
+        manager._track(session)
+    # Scheduled while idle, then used again before its deadline came up.
+    revived = SessionInfo(session_id="revived", project_id="p", model="m")
+    revived.updated_at = stale
+    manager._track(revived)
+    revived.updated_at = utc_now()
+    for index in range(100):
+        manager._track(SessionInfo(session_id=f"new{index}", project_id="p", model="m"))
+
+    deactivated = []
+
+    async def fake_deactivate(session_ids):
+        deactivated.append(sorted(session_ids))
+
+    monkeypatch.setattr(sm_module.db_manager, "deactivate_sessions", fake_deactivate)
+
+    await manager.cleanup_expired_sessions()
+    assert deactivated == [["old0", "old1", "old2"]]
+    assert "revived" in manager.active_sessions
+    # The revived session was rescheduled; the fresh ones were never popped.
+    assert len(manager._expiry_heap) == 101
+
+    await manager.cleanup_expired_sessions()
+    assert len(deactivated) == 1
+
+    manager.active_sessions.clear()
     await manager.cleanup_all()
 
 
 @pytest.mark.asyncio
-async def test_session_stats():
+async def test_session_stats(monkeypatch):
     manager = SessionManager()
-    s1 = SessionInfo(session_id="s1", project_id="p1", model="m1")
+    s1 = SessionInfo(session_id="s1", project_id="p1", model="m1", api_key_name="ci")
     s1.total_tokens = 5
     s1.total_cost = 1.5
     s1.message_count = 2
@@ -71,8 +203,8 @@ async def test_session_stats():
     s2.total_cost = 0.5
     s2.message_count = 1
 
-    manager.active_sessions["s1"] = s1
-    manager.active_sessions["s2"] = s2
+    manager._track(s1)
+    manager._track(s2)
 
     stats = manager.get_session_stats()
     assert stats["active_sessions"] == 2
@@ -80,9 +212,49 @@ async def test_session_stats():
     assert stats["total_cost"] == 2.0
     assert stats["total_messages"] == 3
     assert set(stats["models_in_use"]) == {"m1", "m2"}
+    assert stats["by_project"]["p1"]["sessions"] == 2
+    assert stats["by_key"] == {
+        "ci": {"sessions": 1, "tokens": 5, "cost": 1.5, "messages": 2}
+    }
+
+    async def fake_noop(*_args, **_kwargs):
+        return None
+
+    monkeypatch.setattr(sm_module.db_manager, "add_message", fake_noop)
+    monkeypatch.setattr(sm_module.db_manager, "update_session_metrics", fake_noop)
+    monkeypatch.setattr(sm_module.db_manager, "deactivate_session", fake_noop)
+
+    await manager.update_session("s1", tokens_used=120, message_content="hi")
+    stats = manager.get_session_stats()
+    assert stats["by_model"]["m1"]["tokens"] == 125
+    assert stats["rates"]["1m"]["tokens_per_minute"] == 120
+    assert stats["rates"]["5m"]["tokens_per_minute"] == 24
+
+    await manager.end_session("s1")
+    stats = manager.get_session_stats()
+    assert stats["active_sessions"] == 1
+    assert stats["total_tokens"] == 3
+    assert stats["models_in_use"] == ["m2"]
+    assert stats["by_key"] == {}
     await manager.cleanup_all()
 
 
+def test_rate_window_drops_old_buckets():
+    now = [1000.0]
+    window = RateWindow(bucket_seconds=5, bucket_count=12, clock=lambda: now[0])
+    window.record(tokens=60, cost=0.0, messages=1)
+    assert window.rates(60)["tokens_per_minute"] == 60
+
+    now[0] += 30
+    window.record(tokens=30, cost=0.0, messages=1)
+    assert window.rates(60)["tokens_per_minute"] == 90
+    assert window.rates(10)["tokens_per_minute"] == 180
+
+    now[0] += 45
+    assert window.rates(60)["tokens_per_minute"] == 30
+    assert window.rates(60)["messages_per_minute"] == 1
+
+
 @pytest.mark.asyncio
 async def test_persist_cli_session_map_writes_expected_payload(tmp_path):
     manager = SessionManager()
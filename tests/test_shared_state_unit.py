@@ -0,0 +1,171 @@
+"""Unit tests for the shared state backends."""
+
+import pytest
+
+from claude_code_api.core import shared_state as ss
+from claude_code_api.core.auth import RateLimiter
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        instance = ss.MemoryStateBackend()
+    else:
+        instance = ss.SQLiteStateBackend(str(tmp_path / "state.db"))
+    yield instance
+    instance.close()
+
+
+def test_check_rate_enforces_limit(backend):
+    assert backend.check_rate("client", 100.0, 2, 10) is True
+    assert backend.check_rate("client", 101.0, 2, 10) is True
+    assert backend.check_rate("client", 102.0, 2, 10) is False
+    # Requests older than the window no longer count.
+    assert backend.check_rate("client", 200.0, 2, 10) is True
+
+
+def test_check_rate_burst_resets_after_idle_window(backend):
+    assert backend.check_rate("client", 100.0, 100, 1) is True
+    assert backend.check_rate("client", 101.0, 100, 1) is False
+    assert backend.check_rate("client", 200.0, 100, 1) is True
+
+
+def test_slots_respect_limit_and_release(backend):
+    assert backend.acquire_slot("pool", "a", 2) is True
+    assert backend.acquire_slot("pool", "a", 2) is True
+    assert backend.acquire_slot("pool", "b", 2) is True
+    assert backend.acquire_slot("pool", "c", 2) is False
+    assert backend.count_slots("pool") == 2
+
+    backend.release_slot("pool", "a")
+    assert backend.acquire_slot("pool", "c", 2) is True
+
+
+def test_session_ownership(backend):
+    assert backend.claim_session("sess") is True
+    assert backend.get_session_owner("sess") == backend.pid
+    backend.release_session("sess")
+    assert backend.get_session_owner("sess") is None
+
+
+def test_lease_cancel_requests(backend):
+    assert backend.request_cancel("job:a") is False
+    assert backend.claim_lease("job:a") is True
+    assert backend.claim_lease("job:a") is True
+    assert backend.get_lease_owner("job:a") == backend.pid
+    assert backend.pending_cancels() == []
+
+    assert backend.request_cancel("job:a") is True
+    assert backend.pending_cancels() == ["job:a"]
+
+    backend.release_lease("job:a")
+    assert backend.get_lease_owner("job:a") is None
+    assert backend.pending_cancels() == []
+
+
+def test_sqlite_lease_is_exclusive_between_live_workers(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.db")
+    first = ss.SQLiteStateBackend(path)
+    second = ss.SQLiteStateBackend(path)
+    try:
+        second.pid = first.pid + 1
+        alive = {first.pid, second.pid}
+        monkeypatch.setattr(ss, "_pid_alive", lambda pid: pid in alive)
+        assert first.claim_lease("batch:a") is True
+        assert second.claim_lease("batch:a") is False
+
+        assert second.request_cancel("batch:a") is True
+        assert second.pending_cancels() == []
+        assert first.pending_cancels() == ["batch:a"]
+
+        alive.discard(first.pid)
+        assert second.get_lease_owner("batch:a") is None
+        assert second.claim_lease("batch:a") is True
+        assert second.pending_cancels() == []
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = ss.SQLiteStateBackend(path)
+    second = ss.SQLiteStateBackend(path)
+    try:
+        limiter_a = RateLimiter(requests_per_minute=2, burst=10, backend=first)
+        limiter_b = RateLimiter(requests_per_minute=2, burst=10, backend=second)
+        assert await limiter_a.is_allowed("client") is True
+        assert await limiter_b.is_allowed("client") is True
+        assert await limiter_a.is_allowed("client") is False
+
+        assert first.acquire_slot("pool", "a", 1) is True
+        assert second.acquire_slot("pool", "b", 1) is False
+    finally:
+        first.close()
+        second.close()
+
+
+def test_sqlite_backend_reclaims_dead_worker_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.db")
+    dead = ss.SQLiteStateBackend(path)
+    live = ss.SQLiteStateBackend(path)
+    try:
+        dead.pid = 999_999_999
+        assert dead.acquire_slot("pool", "a", 1) is True
+        assert dead.claim_session("sess") is True
+
+        monkeypatch.setattr(ss, "_pid_alive", lambda pid: pid == live.pid)
+        assert live.acquire_slot("pool", "b", 1) is True
+        assert live.get_session_owner("sess") is None
+        assert live.claim_session("sess") is True
+    finally:
+        dead.close()
+        live.close()
+
+
+def test_prune_drops_idle_keys_only(backend):
+    assert backend.check_rate("idle", 100.0, 10, 10) is True
+    assert backend.check_rate("active", 150.0, 10, 10) is True
+
+    assert backend.prune(170.0) >= 1
+
+    # "active" keeps its window: one more request fits under a limit of 2.
+    assert backend.check_rate("active", 171.0, 2, 10) is True
+    assert backend.check_rate("active", 172.0, 2, 10) is False
+    if isinstance(backend, ss.SQLiteStateBackend):
+        keys = {row[0] for row in backend._conn.execute("SELECT key FROM rate_state")}
+        assert keys == {"active"}
+    else:
+        assert set(backend._rates) == {"active"}
+
+
+@pytest.mark.asyncio
+async def test_offload_runs_blocking_backends_in_a_thread(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_to_thread(func, *args):
+        calls.append(func)
+        return func(*args)
+
+    monkeypatch.setattr(ss.asyncio, "to_thread", fake_to_thread)
+    memory = ss.MemoryStateBackend()
+    sqlite_backend = ss.SQLiteStateBackend(str(tmp_path / "state.db"))
+    try:
+        assert await ss.offload(memory.claim_session, "a") is True
+        assert calls == []
+        assert await ss.offload(sqlite_backend.claim_session, "a") is True
+        assert calls == [sqlite_backend.claim_session]
+    finally:
+        sqlite_backend.close()
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ss.StateBackend()
+
+
+def test_create_state_backend_rejects_unknown_kind():
+    assert isinstance(ss.create_state_backend("memory"), ss.MemoryStateBackend)
+    with pytest.raises(ValueError):
+        ss.create_state_backend("redis")
@@ -0,0 +1,148 @@
+"""Unit tests for request coalescing."""
+
+import asyncio
+
+import pytest
+
+from claude_code_api.api import chat as chat_module
+from claude_code_api.core.single_flight import SingleFlight
+
+EVENTS = [
+    {"type": "assistant", "message": {"role": "assistant", "content": "hi"}},
+    {"type": "result", "subtype": "success", "result": "hi"},
+]
+
+
+class SlowProcess:
+    def __init__(self, events, delay=0.01):
+        self.session_id = "leader"
+        self.events = events
+        self.delay = delay
+        self.stopped = False
+
+    async def get_output(self):
+        for event in self.events:
+            if self.stopped:
+                break
+            await asyncio.sleep(self.delay)
+            yield event
+
+    async def stop(self):
+        self.stopped = True
+
+
+class FakeClaudeManager:
+    def __init__(self):
+        self.started = []
+
+    async def create_session(self, session_id, **kwargs):
+        self.started.append(session_id)
+        await asyncio.sleep(0.01)
+        return SlowProcess(EVENTS)
+
+
+class FakeSessionManager:
+    def register_cli_session(self, api_session_id, cli_session_id):
+        pass
+
+
+async def _collect(process):
+    return [event async for event in process.get_output()]
+
+
+@pytest.mark.asyncio
+async def test_followers_replay_buffer_and_follow_live_events():
+    group = SingleFlight()
+    flight, is_leader = group.join("key")
+    assert is_leader is True
+    flight.start(SlowProcess(EVENTS))
+    leader_view = flight.view("a")
+
+    first = await leader_view.get_output().__anext__()
+    assert first == EVENTS[0]
+
+    follower, is_leader = group.join("key")
+    assert is_leader is False and follower is flight
+    assert await _collect(flight.view("b")) == EVENTS
+    assert group.get_inflight_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_last_subscriber_stop_stops_process():
+    group = SingleFlight()
+    flight, _ = group.join("key")
+    group.join("key")
+    process = SlowProcess(EVENTS, delay=1)
+    flight.start(process)
+
+    await flight.view("a").stop()
+    assert process.stopped is False
+    await flight.view("b").stop()
+    assert process.stopped is True
+
+
+@pytest.mark.asyncio
+async def test_followers_run_alone_when_leader_fails():
+    group = SingleFlight()
+    flight, _ = group.join("key")
+    follower, is_leader = group.join("key")
+    assert is_leader is False
+    flight.fail()
+    assert await follower.wait_started() is False
+    assert group.join("key")[1] is True
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_process():
+    claude_manager = FakeClaudeManager()
+    group = SingleFlight()
+
+    async def run(session_id):
+        process = await chat_module._start_or_join_claude_process(
+            claude_manager=claude_manager,
+            session_manager=FakeSessionManager(),
+            session_id=session_id,
+            project_path="/tmp/unused",
+            prompt="same prompt",
+            claude_model=None,
+            system_prompt=None,
+            request_key="key",
+            response_cache=None,
+            single_flight=group,
+        )
+        assert process.session_id == session_id
+        return process.is_leader, await _collect(process)
+
+    results = await asyncio.gather(*(run(f"s{i}") for i in range(3)))
+
+    assert claude_manager.started == ["s0"]
+    assert results == [(True, EVENTS), (False, EVENTS), (False, EVENTS)]
+
+
+class UsageRecorder:
+    def __init__(self):
+        self.updates = []
+
+    async def update_session(self, session_id, **kwargs):
+        self.updates.append(session_id)
+
+
+@pytest.mark.asyncio
+async def test_only_the_leader_is_charged_for_a_shared_run():
+    group = SingleFlight()
+    flight, _ = group.join("key")
+    group.join("key")
+    flight.start(SlowProcess(EVENTS))
+    session_manager = UsageRecorder()
+
+    for session_id, is_leader in (("leader", True), ("follower", False)):
+        response = await chat_module._collect_non_streaming_response(
+            claude_process=flight.view(session_id, is_leader=is_leader),
+            session_manager=session_manager,
+            session_id=session_id,
+            model="model",
+            project_id="project",
+        )
+        assert "usage" in response
+
+    assert session_manager.updates == ["leader"]
@@ -0,0 +1,158 @@
+"""Unit tests for request tracing, OTLP export and Server-Timing."""
+
+import json
+
+import pytest
+
+from claude_code_api.core import tracing
+from claude_code_api.core.claude_manager import ClaudeProcess
+from claude_code_api.core.config import settings
+from tests.model_utils import get_test_model_id
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    batches = []
+    monkeypatch.setattr(tracing.exporter, "export", batches.append)
+    return batches
+
+
+def test_nested_spans_export_one_trace(exported):
+    with tracing.span("root", parent=None) as root:
+        with tracing.span("child", step=1):
+            pass
+        assert tracing.current_span() is root
+    assert tracing.current_span() is None
+
+    assert len(exported) == 1
+    spans = tracing.to_otlp(exported[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {item["name"]: item for item in spans}
+    assert by_name["child"]["parentSpanId"] == by_name["root"]["spanId"]
+    assert by_name["child"]["traceId"] == by_name["root"]["traceId"]
+    assert by_name["child"]["attributes"] == [
+        {"key": "step", "value": {"intValue": "1"}}
+    ]
+    assert "parentSpanId" not in by_name["root"]
+
+
+def test_span_records_errors(exported):
+    with pytest.raises(ValueError):
+        with tracing.span("failing", parent=None):
+            raise ValueError("boom")
+    assert exported[0][0].status == tracing.STATUS_ERROR
+    assert exported[0][0].status_message == "ValueError"
+
+
+def test_disabled_tracing_returns_noop(monkeypatch, exported):
+    monkeypatch.setattr(settings, "tracing_enabled", False)
+    with tracing.span("ignored", parent=None) as current:
+        assert current is tracing.NOOP_SPAN
+    assert exported == []
+
+
+def test_tool_use_and_result_form_a_span(exported):
+    process = ClaudeProcess("sess", "/tmp")
+    process._run_span = tracing.start_span("claude.run", parent=None)
+    process._first_event_span = tracing.start_span(
+        "claude.first_event", parent=process._run_span
+    )
+    process._trace_tool_event(
+        {
+            "type": "assistant",
+            "message": {
+                "content": [{"type": "tool_use", "id": "toolu_1", "name": "Bash"}]
+            },
+        }
+    )
+    process._trace_tool_event(
+        {
+            "type": "user",
+            "message": {
+                "content": [
+                    {"type": "tool_result", "tool_use_id": "toolu_1", "is_error": True}
+                ]
+            },
+        }
+    )
+    process._end_spans(events=3)
+
+    names = [item.name for item in exported[0]]
+    assert names == ["tool.Bash", "claude.first_event", "claude.run"]
+    assert exported[0][0].status == tracing.STATUS_ERROR
+    assert exported[0][-1].attributes["claude.events"] == 3
+
+
+def test_route_template_restores_router_prefix():
+    class Route:
+        path = "/jobs/{job_id}/events"
+
+    scope = {"route": Route(), "path": "/v1/jobs/abc/events"}
+    assert tracing.route_template(scope) == "/v1/jobs/{job_id}/events"
+    scope = {"route": Route(), "path": "/jobs/abc/events"}
+    assert tracing.route_template(scope) == "/jobs/{job_id}/events"
+
+
+def test_file_exporter_writes_otlp_lines(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "tracing_exporter", "file")
+    monkeypatch.setattr(settings, "tracing_file_path", str(path))
+    exporter = tracing.SpanExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    with tracing.span("request", parent=None):
+        pass
+    exporter.shutdown()
+
+    document = json.loads(path.read_text().splitlines()[0])
+    resource = document["resourceSpans"][0]
+    assert {"key": "service.name", "value": {"stringValue": "claude-code-api"}} in (
+        resource["resource"]["attributes"]
+    )
+    assert resource["scopeSpans"][0]["spans"][0]["name"] == "request"
+
+
+def test_chat_completion_reports_server_timing(test_client, exported):
+    response = test_client.post(
+        "/v1/chat/completions",
+        json={
+            "model": get_test_model_id(),
+            "messages": [{"role": "user", "content": "please use a tool"}],
+        },
+    )
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    for stage in (
+        "auth",
+        "project.create_directory",
+        "db.create_session",
+        "claude.spawn",
+        "claude.first_event",
+        "tool.bash",
+        "claude.collect",
+        "session.update_usage",
+        "total",
+    ):
+        assert f"{stage};dur=" in timing
+
+    root = exported[-1][-1]
+    assert root.name == "POST /v1/chat/completions"
+    assert root.attributes["http.response.status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_run_span_is_complete_when_exported(tmp_path, monkeypatch):
+    snapshots = []
+    monkeypatch.setattr(
+        tracing.exporter,
+        "export",
+        lambda spans: snapshots.extend((s.name, dict(s.attributes)) for s in spans),
+    )
+    process = ClaudeProcess("sess", str(tmp_path))
+    assert await process.start(prompt="hello") is True
+    while await process.output_queue.get() is not None:
+        pass
+
+    attributes = dict(snapshots)["claude.run"]
+    assert "process.cpu_seconds" in attributes
+    assert attributes["claude.events"] > 0
+    await process.stop()
@@ -0,0 +1,95 @@
+"""Unit tests for project workspace cloning."""
+
+import errno
+import os
+
+import pytest
+
+from claude_code_api.core import workspace
+from tests.model_utils import get_test_model_id
+
+
+def _make_tree(root):
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("print('hi')\n")
+    (root / "README.md").write_text("readme\n")
+    os.symlink("src/main.py", root / "entry.py")
+
+
+def test_copy_clone_is_independent(tmp_path):
+    source = tmp_path / "source"
+    _make_tree(source)
+    target = tmp_path / "clone"
+
+    assert workspace.clone_workspace(str(source), str(target), mode="copy") == "copy"
+    assert (target / "src" / "main.py").read_text() == "print('hi')\n"
+    assert os.readlink(target / "entry.py") == "src/main.py"
+
+    (target / "README.md").write_text("changed\n")
+    assert (source / "README.md").read_text() == "readme\n"
+
+
+def test_reflink_falls_back_when_unsupported(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    _make_tree(source)
+    calls = []
+
+    def unsupported(source_path, target_path):
+        calls.append(source_path)
+        raise OSError(errno.EOPNOTSUPP, "no reflinks")
+
+    monkeypatch.setattr(workspace, "reflink_file", unsupported)
+    method = workspace.clone_workspace(
+        str(source), str(tmp_path / "clone"), mode="auto"
+    )
+
+    assert method == "copy"
+    # Support is probed once, not per file.
+    assert len(calls) == 1
+    assert (tmp_path / "clone" / "src" / "main.py").exists()
+
+
+def test_clone_replaces_existing_target(tmp_path):
+    source = tmp_path / "source"
+    _make_tree(source)
+    target = tmp_path / "clone"
+    target.mkdir()
+    (target / "stale.txt").write_text("old")
+
+    workspace.clone_workspace(str(source), str(target))
+    assert not (target / "stale.txt").exists()
+
+
+@pytest.mark.parametrize("mode", ["magic", "hardlink"])
+def test_unknown_mode_is_rejected(tmp_path, mode):
+    with pytest.raises(ValueError):
+        workspace.clone_workspace(str(tmp_path), str(tmp_path / "x"), mode=mode)
+
+
+def test_clone_project_endpoint(test_client):
+    created = test_client.post("/v1/projects", json={"name": "origin"}).json()
+    with open(os.path.join(created["path"], "notes.txt"), "w") as handle:
+        handle.write("hello")
+
+    response = test_client.post(f"/v1/projects/{created['id']}/clone")
+    assert response.status_code == 200
+    assert response.headers["x-clone-method"] in {"reflink", "copy"}
+    clone = response.json()
+    assert clone["id"] != created["id"]
+    assert clone["name"] == "origin (clone)"
+    with open(os.path.join(clone["path"], "notes.txt")) as handle:
+        assert handle.read() == "hello"
+
+    assert test_client.post("/v1/projects/missing/clone").status_code == 404
+
+
+def test_chat_completion_fork_project(test_client):
+    request_data = {
+        "model": get_test_model_id(),
+        "messages": [{"role": "user", "content": "Work on a fork"}],
+        "project_id": "forked",
+        "fork_project": True,
+    }
+    response = test_client.post("/v1/chat/completions", json=request_data)
+    assert response.status_code == 200
+    assert response.json()["project_id"].startswith("forked-fork-")